@@ -0,0 +1,5 @@
+"""
+Benchmarks of unidown, they are not part of the package. Run them from the project root e.g.
+``python -m benchmarks.savestate_load``. ``python -m benchmarks.suite`` runs the benchmarks of the core data paths and
+tracks the results over time.
+"""
@@ -0,0 +1,63 @@
+"""
+Benchmark of comparing the download data with the savestate, compares the former per item loop with tqdm to
+:func:`~unidown.plugin.link_item_dict.LinkItemDict.diff`.
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from benchmarks.savestate_load import measure
+from unidown.plugin import LinkItem, LinkItemDict
+
+
+def create_data(count: int):
+    """
+    Create old and new data. A tenth of the old links is removed, a tenth is added and a quarter of the others is newer.
+
+    :param count: number of link items
+    :return: old and new data
+    """
+    start = datetime(2001, 1, 1)
+    old_data = LinkItemDict({f"/path/{number}/file.bin": LinkItem(f"file_{number}.bin", start + timedelta(seconds=number)) for number in range(count)})
+    new_data = LinkItemDict({
+        f"/path/{number}/file.bin": LinkItem(f"file_{number}.bin", start + timedelta(seconds=number + (number % 4 == 0)))
+        for number in range(count // 10, count + count // 10)
+    })
+    return old_data, new_data
+
+
+def get_new_items_loop(old_data: LinkItemDict, new_data: LinkItemDict) -> LinkItemDict:
+    """
+    Compare like before, item by item wrapped by a disabled tqdm.
+
+    :param old_data: old data
+    :param new_data: new data
+    :return: new and updated link items
+    """
+    from tqdm import tqdm
+    updated_data = LinkItemDict()
+    for link, link_item in tqdm(new_data.items(), desc="Compare with save", unit="item", mininterval=1, ncols=100, disable=True):
+        if (link not in old_data) or (link_item.time > old_data[link].time):
+            updated_data[link] = link_item
+    return updated_data
+
+
+def main():
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--items', default=1_000_000, type=int, help='number of link items (default: %(default)s)')
+    parser.add_argument('-r', '--repeat', default=3, type=int, help='repetitions, the best is taken (default: %(default)s)')
+    args = parser.parse_args()
+
+    old_data, new_data = create_data(args.items)
+    assert get_new_items_loop(old_data, new_data) == LinkItemDict.diff(old_data, new_data).new
+    for name, func in (('loop', lambda: get_new_items_loop(old_data, new_data)),
+                       ('diff', lambda: LinkItemDict.diff(old_data, new_data, removed=False)),
+                       ('diff+removed', lambda: LinkItemDict.diff(old_data, new_data))):
+        seconds = measure(func, args.repeat)
+        print(f"{name:>12}: {seconds:.3f}s | {seconds / args.items * 100_000:.3f}s per 100k items")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Local http server which serves synthetic files, as stand-in for real hosts in benchmarks.
+"""
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+
+class SyntheticHandler(BaseHTTPRequestHandler):
+    """
+    Serves ``/<size>/<name>`` with ``size`` bytes of generated content, nothing is read from disk.
+    """
+    protocol_version = 'HTTP/1.1'
+    block: bytes = bytes(range(256)) * 256
+
+    def do_GET(self):
+        try:
+            size = int(self.path.split('/')[1])
+        except ValueError:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        while size > 0:
+            chunk = self.block[:size]
+            self.wfile.write(chunk)
+            size -= len(chunk)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve() -> Iterator[str]:
+    """
+    Run the server in a background thread.
+
+    :return: base url of the server
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SyntheticHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
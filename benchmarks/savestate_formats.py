@@ -0,0 +1,43 @@
+"""
+Benchmark of the savestate formats, compares the file size and the time to save and load.
+"""
+import argparse
+import json
+import logging
+import tempfile
+from pathlib import Path
+
+from benchmarks.savestate_load import create_savestate_json, measure
+from unidown.plugin import LinkItemDict, SaveState
+from unidown.plugin.savestate_backend import SAVESTATE_BACKENDS
+
+
+def main():
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--items', default=100_000, type=int, help='number of link items (default: %(default)s)')
+    parser.add_argument('-r', '--repeat', default=3, type=int, help='repetitions, the best is taken (default: %(default)s)')
+    args = parser.parse_args()
+
+    savestate = SaveState.from_json(json.loads(create_savestate_json(args.items)))
+    log = logging.getLogger('benchmark')
+    for name, backend_cls in SAVESTATE_BACKENDS.items():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            backend = backend_cls(Path(tmp_dir), name, log)
+            save_seconds = measure(lambda: backend.save(savestate), args.repeat)
+            size = backend.file.stat().st_size
+            backend.close()
+
+            def load():
+                loader = backend_cls(Path(tmp_dir), name, log)
+                loader.load(SaveState(savestate.plugin_info, savestate.last_update, LinkItemDict()))
+                loader.close()
+
+            load_seconds = measure(load, args.repeat)
+        print(f"{name:>12}: {size / 1024 / 1024:8.2f} MiB | save {save_seconds:.3f}s | load {load_seconds:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
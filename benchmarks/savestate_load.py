@@ -0,0 +1,81 @@
+"""
+Benchmark of loading a savestate, compares the time parsing with :func:`~datetime.datetime.strptime` to
+:func:`~unidown.plugin.link_item.LinkItem.parse_time`.
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+from unidown.plugin import LinkItem, LinkItemDict, PluginInfo, SaveState
+
+
+def create_savestate_json(count: int) -> str:
+    """
+    Create a serialized savestate.
+
+    :param count: number of link items
+    :return: savestate json
+    """
+    start = datetime(2001, 1, 1)
+    link_items = LinkItemDict({
+        f"/path/{number}/file.bin": LinkItem(f"file_{number}.bin", start + timedelta(seconds=number, microseconds=number)) for number in range(count)
+    })
+    return json.dumps(SaveState(PluginInfo('bench', '1.0.0', 'localhost'), start, link_items).to_json())
+
+
+def measure(func: Callable, repeat: int) -> float:
+    """
+    Measure the best time of the function.
+
+    :param func: function to measure
+    :param repeat: how often it is measured
+    :return: best time in seconds
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_strptime(savestate_json: str):
+    """
+    Load the savestate like before, with strptime for every link item.
+
+    :param savestate_json: savestate json
+    """
+    data = json.loads(savestate_json)
+    link_items = LinkItemDict()
+    for link, item in data['linkItems'].items():
+        link_items[link] = LinkItem(item['name'], datetime.strptime(item['time'], LinkItem.time_format))
+
+
+def load(savestate_json: str):
+    """
+    Load the savestate.
+
+    :param savestate_json: savestate json
+    """
+    SaveState.from_json(json.loads(savestate_json))
+
+
+def main():
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--items', default=100_000, type=int, help='number of link items (default: %(default)s)')
+    parser.add_argument('-r', '--repeat', default=3, type=int, help='repetitions, the best is taken (default: %(default)s)')
+    args = parser.parse_args()
+
+    savestate_json = create_savestate_json(args.items)
+    for name, func in (('strptime', load_strptime), ('parse_time', load)):
+        seconds = measure(lambda: func(savestate_json), args.repeat)
+        print(f"{name:>10}: {seconds:.3f}s | {seconds / args.items * 100_000:.3f}s per 100k items")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark of the startup time, measures ``unidown --list-plugins`` and ``unidown -p`` with a plugin which does not exist,
+so no download is made. Every run is a new interpreter.
+"""
+import argparse
+import subprocess
+import sys
+import tempfile
+from typing import List
+
+from benchmarks.savestate_load import measure
+
+
+def run(args: List[str]):
+    """
+    Run unidown in a new interpreter.
+
+    :param args: command line arguments
+    :raises subprocess.CalledProcessError: unidown exited with an error
+    """
+    code = f"from unidown.main import main; main({args!r})"
+    result = subprocess.run([sys.executable, '-c', code], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, code)
+
+
+def main():
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-r', '--repeat', default=10, type=int, help='repetitions, the best is taken (default: %(default)s)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root_dir:
+        cases = (
+            ('interpreter', lambda: subprocess.run([sys.executable, '-c', 'pass'], check=True)),
+            ('import', lambda: subprocess.run([sys.executable, '-c', 'import unidown.main'], check=True)),
+            ('--list-plugins', lambda: run(['--list-plugins'])),
+            ('-p', lambda: run(['-p', 'not_existing_plugin', '-r', root_dir, '--no-update-check', '-l', 'CRITICAL'])),
+        )
+        for name, func in cases:
+            seconds = measure(func, args.repeat)
+            print(f"{name:>15}: {seconds * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Benchmark suite of the core data paths: savestate (de)serialization, comparing with the savestate, cleaning up names and
+downloading from a local http server. The dataset sizes scale with ``--scale``. Results are appended to a json lines
+file and compared with the previous result of the same scale, to catch regressions over time.
+"""
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+from benchmarks import http_server
+from benchmarks.savestate_load import measure
+from unidown.core.settings import Settings
+from unidown.plugin import APlugin, LinkItem, LinkItemDict, PluginInfo, SaveState
+
+
+class BenchPlugin(APlugin):
+    """
+    Plugin which is only used to download.
+    """
+    _info = PluginInfo('bench', '1.0.0', '127.0.0.1')
+
+    def _create_last_update_time(self) -> datetime:
+        return datetime(1970, 1, 1)
+
+    def _create_download_data(self) -> LinkItemDict:
+        return LinkItemDict()
+
+
+def create_link_items(count: int, offset: int = 0) -> LinkItemDict:
+    """
+    Create link items, every tenth name is duplicated.
+
+    :param count: number of items
+    :param offset: added to the times, to create newer items
+    :return: link items
+    """
+    start = datetime(2001, 1, 1)
+    return LinkItemDict({
+        f"/path/{number}/file.bin": LinkItem(f"file_{number - number % 10 if number % 10 == 1 else number}.bin",
+                                             start + timedelta(seconds=number + offset))
+        for number in range(count)
+    })
+
+
+def bench_savestate(items: int, repeat: int) -> Dict[str, float]:
+    """
+    :param items: number of link items
+    :param repeat: repetitions
+    :return: seconds of to_json and from_json
+    """
+    savestate = SaveState(PluginInfo('bench', '1.0.0', 'localhost'), datetime(2001, 1, 1), create_link_items(items))
+    data = json.dumps(savestate.to_json())
+    return {
+        'savestate_to_json': measure(lambda: json.dumps(savestate.to_json()), repeat),
+        'savestate_from_json': measure(lambda: SaveState.from_json(json.loads(data)), repeat),
+    }
+
+
+def bench_link_items(items: int, repeat: int) -> Dict[str, float]:
+    """
+    :param items: number of link items
+    :param repeat: repetitions
+    :return: seconds of get_new_items, diff and clean_up_names
+    """
+    old_data = create_link_items(items)
+    # half of the items are newer, a quarter is new
+    new_data = LinkItemDict(list(create_link_items(items // 2).items()) + list(create_link_items(items + items // 4, 1).items())[items // 2:])
+    return {
+        'get_new_items': measure(lambda: LinkItemDict.get_new_items(old_data, new_data), repeat),
+        'diff': measure(lambda: LinkItemDict.diff(old_data, new_data), repeat),
+        'clean_up_names': measure(lambda: create_link_items(items).clean_up_names(), repeat),
+    }
+
+
+def bench_download(files: int, size: int, repeat: int) -> Dict[str, float]:
+    """
+    :param files: number of files
+    :param size: bytes of every file
+    :param repeat: repetitions
+    :return: seconds of downloading with each engine
+    """
+    results = {}
+    with http_server.serve() as url, tempfile.TemporaryDirectory() as root_dir:
+        link_items = LinkItemDict({f"{url}/{size}/{number}": LinkItem(f"file_{number}", datetime(2001, 1, 1)) for number in range(files)})
+        for engine in ('thread', 'asyncio'):
+            plugin = BenchPlugin(Settings(Path(root_dir).joinpath(engine), download_engine=engine, progress='none'), {'delay': 0})
+
+            def download():
+                plugin.download(link_items, plugin.download_dir, 'bench', 'file')
+                for file in plugin.download_dir.iterdir():
+                    file.unlink()
+
+            results[f"download_{engine}"] = measure(download, repeat)
+            plugin.clean_up()
+    return results
+
+
+def git_revision() -> Optional[str]:
+    """
+    :return: current git commit, None if not available
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_result(file: Path, scale: float) -> Optional[dict]:
+    """
+    :param file: results file
+    :param scale: scale of the result
+    :return: last result with the same scale, None if there is none
+    """
+    if not file.exists():
+        return None
+    previous = None
+    with file.open(encoding='utf8') as reader:
+        for line in reader:
+            result = json.loads(line)
+            if result['scale'] == scale:
+                previous = result
+    return previous
+
+
+def main():
+    """
+    Run the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-s', '--scale', default=1.0, type=float,
+                        help='scale of the datasets, 1 are 100000 link items and 200 downloads of 64 KiB (default: %(default)s)')
+    parser.add_argument('-r', '--repeat', default=3, type=int, help='repetitions, the best is taken (default: %(default)s)')
+    parser.add_argument('-o', '--output', default=Path(__file__).with_name('results.jsonl'), type=Path,
+                        help='json lines file the result is appended to (default: %(default)s)')
+    parser.add_argument('--threshold', default=0.2, type=float,
+                        help='slow down compared to the previous result which counts as regression (default: %(default)s)')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    items = max(1, int(100_000 * args.scale))
+    files = max(1, int(200 * args.scale))
+    results = {}
+    results.update(bench_savestate(items, args.repeat))
+    results.update(bench_link_items(items, args.repeat))
+    results.update(bench_download(files, 64 * 1024, args.repeat))
+
+    previous = previous_result(args.output, args.scale)
+    regressions = 0
+    for name, seconds in results.items():
+        line = f"{name:>20}: {seconds:.3f}s"
+        if previous is not None and name in previous['results']:
+            change = seconds / previous['results'][name] - 1
+            line += f" ({change:+.0%})"
+            if change > args.threshold:
+                line += " REGRESSION"
+                regressions += 1
+        print(line)
+
+    with args.output.open('a', encoding='utf8') as writer:
+        writer.write(json.dumps({
+            'time': time.time(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'scale': args.scale,
+            'items': items,
+            'files': files,
+            'results': results,
+        }) + '\n')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
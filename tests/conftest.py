@@ -0,0 +1,148 @@
+import shutil
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import pytest
+
+from unidown.plugin import APlugin
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """
+    Static file handler which supports single range requests (``bytes=start-`` and ``bytes=start-end``), also with an
+    ``If-Range`` of the ``ETag`` or ``Last-Modified``, which is answered in full if it does not match. Requests to ``/redirect/<path>`` are
+    redirected to ``<path>`` on the host ``localhost``, requests to ``/truncated/<path>`` announce the full length of
+    ``<path>`` but send only the first half. Headers inside ``server.extra_headers`` are added to responses of their path,
+    an ``ETag`` of them is answered with ``304`` if it matches ``If-None-Match``. Conditional requests are recorded. The
+    next requests of a path are answered with ``503`` as often as ``server.unavailable`` says and send only the first half
+    of the content as often as ``server.truncated`` says. Every ``GET`` is delayed by
+    ``server.delay`` seconds and the highest number of simultaneous ``GET`` requests is recorded in ``server.max_active``.
+    """
+
+    def end_headers(self):
+        for key, value in self.server.extra_headers.get(self.path, {}).items():
+            self.send_header(key, value)
+        super().end_headers()
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        try:
+            if self.server.delay > 0:
+                time.sleep(self.server.delay)
+            self._get()
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def _get(self):
+        if self.server.unavailable.get(self.path, 0) > 0:
+            self.server.unavailable[self.path] -= 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if 'If-None-Match' in self.headers or 'If-Modified-Since' in self.headers:
+            self.server.conditional_requests.append(self.path)
+        etag = self.server.extra_headers.get(self.path, {}).get('ETag')
+        if etag is not None and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        truncated = self.server.truncated.get(self.path, 0) > 0
+        if truncated:
+            self.server.truncated[self.path] -= 1
+        if truncated or self.path.startswith('/truncated/'):
+            file = Path(self.translate_path(self.path if truncated else self.path[len('/truncated'):]))
+            data = file.read_bytes()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('Last-Modified', self.date_time_string(file.stat().st_mtime))
+            self.end_headers()
+            self.wfile.write(data[:len(data) // 2])
+            self.close_connection = True
+            return
+        if self.path.startswith('/redirect/'):
+            # redirect to the same server by another host name
+            self.send_response(302)
+            self.send_header('Location', f"http://localhost:{self.server.server_port}/{self.path[len('/redirect/'):]}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        range_header = self.headers.get('Range')
+        file = Path(self.translate_path(self.path))
+        if range_header is None or not range_header.startswith('bytes=') or not file.is_file():
+            super().do_GET()
+            return
+        self.server.range_requests.append(range_header)
+        last_modified = self.date_time_string(file.stat().st_mtime)
+        if_range = self.headers.get('If-Range')
+        if if_range is not None and if_range not in (etag, last_modified):
+            super().do_GET()
+            return
+        start, _, end = range_header[len('bytes='):].partition('-')
+        start = int(start)
+        data = file.read_bytes()
+        end = min(int(end), len(data) - 1) if end else len(data) - 1
+        if start >= len(data):
+            self.send_response(416)
+            self.send_header('Content-Range', f"bytes */{len(data)}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(206)
+        self.send_header('Content-Range', f"bytes {start}-{end}/{len(data)}")
+        self.send_header('Last-Modified', last_modified)
+        self.send_header('Content-Length', str(end + 1 - start))
+        self.end_headers()
+        self.wfile.write(data[start:end + 1])
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server(tmp_path):
+    """
+    Local http server which serves the files inside ``server.root`` under ``server.url``.
+    """
+    root = tmp_path.joinpath('http_root')
+    root.mkdir()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(RangeHandler, directory=str(root)))
+    server.root = root
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    server.range_requests = []
+    server.extra_headers = {}
+    server.conditional_requests = []
+    server.unavailable = {}
+    server.truncated = {}
+    server.delay = 0
+    server.lock = threading.Lock()
+    server.active = 0
+    server.max_active = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def plugin_host(http_server, monkeypatch):
+    """
+    Serve the files which the test plugin and the tests download from the plugin host ``raw.githubusercontent.com``
+    by the local http server, links without a scheme are resolved against it.
+    """
+    repo = Path(__file__).parent.parent
+    for path in ('README.rst', 'LICENSE.md', 'tests/item_dict.json', 'tests/last_update_time.txt'):
+        target = http_server.root.joinpath('IceflowRE/unidown/main', path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(repo.joinpath(path), target)
+    absolute_url = APlugin.absolute_url
+    monkeypatch.setattr(APlugin, 'absolute_url', lambda plugin, link: absolute_url(plugin, link) if urlsplit(link).scheme else http_server.url + link)
+    return http_server
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from unidown.core.concurrency import ConcurrencyLimiter
+
+
+def test_init():
+    with pytest.raises(ValueError, match=r"limit 0 is not inside 1 and 0."):
+        ConcurrencyLimiter(0)
+    with pytest.raises(ValueError, match=r"limit 5 is not inside 1 and 4."):
+        ConcurrencyLimiter(5, 4)
+    assert ConcurrencyLimiter(2).maximum == 2
+
+
+def test_limit():
+    limiter = ConcurrencyLimiter(2)
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def work():
+        with limiter:
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            threading.Event().wait(0.01)
+            with lock:
+                running.pop()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(peak) == 2
+
+
+def test_not_adaptive():
+    limiter = ConcurrencyLimiter(2, 8)
+    for _ in range(10):
+        limiter.report(100)
+    assert limiter.limit == 2
+
+
+def test_adaptive_increase():
+    limiter = ConcurrencyLimiter(2, 8, adaptive=True)
+    for _ in range(4):
+        limiter.report(100)
+    assert limiter.limit == 3
+
+
+def test_adaptive_errors():
+    limiter = ConcurrencyLimiter(4, 8, adaptive=True)
+    for _ in range(8):
+        limiter.report(0, failed=True)
+    assert limiter.limit == 2
+    for _ in range(4):
+        limiter.report(0, failed=True)
+    assert limiter.limit == 1
+    for _ in range(2):
+        limiter.report(0, failed=True)
+    assert limiter.limit == 1
+
+
+def test_adaptive_maximum():
+    limiter = ConcurrencyLimiter(1, 2, adaptive=True)
+    for _ in range(20):
+        limiter.report(100)
+    assert limiter.limit <= 2
@@ -1,11 +1,15 @@
 import json
 import logging
+import os
+import time
+from datetime import datetime
 
 import pytest
 
 from unidown.core import manager
 from unidown.core.plugin_state import PluginState
 from unidown.core.settings import Settings
+from unidown.plugin import APlugin, LinkItem, PluginInfo
 
 
 def test_get_options_dict(caplog):
@@ -30,20 +34,150 @@ test_options = [
 
 
 @pytest.mark.parametrize('name,options,result', test_options)
-def test_run(tmp_path, name, options, result):
+def test_run(tmp_path, plugin_host, name, options, result):
     assert manager.run(Settings(tmp_path), name, options) == result
     if PluginState.EndSuccess == result:
         savestate_file = tmp_path.joinpath('savestates/test_save.json')
         assert savestate_file.exists()
         with savestate_file.open(encoding="utf8") as reader:
             actual = json.loads(reader.read())
+        link_items = actual.pop('linkItems')
+        assert {link: (item['name'], item['time']) for link, item in link_items.items()} == {
+            '/IceflowRE/unidown/main/README.rst': ('README_d.rst', '20010101T010101.000000Z'),
+            '/IceflowRE/unidown/main/LICENSE.md': ('README.rst', '20010101T010101.000000Z'),
+        }
+        assert link_items['/IceflowRE/unidown/main/LICENSE.md']['size'] == plugin_host.root.joinpath('IceflowRE/unidown/main/LICENSE.md').stat().st_size
+        assert list(actual.pop('failedItems')) == ['/IceflowRE/unidown/main/missing']
         assert actual == {
             'meta': {'version': '1'},
             'pluginInfo': {'name': 'test', 'version': '0.1.0', 'host': 'raw.githubusercontent.com'},
             'lastUpdate': '19990909T090909.000000Z',
-            'linkItems': {
-                '/IceflowRE/unidown/main/README.rst': {'name': 'README_d.rst', 'time': '20010101T010101.000000Z'},
-                '/IceflowRE/unidown/main/LICENSE.md': {'name': 'README.rst', 'time': '20010101T010101.000000Z'}
-            },
             'username': 'Nasua Nasua'
         }
+
+
+def test_run_plugins(tmp_path):
+    states = manager.run_plugins(Settings(tmp_path), ['test', 'not_existing_plugin', 'test'], [["behaviour=run_fail"]])
+    assert states == {'test': PluginState.RunFail, 'not_existing_plugin': PluginState.NotFound}
+
+
+def test_run_plugins_all(tmp_path, monkeypatch):
+    limiters = []
+    monkeypatch.setattr(manager, 'run', lambda settings, name, raw_options, limiter, report, rate_limiter:
+                        limiters.append((limiter, rate_limiter)) or PluginState.EndSuccess)
+    assert manager.run_plugins(Settings(tmp_path, rate_limit=5), None, []) == {'test': PluginState.EndSuccess}
+    assert len(limiters) == 1 and limiters[0][0].limit == 8
+    assert limiters[0][1].enabled
+
+
+def test_run_shared_rate_limiter(tmp_path, monkeypatch):
+    rate_limiters = []
+    monkeypatch.setattr(manager, 'download_from_plugin', lambda plugin: rate_limiters.append(plugin.rate_limiter))
+    rate_limiter = manager.create_rate_limiter(Settings(tmp_path, rate_limit=5))
+    assert manager.run(Settings(tmp_path), 'test', [], rate_limiter=rate_limiter) == PluginState.EndSuccess
+    assert manager.run(Settings(tmp_path), 'test', [["delay=10"]], rate_limiter=rate_limiter) == PluginState.EndSuccess
+    assert rate_limiters[0] is rate_limiter
+    assert rate_limiters[1].host_requests == 0.1 and rate_limiters[1]._parent is rate_limiter
+
+
+def test_create_limiter(tmp_path):
+    limiter = manager.create_limiter(Settings(tmp_path, concurrency=2, adaptive=True, max_concurrency=6))
+    assert limiter.adaptive
+    assert limiter.limit == 2
+    assert limiter.maximum == 6
+    assert not manager.create_limiter(Settings(tmp_path)).adaptive
+
+
+def test_start_update_check(tmp_path, monkeypatch):
+    cache_files = []
+    monkeypatch.setattr(manager, 'check_update', lambda cache_file: cache_files.append(cache_file))
+    thread = manager.start_update_check(Settings(tmp_path))
+    thread.join()
+    assert thread.daemon
+    assert cache_files == [tmp_path.joinpath(manager.UPDATE_CACHE_FILE)]
+
+
+class StreamPlugin(APlugin):
+    """
+    Plugin which yields its links.
+    """
+    _info = PluginInfo('stream', '0.1.0', '127.0.0.1')
+
+    def __init__(self, settings, links):
+        super().__init__(settings, {'delay': 0})
+        self.links = links
+        self.created = []
+
+    def _create_last_update_time(self):
+        return max(item.time for _, item in self.links)
+
+    def _create_download_data(self):
+        for link, item in self.links:
+            self.created.append(link)
+            yield link, LinkItem(item.name, item.time)
+
+
+def test_download_streamed(tmp_path, http_server):
+    for name in ('a', 'b', 'c'):
+        http_server.root.joinpath(name).write_bytes(name.encode())
+    links = [
+        (http_server.url + '/a', LinkItem('same', datetime(2001, 1, 1))),
+        (http_server.url + '/b', LinkItem('same', datetime(2001, 1, 1))),
+        (http_server.url + '/a', LinkItem('other', datetime(2001, 1, 1))),
+        (http_server.url + '/c', LinkItem('c', datetime(2001, 1, 1))),
+    ]
+    plugin = StreamPlugin(Settings(tmp_path), links)
+    assert plugin.streaming
+    manager.download_from_plugin(plugin)
+    assert plugin.created == [link for link, _ in links]
+    assert plugin.download_dir.joinpath('same').read_bytes() == b'a'
+    assert plugin.download_dir.joinpath('same_d').read_bytes() == b'b'
+    assert plugin.download_data[http_server.url + '/a'].name == 'other'
+    assert {link: item.name for link, item in plugin.savestate.link_items.items()} == {
+        http_server.url + '/a': 'same', http_server.url + '/b': 'same_d', http_server.url + '/c': 'c'
+    }
+    assert plugin.report.counters == {'downloaded': 3, 'bytes': 3, 'links': 3, 'new': 3}
+    assert list(plugin.report.phases) == ['last_update', 'load_savestate', 'download', 'check', 'update_savestate', 'save_savestate']
+    plugin.clean_up()
+
+    # only the newer item is downloaded again, into its own file
+    http_server.root.joinpath('a').write_bytes(b'new a')
+    # last modified has a resolution of seconds
+    os.utime(http_server.root.joinpath('a'), (time.time() + 10, time.time() + 10))
+    links[0] = (http_server.url + '/a', LinkItem('same', datetime(2002, 2, 2)))
+    plugin = StreamPlugin(Settings(tmp_path), links[:2])
+    manager.download_from_plugin(plugin)
+    assert plugin.download_dir.joinpath('same').read_bytes() == b'new a'
+    assert plugin.download_dir.joinpath('same_d').read_bytes() == b'b'
+    assert len(plugin.savestate.link_items) == 3
+    assert plugin.report.counters['removed'] == 1
+    plugin.clean_up()
+
+
+def test_retry_failed(tmp_path, http_server):
+    http_server.root.joinpath('a').write_bytes(b'a')
+    links = [
+        (http_server.url + '/a', LinkItem('a', datetime(2001, 1, 1))),
+        (http_server.url + '/b', LinkItem('b', datetime(2001, 1, 1))),
+    ]
+    plugin = StreamPlugin(Settings(tmp_path), links)
+    manager.download_from_plugin(plugin)
+    assert list(plugin.savestate.link_items) == [http_server.url + '/a']
+    assert plugin.savestate.failed_items[http_server.url + '/b'].error == f"{http_server.url}/b | 404"
+    plugin.clean_up()
+
+    # without an update only the failed item is downloaded
+    http_server.root.joinpath('b').write_bytes(b'b')
+    plugin = StreamPlugin(Settings(tmp_path), links)
+    manager.download_from_plugin(plugin)
+    assert plugin.created == []
+    assert plugin.download_dir.joinpath('b').read_bytes() == b'b'
+    assert plugin.savestate.failed_items == {}
+    assert len(plugin.savestate.link_items) == 2
+    assert plugin.report.counters['new'] == 1
+    plugin.clean_up()
+
+    plugin = StreamPlugin(Settings(tmp_path), links)
+    manager.download_from_plugin(plugin)
+    assert 'download' not in plugin.report.phases
+    plugin.clean_up()
@@ -0,0 +1,69 @@
+import io
+import json
+import logging
+
+import pytest
+
+from unidown.core import progress
+from unidown.core.progress import JsonProgress, LogProgress, NoProgress, TqdmProgress, create_progress, resolve_style
+
+
+def test_no_progress():
+    with NoProgress('Download', 'item', 2) as pbar:
+        assert not pbar.enabled
+        pbar.update()
+        pbar.add_total(1)
+        assert pbar.total == 3
+
+
+def test_log_progress(caplog):
+    caplog.set_level(logging.INFO)
+    log = logging.getLogger('progress')
+    with LogProgress('Download', 'item', 4, log) as pbar:
+        assert pbar.enabled
+        pbar.update()
+        pbar.update(2)
+        assert caplog.messages == []
+        pbar.add_total(1)
+    assert pbar.done == 3
+    assert len(caplog.messages) == 1
+    assert caplog.messages[0].startswith('Download: 3/5 items (60%), ')
+    assert caplog.messages[0].endswith(', finished')
+    pbar.close()
+    assert len(caplog.messages) == 1
+
+    caplog.clear()
+    with LogProgress('Download', 'item', None, log, interval=0) as pbar:
+        pbar.update()
+        pbar.update()
+    assert [message.split(',')[0] for message in caplog.messages] == ['Download: 1 items', 'Download: 2 items', 'Download: 2 items']
+
+
+def test_json_progress():
+    stream = io.StringIO()
+    with JsonProgress('Download', 'item', 2, interval=0, stream=stream) as pbar:
+        pbar.update()
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(event['done'], event['total'], event['finished']) for event in events] == [(1, 2, False), (1, 2, True)]
+    assert events[0]['desc'] == 'Download'
+    assert events[0]['unit'] == 'item'
+
+
+def test_tqdm_progress():
+    with TqdmProgress('Download', 'item', 2) as pbar:
+        pbar.update()
+        pbar.add_total(1)
+        assert pbar._pbar.total == 3
+        assert pbar._pbar.n == 1
+
+
+@pytest.mark.parametrize('tty,style', [(True, 'tqdm'), (False, 'log')])
+def test_resolve_style(monkeypatch, tty, style):
+    monkeypatch.setattr(progress.sys.stderr, 'isatty', lambda: tty)
+    assert resolve_style('auto') == style
+    assert resolve_style('json') == 'json'
+
+
+def test_create_progress():
+    assert isinstance(create_progress('none', 'Download', 'item'), NoProgress)
+    assert isinstance(create_progress('log', 'Download', 'item'), LogProgress)
@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+
+from unidown.core.rate_limiter import RateLimiter, TokenBucket
+
+
+def test_token_bucket_init():
+    with pytest.raises(ValueError, match=r"rate and capacity must be positive."):
+        TokenBucket(0)
+    assert TokenBucket(0.5).capacity == 1
+    assert TokenBucket(10).capacity == 10
+
+
+def test_token_bucket_reserve():
+    bucket = TokenBucket(10, 2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve(10) == pytest.approx(1.1, abs=0.01)
+
+
+def test_token_bucket_acquire_threads():
+    bucket = TokenBucket(100, 1)
+    start = time.monotonic()
+    threads = [threading.Thread(target=bucket.acquire) for _ in range(21)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start >= 0.19
+
+
+def test_rate_limiter_disabled():
+    limiter = RateLimiter()
+    assert not limiter.enabled
+    start = time.monotonic()
+    for _ in range(1000):
+        limiter.request('host')
+        limiter.transfer('host', 10 ** 9)
+    assert time.monotonic() - start < 0.5
+
+
+def test_rate_limiter_per_host():
+    limiter = RateLimiter(host_requests=20)
+    assert limiter.enabled
+    start = time.monotonic()
+    for _ in range(20):
+        limiter.request('a')
+    for _ in range(20):
+        limiter.request('b')
+    assert time.monotonic() - start < 0.2
+    limiter.request('a')
+    limiter.request('a')
+    assert time.monotonic() - start >= 0.09
+
+
+def test_rate_limiter_bandwidth():
+    limiter = RateLimiter(bandwidth=1000)
+    start = time.monotonic()
+    limiter.transfer('a', 1000)
+    limiter.transfer('b', 200)
+    assert time.monotonic() - start >= 0.19
+
+
+def test_rate_limiter_parent():
+    parent = RateLimiter(requests=10)
+    first = RateLimiter(parent=parent)
+    second = RateLimiter(host_requests=100, parent=parent)
+    assert first.enabled
+    start = time.monotonic()
+    for _ in range(10):
+        first.request('a')
+        second.request('b')
+    assert time.monotonic() - start >= 0.9
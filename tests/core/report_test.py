@@ -0,0 +1,76 @@
+import json
+import pstats
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from unidown.core.report import RunReport, peak_memory, profile
+
+
+def test_phase():
+    report = RunReport('test')
+    with report.phase('download'):
+        pass
+    with report.phase('check'):
+        pass
+    with report.phase('download'):
+        pass
+    assert list(report.phases) == ['download', 'check']
+    assert all(seconds >= 0 for seconds in report.phases.values())
+
+
+def test_count():
+    report = RunReport('test')
+
+    def count():
+        for _ in range(1000):
+            report.count('downloaded')
+            report.count('bytes', 2)
+
+    threads = [threading.Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert report.counters == {'downloaded': 4000, 'bytes': 8000}
+
+
+def test_to_json():
+    report = RunReport('test')
+    assert report.to_json()['throughput'] is None
+    report.phases['download'] = 2
+    report.count('bytes', 100)
+    report.finish()
+    duration = report.duration
+    data = report.to_json()
+    assert data['name'] == 'test'
+    assert data['duration'] == duration
+    assert data['throughput'] == 50
+    assert data['counters'] == {'bytes': 100}
+    assert data['peakMemory'] == peak_memory()
+
+
+def test_write(tmp_path):
+    RunReport.write(tmp_path.joinpath('report.json'), {'a': RunReport('a'), 'b': RunReport('b')})
+    data = json.loads(tmp_path.joinpath('report.json').read_text(encoding='utf8'))
+    assert list(data['plugins']) == ['a', 'b']
+
+
+def test_profile(tmp_path):
+    with profile(None):
+        pass
+    with profile(tmp_path.joinpath('run.prof')):
+        sum(range(100))
+    assert pstats.Stats(str(tmp_path.joinpath('run.prof'))).total_calls > 0
+
+
+def _thread_work():
+    return sum(range(100))
+
+
+def test_profile_threads(tmp_path):
+    with profile(tmp_path.joinpath('run.prof')):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            for _ in range(4):
+                executor.submit(_thread_work)
+    stats = pstats.Stats(str(tmp_path.joinpath('run.prof')))
+    assert any(function == '_thread_work' for _, _, function in stats.stats)
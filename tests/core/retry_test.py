@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from unidown.core.retry import RetryPolicy
+
+
+def test_init():
+    with pytest.raises(ValueError):
+        RetryPolicy(-1)
+    with pytest.raises(ValueError):
+        RetryPolicy(backoff=-1)
+    policy = RetryPolicy(3, 0.5, 10)
+    assert (policy.retries, policy.backoff, policy.max_delay) == (3, 0.5, 10)
+
+
+def test_is_retryable():
+    policy = RetryPolicy()
+    assert policy.is_retryable(None)
+    assert policy.is_retryable(503)
+    assert policy.is_retryable(429)
+    assert not policy.is_retryable(404)
+
+
+def test_delay():
+    policy = RetryPolicy(3, 1.0, 3.0)
+    for attempt, high in ((1, 1.0), (2, 2.0), (3, 3.0)):
+        for _ in range(20):
+            assert high / 2 <= policy.delay(attempt) <= high
+    assert policy.delay(4) is None
+    # retry after is a lower bound, but not above the max delay
+    assert policy.delay(1, 2.5) == 2.5
+    assert policy.delay(1, 0) <= 1.0
+    assert policy.delay(1, 10) is None
+
+
+def test_parse_retry_after():
+    assert RetryPolicy.parse_retry_after(None) is None
+    assert RetryPolicy.parse_retry_after('') is None
+    assert RetryPolicy.parse_retry_after('invalid') is None
+    assert RetryPolicy.parse_retry_after('120') == 120
+    assert RetryPolicy.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    seconds = RetryPolicy.parse_retry_after(format_datetime(datetime.now(timezone.utc) + timedelta(minutes=1), usegmt=True))
+    assert 50 < seconds <= 60
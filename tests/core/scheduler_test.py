@@ -0,0 +1,31 @@
+from datetime import datetime
+
+import pytest
+
+from unidown.core.scheduler import order_items
+from unidown.plugin.link_item import LinkItem
+
+
+def create_items():
+    sizes = {'a': 30, 'b': None, 'c': 10, 'd': 50, 'e': 20, 'f': 40}
+    return {link: LinkItem(link, datetime(2001, 1, 1), size) for link, size in sizes.items()}
+
+
+def order(schedule):
+    return [link for link, _ in order_items(create_items(), schedule, lambda link, item: item.size, lambda link, item: int(link == 'f'))]
+
+
+def test_order_items():
+    assert order('fifo') == ['a', 'b', 'c', 'd', 'e', 'f']
+    assert order('priority') == ['f', 'a', 'b', 'c', 'd', 'e']
+    assert order('shortest') == ['f', 'c', 'e', 'a', 'd', 'b']
+    assert order('longest') == ['f', 'd', 'a', 'e', 'c', 'b']
+    assert order('interleave') == ['f', 'd', 'c', 'a', 'e', 'b']
+    with pytest.raises(ValueError, match=r"unknown schedule: blub"):
+        order('blub')
+
+
+def test_order_items_interleave():
+    items = {str(size): LinkItem(str(size), datetime(2001, 1, 1)) for size in range(1, 6)}
+    assert [link for link, _ in order_items(items, 'interleave', lambda link, item: int(link), lambda link, item: 0)] == ['5', '1', '4', '2', '3']
+    assert order_items({}, 'interleave', lambda link, item: None, lambda link, item: 0) == []
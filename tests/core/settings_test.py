@@ -1,3 +1,5 @@
+import pytest
+
 from unidown.core.settings import Settings
 
 
@@ -7,3 +9,80 @@ def test_mkdir(tmp_path):
     assert tmp_path.joinpath('downloads').exists()
     assert tmp_path.joinpath('savestates').exists()
     assert tmp_path.joinpath('temp').exists()
+
+
+def test_chunk_size(tmp_path):
+    assert Settings(tmp_path, chunk_size=1).chunk_size == 1
+    with pytest.raises(ValueError, match=r"chunk size must be positive."):
+        Settings(tmp_path, chunk_size=0)
+
+
+def test_download_engine(tmp_path):
+    assert Settings(tmp_path).download_engine == 'thread'
+    assert Settings(tmp_path, download_engine='asyncio').download_engine == 'asyncio'
+    with pytest.raises(ValueError, match=r"unknown download engine: blub"):
+        Settings(tmp_path, download_engine='blub')
+
+
+def test_concurrency(tmp_path):
+    settings = Settings(tmp_path, cores=1, concurrency=16)
+    assert settings.cores == 1
+    assert settings.concurrency == 16
+    assert settings.pool_size == 16
+    assert settings.max_concurrency == 64
+    assert not settings.adaptive
+    settings = Settings(tmp_path, concurrency=2, pool_size=4, adaptive=True, max_concurrency=3)
+    assert settings.pool_size == 4
+    assert settings.max_concurrency == 3
+    assert settings.adaptive
+    assert Settings(tmp_path, concurrency=2, adaptive=True, max_concurrency=16).pool_size == 16
+    with pytest.raises(ValueError, match=r"concurrency must be positive."):
+        Settings(tmp_path, concurrency=0)
+    with pytest.raises(ValueError, match=r"cores must be positive."):
+        Settings(tmp_path, cores=0)
+    with pytest.raises(ValueError, match=r"max concurrency cannot be lower than concurrency."):
+        Settings(tmp_path, concurrency=4, max_concurrency=2)
+
+
+def test_rate_limits(tmp_path):
+    settings = Settings(tmp_path, rate_limit=5, host_bandwidth_limit=1024)
+    assert settings.rate_limit == 5
+    assert settings.bandwidth_limit is None
+    assert settings.host_rate_limit is None
+    assert settings.host_bandwidth_limit == 1024
+    with pytest.raises(ValueError, match=r"rate limits must be positive."):
+        Settings(tmp_path, host_rate_limit=0)
+
+
+def test_savestate_format(tmp_path):
+    assert Settings(tmp_path).savestate_format == 'json'
+    assert Settings(tmp_path, savestate_format='sqlite').savestate_format == 'sqlite'
+    with pytest.raises(ValueError, match=r"unknown savestate format: blub"):
+        Settings(tmp_path, savestate_format='blub')
+
+
+def test_segments(tmp_path):
+    settings = Settings(tmp_path)
+    assert settings.segment_threshold is None
+    assert settings.segments == 4
+    assert Settings(tmp_path, segment_threshold=1024, segments=2).segments == 2
+    with pytest.raises(ValueError, match=r"segment threshold and segments must be positive."):
+        Settings(tmp_path, segment_threshold=0)
+    with pytest.raises(ValueError, match=r"segment threshold and segments must be positive."):
+        Settings(tmp_path, segments=0)
+
+
+def test_schedule(tmp_path):
+    assert Settings(tmp_path).schedule == 'fifo'
+    assert Settings(tmp_path, schedule='longest').schedule == 'longest'
+    with pytest.raises(ValueError, match=r"unknown schedule: blub"):
+        Settings(tmp_path, schedule='blub')
+
+
+def test_progress(tmp_path):
+    settings = Settings(tmp_path)
+    assert settings.progress == 'auto'
+    assert not settings.disable_tqdm
+    assert Settings(tmp_path, progress='none').disable_tqdm
+    with pytest.raises(ValueError, match=r"unknown progress style: blub"):
+        Settings(tmp_path, progress='blub')
@@ -1,4 +1,8 @@
+import json
+import time
+
 import pytest
+from packaging.version import Version
 
 from unidown import static_data
 from unidown.core import updater
@@ -8,3 +12,29 @@ from unidown.core import updater
 def test_check_for_app_updates(version, result):
     static_data.VERSION = version
     assert updater.check_for_app_updates() == result
+
+
+def test_cached_app_version(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(updater, 'get_newest_app_version', lambda timeout: calls.append(timeout) or Version('3.0.0'))
+    cache_file = tmp_path.joinpath('update_check.json')
+    assert updater.get_cached_app_version(cache_file, timeout=1) == Version('3.0.0')
+    assert calls == [1]
+    assert updater.get_cached_app_version(cache_file) == Version('3.0.0')
+    assert len(calls) == 1
+
+    # expired
+    assert updater.get_cached_app_version(cache_file, ttl=0) == Version('3.0.0')
+    assert len(calls) == 2
+
+    cache_file.write_text('broken', encoding='utf8')
+    assert updater.get_cached_app_version(cache_file) == Version('3.0.0')
+    assert len(calls) == 3
+    assert json.loads(cache_file.read_text(encoding='utf8'))['version'] == '3.0.0'
+
+
+def test_cached_app_updates(tmp_path, monkeypatch):
+    monkeypatch.setattr(static_data, 'VERSION', '2.0.0')
+    cache_file = tmp_path.joinpath('update_check.json')
+    cache_file.write_text(json.dumps({'checked': time.time(), 'version': '2.1.0'}), encoding='utf8')
+    assert updater.check_for_app_updates(cache_file)
@@ -3,7 +3,7 @@ import pytest
 from unidown.main import main
 
 
-def test_run(tmp_path):
+def test_run(tmp_path, plugin_host):
     with pytest.raises(SystemExit) as se:
         main(['--root', str(tmp_path), '--plugin', 'test', '-o', 'username=NasuaNasua', '-o', 'username=Nasua', 'Nasua', '--log', 'CRITICAL'])
 
@@ -17,3 +17,12 @@ def test_print_list():
         main(['--list-plugins'])
 
     assert se.value.code == 0
+
+
+def test_plugin_required(capsys):
+    with pytest.raises(SystemExit) as se:
+        main(['--log', 'CRITICAL'])
+    assert se.value.code == 2
+    with pytest.raises(SystemExit) as se:
+        main(['--plugin', 'test', '--all-plugins'])
+    assert se.value.code == 2
@@ -1,12 +1,20 @@
+import base64
+import hashlib
+import json
 import logging
+import os
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 
 import pytest
 from packaging.version import Version
+from urllib3.exceptions import HTTPError
 from unidown_test.plugin import Plugin as TestPlugin
 from unidown_test.savestate import MySaveState
 
+from unidown.core.concurrency import ConcurrencyLimiter
 from unidown.core.manager import get_options
 from unidown.core.settings import Settings
 from unidown.plugin import APlugin, LinkItem, PluginException, PluginInfo
@@ -41,7 +49,7 @@ def test_init_without_param(tmp_path):
     assert plugin.temp_dir.exists() and plugin.temp_dir.is_dir()
     assert plugin.download_dir.exists() and plugin.download_dir.is_dir()
     assert isinstance(plugin.log, logging.Logger)
-    assert plugin.simul_downloads == settings.cores
+    assert plugin.simul_downloads == settings.concurrency
     assert isinstance(plugin.info, PluginInfo)
     assert plugin.host == 'raw.githubusercontent.com'
     assert plugin.name == 'test'
@@ -57,6 +65,9 @@ def test_init_without_param(tmp_path):
 def test_init_with_param(tmp_path):
     plugin = TestPlugin(Settings(tmp_path), get_options([["delay=10.0"]]))
     assert plugin._options['delay'] == 10.0
+    assert plugin._rate_limiter.host_requests == 0.1
+    plugin = TestPlugin(Settings(tmp_path, host_rate_limit=0.05), get_options([["delay=10.0"]]))
+    assert plugin._rate_limiter.host_requests == 0.05
 
 
 def test_init_without_info(tmp_path):
@@ -71,13 +82,13 @@ def test_init_without_info(tmp_path):
         Plugin(Settings(tmp_path))
 
 
-def test_update_download_data(tmp_path):
+def test_update_download_data(tmp_path, plugin_host):
     plugin = TestPlugin(Settings(tmp_path))
     plugin.update_download_data()
     assert all([a == b for a, b in zip(plugin.download_data.items(), eg_data.items())])
 
 
-def test_update_last_update(tmp_path):
+def test_update_last_update(tmp_path, plugin_host):
     plugin = TestPlugin(Settings(tmp_path))
     plugin.update_last_update()
     result = datetime(1999, 9, 9, hour=9, minute=9, second=9)
@@ -111,11 +122,11 @@ def test_clean_up(tmp_path):
     create_test_file(plugin._temp_dir.joinpath('testfile'))
     plugin.clean_up()
 
-    assert plugin._downloader.pool is None
+    assert len(plugin._downloader.pools) == 0
     assert not plugin._temp_dir.exists()
 
 
-def test_download_as_file(tmp_path):
+def test_download_as_file(tmp_path, plugin_host):
     plugin = TestPlugin(Settings(tmp_path))
     plugin.download_as_file('/IceflowRE/unidown/main/README.rst', plugin._temp_dir.joinpath('file.test'))
     plugin.download_as_file('/IceflowRE/unidown/main/README.rst', plugin._temp_dir.joinpath('file.test'))
@@ -125,9 +136,12 @@ def test_download_as_file(tmp_path):
     assert plugin._temp_dir.joinpath('file_r_r.test').exists()
 
 
-def test_download(tmp_path):
-    plugin = TestPlugin(Settings(tmp_path))
-    plugin.download(eg_data, plugin._temp_dir, 'Down units', 'unit')
+def test_download(tmp_path, plugin_host):
+    plugin = TestPlugin(Settings(tmp_path, retries=0))
+    # the downloads store size and hash into the items, so the shared example data is not used directly
+    plugin.download(LinkItemDict({link: LinkItem(item.name, item.time) for link, item in eg_data.items()}), plugin._temp_dir, 'Down units', 'unit')
+    assert plugin._temp_dir.joinpath('README.rst').exists()
+    assert list(plugin.failed_downloads) == ['/IceflowRE/unidown/main/missing']
 
 
 class TestSaveState:
@@ -145,9 +159,10 @@ class TestSaveState:
             json_data = reader.read()
         assert json_data == '{"meta": {"version": "1"}, "pluginInfo": {"name": "test", "version": "0.1.0", "host": "raw.githubusercontent.com"}, "lastUpdate": "19700101T000000.000000Z", "linkItems": {"/IceflowRE/unidown/main/README.rst": {"name": "README.rst", "time": "20010101T010101.000000Z"}, "/IceflowRE/unidown/main/LICENSE.md": {"name": "README.rst", "time": "20010101T010101.000000Z"}, "/IceflowRE/unidown/main/missing": {"name": "missing", "time": "20020202T020202.000000Z"}}, "username": ""}'
 
+    @pytest.mark.parametrize('savestate_format', ['json', 'sqlite', 'binary', 'binary-gzip'])
     @pytest.mark.parametrize('data', [LinkItemDict(), eg_data])
-    def test_normal(self, tmp_path, data):
-        plugin = TestPlugin(Settings(tmp_path))
+    def test_normal(self, tmp_path, data, savestate_format):
+        plugin = TestPlugin(Settings(tmp_path, savestate_format=savestate_format))
         plugin._username = 'Nasua Nasua'
         plugin.update_savestate(data)
         plugin.save_savestate()
@@ -169,6 +184,86 @@ class TestSaveState:
         with pytest.raises(PluginException):
             plugin.load_savestate()
 
+    def test_journal(self, tmp_path, http_server):
+        for number in range(5):
+            http_server.root.joinpath(str(number)).write_bytes(b'data')
+        link_items = LinkItemDict({f"{http_server.url}/{number}": LinkItem(f"file_{number}", datetime(2001, 1, 1)) for number in range(5)})
+        plugin = TestPlugin(Settings(tmp_path))
+        plugin.download(link_items, plugin.download_dir, 'Down units', 'unit', journal=True)
+        assert plugin._savestate_backend.journal_file.exists()
+        assert not plugin._savestate_file.exists()
+
+        # interrupted run, a new one continues with the journaled items
+        plugin = TestPlugin(Settings(tmp_path))
+        plugin.load_savestate()
+        assert plugin.savestate.link_items == link_items
+        assert LinkItemDict.get_new_items(plugin.savestate.link_items, link_items) == LinkItemDict()
+        plugin.save_savestate()
+        assert not plugin._savestate_backend.journal_file.exists()
+        plugin = TestPlugin(Settings(tmp_path))
+        plugin.load_savestate()
+        assert plugin.savestate.link_items == link_items
+
+    def test_journal_sqlite(self, tmp_path):
+        plugin = TestPlugin(Settings(tmp_path, savestate_format='sqlite'))
+        plugin.load_savestate()
+        plugin.journal_item('a', LinkItem('a', datetime(2001, 1, 1)))
+        plugin.clean_up()
+
+        plugin = TestPlugin(Settings(tmp_path, savestate_format='sqlite'))
+        plugin.load_savestate()
+        assert plugin.savestate.link_items == LinkItemDict({'a': LinkItem('a', datetime(2001, 1, 1))})
+        plugin.clean_up()
+
+    def test_journal_compaction(self, tmp_path):
+        plugin = TestPlugin(Settings(tmp_path))
+        plugin._savestate_backend.compaction = 2
+        plugin.journal_item('a', LinkItem('a', datetime(2001, 1, 1)))
+        assert plugin._savestate_backend.journal_file.exists()
+        plugin.journal_item('b', LinkItem('b', datetime(2001, 1, 1)))
+        assert not plugin._savestate_backend.journal_file.exists()
+        plugin.journal_item('c', LinkItem('c', datetime(2001, 1, 1)))
+        with plugin._savestate_backend.journal_file.open('a', encoding='utf8') as writer:
+            writer.write('{"link": "d", "it')
+
+        plugin = TestPlugin(Settings(tmp_path))
+        plugin.load_savestate()
+        assert list(plugin.savestate.link_items.keys()) == ['a', 'b', 'c']
+
+    def test_journal_compaction_concurrent(self, tmp_path, monkeypatch):
+        # items are journaled further while the savestate is compacted
+        plugin = TestPlugin(Settings(tmp_path))
+        plugin._savestate_backend.compaction = 2
+        compacting = threading.Event()
+        proceed = threading.Event()
+        compact = plugin._savestate_backend.compact
+
+        def blocking_compact(savestate):
+            compacting.set()
+            assert proceed.wait(10)
+            compact(savestate)
+
+        monkeypatch.setattr(plugin._savestate_backend, 'compact', blocking_compact)
+        plugin.journal_item('a', LinkItem('a', datetime(2001, 1, 1)))
+        compaction = threading.Thread(target=plugin.journal_item, args=('b', LinkItem('b', datetime(2001, 1, 1))))
+        compaction.start()
+        assert compacting.wait(10)
+        for link in ('c', 'd', 'e'):
+            plugin.journal_item(link, LinkItem(link, datetime(2001, 1, 1)))
+        proceed.set()
+        compaction.join()
+
+        plugin = TestPlugin(Settings(tmp_path))
+        plugin.load_savestate()
+        assert list(plugin.savestate.link_items) == ['a', 'b', 'c', 'd', 'e']
+
+    def test_journal_broken(self, tmp_path):
+        plugin = TestPlugin(Settings(tmp_path))
+        with plugin._savestate_backend.journal_file.open('w', encoding='utf8') as writer:
+            writer.write('broken\n{"link": "a", "item": {"name": "a", "time": "20010101T010101.000000Z"}}\n')
+        with pytest.raises(PluginException):
+            plugin.load_savestate()
+
     def test_json_error_2(self, tmp_path):
         plugin = TestPlugin(Settings(tmp_path))
         with plugin._savestate_file.open('wb') as writer:
@@ -194,3 +289,486 @@ def test_load_default_options(tmp_path, caplog):
 
 def test_get_plugins():
     assert 'test' in APlugin.get_plugins()
+
+
+def test_download_as_file_streamed(tmp_path, http_server):
+    content = bytes(range(256)) * 4096
+    http_server.root.joinpath('big.bin').write_bytes(content)
+    plugin = TestPlugin(Settings(tmp_path, chunk_size=1000))
+    plugin.download_as_file(http_server.url + '/big.bin', plugin._temp_dir.joinpath('big.bin'))
+    assert plugin._temp_dir.joinpath('big.bin').read_bytes() == content
+
+
+def test_download_as_file_resume(tmp_path, http_server):
+    content = b'0123456789' * 100
+    http_server.root.joinpath('file.bin').write_bytes(content)
+    http_server.extra_headers['/file.bin'] = {'ETag': '"v1"'}
+    plugin = TestPlugin(Settings(tmp_path))
+    target = plugin.download_dir.joinpath('file.bin')
+    part_file = plugin._part_file(http_server.url + '/file.bin', target)
+    part_file.write_bytes(content[:300])
+    part_file.with_suffix(APlugin.VALIDATOR_SUFFIX).write_text('"v1"')
+
+    plugin.download_as_file(http_server.url + '/file.bin', target)
+    assert http_server.range_requests == ['bytes=300-']
+    assert target.read_bytes() == content
+    assert not part_file.exists()
+    assert not part_file.with_suffix(APlugin.VALIDATOR_SUFFIX).exists()
+
+
+def test_download_as_file_resume_changed(tmp_path, http_server):
+    http_server.root.joinpath('file.bin').write_bytes(b'NEWNEWNEWNEW')
+    http_server.extra_headers['/file.bin'] = {'ETag': '"v2"'}
+    plugin = TestPlugin(Settings(tmp_path))
+    target = plugin.download_dir.joinpath('file.bin')
+    part_file = plugin._part_file(http_server.url + '/file.bin', target)
+
+    # the part belongs to an older content
+    part_file.write_bytes(b'OLDOLD')
+    part_file.with_suffix(APlugin.VALIDATOR_SUFFIX).write_text('"v1"')
+    plugin.download_as_file(http_server.url + '/file.bin', target)
+    assert http_server.range_requests == ['bytes=6-']
+    assert target.read_bytes() == b'NEWNEWNEWNEW'
+    target.unlink()
+
+    # without a validator it is unknown to which content the part belongs
+    part_file.write_bytes(b'OLDOLD')
+    plugin.download_as_file(http_server.url + '/file.bin', target)
+    assert http_server.range_requests == ['bytes=6-']
+    assert target.read_bytes() == b'NEWNEWNEWNEW'
+
+
+def test_download_as_file_resume_stale(tmp_path, http_server):
+    content = b'0123456789'
+    http_server.root.joinpath('file.bin').write_bytes(content)
+    plugin = TestPlugin(Settings(tmp_path))
+    target = plugin.download_dir.joinpath('file.bin')
+    plugin._part_file(http_server.url + '/file.bin', target).write_bytes(b'x' * 20)
+
+    plugin.download_as_file(http_server.url + '/file.bin', target)
+    assert target.read_bytes() == content
+
+
+def test_download_as_file_hash(tmp_path, http_server):
+    content = b'0123456789' * 100
+    http_server.root.joinpath('file.bin').write_bytes(content)
+    http_server.extra_headers['/file.bin'] = {'ETag': '"v1"'}
+    plugin = TestPlugin(Settings(tmp_path, chunk_size=64))
+    target = plugin.download_dir.joinpath('file.bin')
+    part_file = plugin._part_file(http_server.url + '/file.bin', target)
+    part_file.write_bytes(content[:300])
+    part_file.with_suffix(APlugin.VALIDATOR_SUFFIX).write_text('"v1"')
+
+    item = LinkItem('file.bin', datetime(2001, 1, 1))
+    plugin.download_as_file(http_server.url + '/file.bin', target, item=item)
+    assert http_server.range_requests == ['bytes=300-']
+    assert item.size == len(content)
+    assert item.hash == hashlib.sha256(content).hexdigest()
+
+
+def test_download_as_file_truncated(tmp_path, http_server):
+    content = b'0123456789' * 100
+    http_server.root.joinpath('file.bin').write_bytes(content)
+    os.utime(http_server.root.joinpath('file.bin'), (1000000000, 1000000000))
+    http_server.truncated['/file.bin'] = 1
+    plugin = TestPlugin(Settings(tmp_path))
+    target = plugin.download_dir.joinpath('file.bin')
+    with pytest.raises(HTTPError, match=r"incomplete content, 500 of 1000 bytes"):
+        plugin.download_as_file(http_server.url + '/file.bin', target)
+    assert not target.exists()
+    # the received part is kept with its validator to be resumed
+    part_file = plugin._part_file(http_server.url + '/file.bin', target)
+    assert part_file.read_bytes() == content[:500]
+    assert part_file.with_suffix(APlugin.VALIDATOR_SUFFIX).read_text() == 'Sun, 09 Sep 2001 01:46:40 GMT'
+
+    plugin.download_as_file(http_server.url + '/file.bin', target)
+    assert http_server.range_requests == ['bytes=500-']
+    assert target.read_bytes() == content
+    assert not part_file.exists()
+
+
+def test_download_truncated_retry(tmp_path, http_server):
+    content = b'0123456789' * 100
+    http_server.root.joinpath('file.bin').write_bytes(content)
+    http_server.truncated['/file.bin'] = 1
+    plugin = TestPlugin(Settings(tmp_path, retry_backoff=0))
+    link_items = LinkItemDict({http_server.url + '/file.bin': LinkItem('file.bin', datetime(2001, 1, 1))})
+    plugin.download(link_items, plugin.download_dir, 'Down units', 'unit')
+    assert plugin.download_dir.joinpath('file.bin').read_bytes() == content
+    assert http_server.range_requests == ['bytes=500-']
+
+
+def test_download_as_file_digest(tmp_path, http_server):
+    content = b'0123456789' * 100
+    http_server.root.joinpath('file.bin').write_bytes(content)
+    plugin = TestPlugin(Settings(tmp_path))
+    target = plugin.download_dir.joinpath('file.bin')
+
+    digest = base64.b64encode(hashlib.sha512(content).digest()).decode()
+    http_server.extra_headers['/file.bin'] = {'Digest': f"unknown=abc, SHA-512={digest}"}
+    plugin.download_as_file(http_server.url + '/file.bin', target)
+    assert target.read_bytes() == content
+    target.unlink()
+
+    http_server.extra_headers['/file.bin'] = {'Digest': f"md5={base64.b64encode(hashlib.md5(b'other').digest()).decode()}"}
+    with pytest.raises(HTTPError, match=r"md5 digest"):
+        plugin.download_as_file(http_server.url + '/file.bin', target)
+    assert not target.exists()
+
+
+def test_download_as_file_last_modified(tmp_path, http_server):
+    http_server.root.joinpath('file.bin').write_bytes(b'remote')
+    plugin = TestPlugin(Settings(tmp_path))
+    target = plugin.download_dir.joinpath('file.bin')
+    previous = LinkItem('file.bin', datetime(2001, 1, 1))
+    plugin.download_as_file(http_server.url + '/file.bin', target, item=previous)
+    assert previous.last_modified is not None
+    assert previous.etag is None
+
+    target.write_bytes(b'local')
+    item = LinkItem('file.bin', datetime(2002, 2, 2))
+    plugin.download_as_file(http_server.url + '/file.bin', target, item=item, previous=previous)
+    assert http_server.conditional_requests == ['/file.bin']
+    assert target.read_bytes() == b'local'
+    assert item.to_json() == {**previous.to_json(), 'time': item.to_json()['time']}
+
+
+def test_download_as_file_etag(tmp_path, http_server):
+    http_server.root.joinpath('file.bin').write_bytes(b'version 1')
+    http_server.extra_headers['/file.bin'] = {'ETag': '"v1"'}
+    plugin = TestPlugin(Settings(tmp_path))
+    target = plugin.download_dir.joinpath('file.bin')
+    previous = LinkItem('file.bin', datetime(2001, 1, 1))
+    plugin.download_as_file(http_server.url + '/file.bin', target, item=previous)
+    assert previous.etag == '"v1"'
+
+    item = LinkItem('file.bin', datetime(2001, 1, 1))
+    plugin.download_as_file(http_server.url + '/file.bin', target, item=item, previous=previous)
+    assert item.etag == '"v1"'
+    assert item.size == len(b'version 1')
+
+    http_server.root.joinpath('file.bin').write_bytes(b'version 2')
+    http_server.extra_headers['/file.bin'] = {'ETag': '"v2"'}
+    target.unlink()
+    plugin.download_as_file(http_server.url + '/file.bin', target, item=item, previous=previous)
+    assert http_server.conditional_requests == ['/file.bin']
+    assert target.read_bytes() == b'version 2'
+    assert item.etag == '"v2"'
+
+
+def test_download_as_file_replace_previous(tmp_path, http_server):
+    http_server.root.joinpath('file.bin').write_bytes(b'version 1')
+    http_server.extra_headers['/file.bin'] = {'ETag': '"v1"'}
+    plugin = TestPlugin(Settings(tmp_path))
+    target = plugin.download_dir.joinpath('file.bin')
+    previous = LinkItem('file.bin', datetime(2001, 1, 1))
+    plugin.download_as_file(http_server.url + '/file.bin', target, item=previous)
+
+    http_server.root.joinpath('file.bin').write_bytes(b'version 2')
+    http_server.extra_headers['/file.bin'] = {'ETag': '"v2"'}
+    plugin.download_as_file(http_server.url + '/file.bin', target, item=LinkItem('file.bin', datetime(2002, 2, 2)), previous=previous)
+    assert http_server.conditional_requests == ['/file.bin']
+    assert target.read_bytes() == b'version 2'
+    assert list(plugin.download_dir.iterdir()) == [target]
+
+
+def test_download_conditional(tmp_path, http_server):
+    http_server.root.joinpath('file.bin').write_bytes(b'content')
+    http_server.extra_headers['/file.bin'] = {'ETag': '"v1"'}
+    link = http_server.url + '/file.bin'
+    plugin = TestPlugin(Settings(tmp_path))
+    plugin.download(LinkItemDict({link: LinkItem('file.bin', datetime(2001, 1, 1))}), plugin.download_dir, 'Down units', 'unit', journal=True)
+    assert plugin.savestate.link_items[link].etag == '"v1"'
+
+    new_items = LinkItemDict({link: LinkItem('file.bin', datetime(2002, 2, 2))})
+    plugin.download(new_items, plugin.download_dir, 'Down units', 'unit', journal=True)
+    assert http_server.conditional_requests == ['/file.bin']
+    assert new_items[link].etag == '"v1"'
+    succeeded, _ = plugin.check_download(new_items, plugin.download_dir)
+    assert link in succeeded
+    assert list(plugin.download_dir.iterdir()) == [plugin.download_dir.joinpath('file.bin')]
+
+
+def test_check_download_size(tmp_path):
+    plugin = TestPlugin(Settings(tmp_path))
+    plugin.download_dir.joinpath('complete').write_bytes(b'1234')
+    plugin.download_dir.joinpath('truncated').write_bytes(b'12')
+    plugin.download_dir.joinpath('unknown').write_bytes(b'')
+    link_items = LinkItemDict({
+        'complete': LinkItem('complete', datetime(2001, 1, 1), size=4),
+        'truncated': LinkItem('truncated', datetime(2001, 1, 1), size=4),
+        'unknown': LinkItem('unknown', datetime(2001, 1, 1)),
+        'missing': LinkItem('missing', datetime(2001, 1, 1), size=4),
+    })
+    succeeded, failed = plugin.check_download(link_items, plugin.download_dir)
+    assert list(succeeded) == ['complete', 'unknown']
+    assert list(failed) == ['truncated', 'missing']
+
+
+def test_download_as_file_failed(tmp_path, http_server):
+    plugin = TestPlugin(Settings(tmp_path))
+    target = plugin.download_dir.joinpath('missing')
+    with pytest.raises(HTTPError):
+        plugin.download_as_file(http_server.url + '/missing', target)
+    assert not target.exists()
+
+
+def test_clean_up_keeps_part_files(tmp_path, http_server):
+    plugin = TestPlugin(Settings(tmp_path))
+    create_test_file(plugin._temp_dir.joinpath('testfile'))
+    create_test_file(plugin._temp_dir.joinpath('file.bin.0123' + APlugin.PART_SUFFIX))
+    create_test_file(plugin._temp_dir.joinpath('file.bin.0123' + APlugin.VALIDATOR_SUFFIX))
+    with pytest.raises(HTTPError):
+        plugin.download_as_file(http_server.url + '/missing', plugin.download_dir.joinpath('missing'))
+    # as if the download was interrupted
+    part_file = plugin._part_file(http_server.url + '/missing', plugin.download_dir.joinpath('missing'))
+    create_test_file(part_file)
+    create_test_file(part_file.with_suffix(APlugin.VALIDATOR_SUFFIX))
+    plugin.clean_up()
+
+    # only the partial downloads of this run are kept
+    assert sorted(path.name for path in plugin._temp_dir.iterdir()) == [part_file.name, part_file.with_suffix(APlugin.VALIDATOR_SUFFIX).name]
+
+
+@pytest.mark.parametrize('engine', ['thread', 'asyncio'])
+def test_download_engine(tmp_path, http_server, engine):
+    for number in range(10):
+        http_server.root.joinpath(str(number)).write_bytes(str(number).encode())
+    link_items = LinkItemDict({f"{http_server.url}/{number}": LinkItem(f"file_{number}", datetime(2001, 1, 1)) for number in range(10)})
+    link_items[http_server.url + '/missing'] = LinkItem('missing', datetime(2001, 1, 1))
+    plugin = TestPlugin(Settings(tmp_path, download_engine=engine))
+    assert plugin.engine == engine
+
+    plugin.download(link_items, plugin.download_dir, 'Down units', 'unit')
+    succeeded, failed = plugin.check_download(link_items, plugin.download_dir)
+    assert len(succeeded) == 10
+    assert list(failed.keys()) == [http_server.url + '/missing']
+    for number in range(10):
+        assert plugin.download_dir.joinpath(f"file_{number}").read_bytes() == str(number).encode()
+
+
+@pytest.mark.parametrize('engine', ['thread', 'asyncio'])
+def test_download_iterable(tmp_path, http_server, engine):
+    for number in range(10):
+        http_server.root.joinpath(str(number)).write_bytes(str(number).encode())
+    plugin = TestPlugin(Settings(tmp_path, download_engine=engine, concurrency=2))
+    created = []
+
+    def links():
+        for number in range(10):
+            created.append(number)
+            yield f"{http_server.url}/{number}", LinkItem(f"file_{number}", datetime(2001, 1, 1))
+
+    plugin.download(links(), plugin.download_dir, 'Down units', 'unit')
+    assert created == list(range(10))
+    for number in range(10):
+        assert plugin.download_dir.joinpath(f"file_{number}").read_bytes() == str(number).encode()
+
+
+@pytest.mark.parametrize('engine', ['thread', 'asyncio'])
+def test_download_retry(tmp_path, http_server, engine):
+    http_server.root.joinpath('file.bin').write_bytes(b'data')
+    http_server.unavailable['/file.bin'] = 2
+    http_server.extra_headers['/file.bin'] = {'Retry-After': '0'}
+    link_items = LinkItemDict({
+        http_server.url + '/file.bin': LinkItem('file.bin', datetime(2001, 1, 1)),
+        http_server.url + '/missing': LinkItem('missing', datetime(2001, 1, 1)),
+    })
+    plugin = TestPlugin(Settings(tmp_path, download_engine=engine, retry_backoff=0))
+    plugin.download(link_items, plugin.download_dir, 'Down units', 'unit')
+    assert plugin.download_dir.joinpath('file.bin').read_bytes() == b'data'
+    # not found is not temporary
+    assert plugin.failed_downloads == {http_server.url + '/missing': f"{http_server.url}/missing | 404"}
+    assert plugin.report.counters['requeued'] == 2
+    assert plugin.report.counters['failed'] == 3
+
+
+def test_download_retry_exhausted(tmp_path, http_server):
+    http_server.root.joinpath('file.bin').write_bytes(b'data')
+    http_server.unavailable['/file.bin'] = 3
+    plugin = TestPlugin(Settings(tmp_path, retries=1, retry_backoff=0))
+    link_items = LinkItemDict({http_server.url + '/file.bin': LinkItem('file.bin', datetime(2001, 1, 1))})
+    plugin.download(link_items, plugin.download_dir, 'Down units', 'unit')
+    assert plugin.failed_downloads == {http_server.url + '/file.bin': f"{http_server.url}/file.bin | 503"}
+    assert http_server.unavailable['/file.bin'] == 1
+
+    # a server which demands to wait too long, is not retried
+    http_server.extra_headers['/file.bin'] = {'Retry-After': '3600'}
+    plugin.download(link_items, plugin.download_dir, 'Down units', 'unit')
+    assert http_server.unavailable['/file.bin'] == 0
+    assert not plugin.download_dir.joinpath('file.bin').exists()
+
+    plugin.download(link_items, plugin.download_dir, 'Down units', 'unit')
+    assert plugin.failed_downloads == {}
+    assert plugin.download_dir.joinpath('file.bin').read_bytes() == b'data'
+
+
+def test_download_as_file_segmented(tmp_path, http_server):
+    content = bytes(range(256)) * 40
+    http_server.root.joinpath('file.bin').write_bytes(content)
+    http_server.root.joinpath('small.bin').write_bytes(b'small')
+    http_server.extra_headers['/file.bin'] = {'Accept-Ranges': 'bytes'}
+    http_server.extra_headers['/small.bin'] = {'Accept-Ranges': 'bytes'}
+    plugin = TestPlugin(Settings(tmp_path, chunk_size=1000, segment_threshold=1000, segments=3))
+    target = plugin.download_dir.joinpath('file.bin')
+    item = LinkItem('file.bin', datetime(2001, 1, 1))
+    plugin.download_as_file(http_server.url + '/file.bin', target, item=item)
+    assert target.read_bytes() == content
+    assert sorted(http_server.range_requests) == ['bytes=0-3413', 'bytes=3414-6827', 'bytes=6828-10239']
+    assert item.size == len(content)
+    assert item.hash is None
+    assert item.last_modified is not None
+    assert plugin.report.counters['segmented'] == 1
+    assert plugin.report.counters['bytes'] == len(content)
+    assert not list(plugin.temp_dir.iterdir())
+
+    # small files are downloaded at once
+    plugin.download_as_file(http_server.url + '/small.bin', plugin.download_dir.joinpath('small.bin'))
+    assert plugin.download_dir.joinpath('small.bin').read_bytes() == b'small'
+    assert len(http_server.range_requests) == 3
+
+    # not modified
+    new_item = LinkItem('file.bin', datetime(2001, 1, 1))
+    plugin.download_as_file(http_server.url + '/file.bin', target, item=new_item, previous=item)
+    assert plugin.report.counters['not_modified'] == 1
+    assert new_item.size == len(content)
+
+    # the digest is verified
+    http_server.extra_headers['/file.bin']['Digest'] = f"sha-256={base64.b64encode(hashlib.sha256(content).digest()).decode()}"
+    target.unlink()
+    plugin.download_as_file(http_server.url + '/file.bin', target, item=item)
+    assert item.hash == hashlib.sha256(content).hexdigest()
+    http_server.extra_headers['/file.bin']['Digest'] = f"md5={base64.b64encode(hashlib.md5(b'other').digest()).decode()}"
+    target.unlink()
+    with pytest.raises(HTTPError, match=r"md5 digest"):
+        plugin.download_as_file(http_server.url + '/file.bin', target)
+    assert not target.exists()
+    assert not list(plugin.temp_dir.iterdir())
+
+
+def test_download_segmented_hash_cores(tmp_path, http_server):
+    # the segmented files are hashed after the download, at most one at a time with one core
+    content = bytes(range(256)) * 40
+    digest = f"sha-256={base64.b64encode(hashlib.sha256(content).digest()).decode()}"
+    link_items = LinkItemDict()
+    for number in range(4):
+        http_server.root.joinpath(f"{number}.bin").write_bytes(content)
+        http_server.extra_headers[f"/{number}.bin"] = {'Accept-Ranges': 'bytes', 'Digest': digest}
+        link_items[f"{http_server.url}/{number}.bin"] = LinkItem(f"{number}.bin", datetime(2001, 1, 1))
+    plugin = TestPlugin(Settings(tmp_path, cores=1, concurrency=4, segment_threshold=1000, segments=2))
+    slots = plugin._hash_slots
+    hashing = {'active': 0, 'max': 0}
+
+    class ObservedSlots:
+        def __enter__(self):
+            slots.acquire()
+            hashing['active'] += 1
+            hashing['max'] = max(hashing['max'], hashing['active'])
+            time.sleep(0.05)
+
+        def __exit__(self, *args):
+            hashing['active'] -= 1
+            slots.release()
+
+    plugin._hash_slots = ObservedSlots()
+    plugin.download(link_items, plugin.download_dir, 'Down units', 'unit')
+    assert len(plugin.check_download(link_items, plugin.download_dir)[0]) == 4
+    assert plugin.report.counters['segmented'] == 4
+    assert hashing['max'] == 1
+
+
+def test_download_as_file_segmented_no_ranges(tmp_path, http_server):
+    content = b'0123456789' * 200
+    http_server.root.joinpath('file.bin').write_bytes(content)
+    plugin = TestPlugin(Settings(tmp_path, segment_threshold=1000))
+    plugin.download_as_file(http_server.url + '/file.bin', plugin.download_dir.joinpath('file.bin'))
+    assert plugin.download_dir.joinpath('file.bin').read_bytes() == content
+    assert http_server.range_requests == []
+    assert 'segmented' not in plugin.report.counters
+
+
+@pytest.mark.parametrize('engine', ['thread', 'asyncio'])
+def test_download_schedule(tmp_path, monkeypatch, engine):
+    plugin = TestPlugin(Settings(tmp_path, download_engine=engine, concurrency=1, schedule='longest'))
+    plugin.savestate.link_items['/big'] = LinkItem('big', datetime(2001, 1, 1), 1000)
+    link_items = LinkItemDict({
+        '/unknown': LinkItem('unknown', datetime(2001, 1, 1)),
+        '/small': LinkItem('small', datetime(2001, 1, 1), 10),
+        '/big': LinkItem('big', datetime(2002, 1, 1)),
+        '/important': LinkItem('important', datetime(2001, 1, 1)),
+    })
+    downloaded = []
+    monkeypatch.setattr(plugin, 'priority', lambda link, item: int(link == '/important'))
+    monkeypatch.setattr(plugin, 'download_as_file', lambda url, *args, **kwargs: downloaded.append(url))
+    plugin.download(link_items, plugin.download_dir, 'Down units', 'unit')
+    assert downloaded == ['/important', '/big', '/small', '/unknown']
+
+
+def test_download_progress(tmp_path, http_server, capsys):
+    http_server.root.joinpath('file.bin').write_bytes(b'data')
+    http_server.unavailable['/file.bin'] = 1
+    plugin = TestPlugin(Settings(tmp_path, progress='json', retry_backoff=0))
+    plugin.download(LinkItemDict({http_server.url + '/file.bin': LinkItem('file.bin', datetime(2001, 1, 1))}), plugin.download_dir,
+                    'Down units', 'unit')
+    event = json.loads(capsys.readouterr().out.splitlines()[-1])
+    assert (event['desc'], event['done'], event['total'], event['finished']) == ('Down units', 2, 2, True)
+
+
+def test_iter_download_data(tmp_path, monkeypatch):
+    plugin = TestPlugin(Settings(tmp_path))
+    assert not plugin.streaming
+    monkeypatch.setattr(plugin, '_create_download_data', lambda: LinkItemDict(eg_data))
+    assert list(plugin.iter_download_data()) == list(eg_data.items())
+    assert plugin.download_data == eg_data
+
+
+def test_download_adaptive(tmp_path, http_server):
+    for number in range(20):
+        http_server.root.joinpath(str(number)).write_bytes(b'x' * 1000)
+    link_items = LinkItemDict({f"{http_server.url}/{number}": LinkItem(f"file_{number}", datetime(2001, 1, 1)) for number in range(20)})
+    plugin = TestPlugin(Settings(tmp_path, concurrency=2, adaptive=True, max_concurrency=4))
+    plugin.download(link_items, plugin.download_dir, 'Down units', 'unit')
+    succeeded, _ = plugin.check_download(link_items, plugin.download_dir)
+    assert len(succeeded) == 20
+
+
+def test_download_adaptive_parallel(tmp_path, http_server):
+    # the connection pool of a host must not cap the adaptive mode at the initial concurrency
+    http_server.delay = 0.2
+    for number in range(16):
+        http_server.root.joinpath(str(number)).write_bytes(b'x')
+    link_items = LinkItemDict({f"{http_server.url}/{number}": LinkItem(f"file_{number}", datetime(2001, 1, 1)) for number in range(16)})
+    plugin = TestPlugin(Settings(tmp_path, concurrency=2, adaptive=True, max_concurrency=16))
+    plugin.limiter = ConcurrencyLimiter(16)
+    plugin.download(link_items, plugin.download_dir, 'Down units', 'unit')
+    assert len(plugin.check_download(link_items, plugin.download_dir)[0]) == 16
+    assert http_server.max_active > 2
+
+
+def test_download_shared_limiter(tmp_path, http_server):
+    for number in range(4):
+        http_server.root.joinpath(str(number)).write_bytes(b'x')
+    limiter = ConcurrencyLimiter(1)
+    plugins = [TestPlugin(Settings(tmp_path.joinpath(str(number)))) for number in range(2)]
+    for plugin in plugins:
+        plugin.limiter = limiter
+        assert plugin.limiter is limiter
+        link_items = LinkItemDict({f"{http_server.url}/{number}": LinkItem(f"file_{number}", datetime(2001, 1, 1)) for number in range(4)})
+        plugin.download(link_items, plugin.download_dir, 'Down units', 'unit')
+        assert len(plugin.check_download(link_items, plugin.download_dir)[0]) == 4
+
+
+def test_absolute_url(tmp_path):
+    plugin = TestPlugin(Settings(tmp_path))
+    assert plugin.absolute_url('/IceflowRE/unidown') == 'https://raw.githubusercontent.com/IceflowRE/unidown'
+    assert plugin.absolute_url('http://mirror.org/file?from=https://cdn.org') == 'http://mirror.org/file?from=https://cdn.org'
+    assert plugin.absolute_url('/file?from=https://cdn.org') == 'https://raw.githubusercontent.com/file?from=https://cdn.org'
+
+
+def test_download_as_file_redirect(tmp_path, http_server):
+    http_server.root.joinpath('file.bin').write_bytes(b'content')
+    plugin = TestPlugin(Settings(tmp_path, pool_size=1))
+    for number in range(3):
+        plugin.download_as_file(http_server.url + '/redirect/file.bin', plugin.download_dir.joinpath(f"file_{number}"))
+        assert plugin.download_dir.joinpath(f"file_{number}").read_bytes() == b'content'
+    assert len(plugin._downloader.pools) == 2
@@ -5,7 +5,7 @@ import pytest
 
 from unidown.core import manager
 from unidown.plugin.link_item import LinkItem
-from unidown.plugin.link_item_dict import LinkItemDict
+from unidown.plugin.link_item_dict import LinkItemDict, UniqueNames
 
 eg_data = LinkItemDict({
     '/IceflowRE/unidown/main/README.rst': LinkItem('README.rst', datetime(2001, 1, 1, hour=1, minute=1, second=1)),
@@ -57,6 +57,32 @@ def test_get_new_items(old_data, new_data, result):
     assert LinkItemDict.get_new_items(old_data, new_data) == result
 
 
+def test_get_new_items_disable_tqdm():
+    old_data = LinkItemDict({'/old': LinkItem('old', datetime(2001, 1, 1))})
+    with pytest.warns(DeprecationWarning, match=r"disable_tqdm"):
+        assert LinkItemDict.get_new_items(old_data, LinkItemDict(), disable_tqdm=True) == LinkItemDict()
+
+
+def test_diff():
+    old_data = LinkItemDict({
+        '/same': LinkItem('same', datetime(2001, 1, 1)),
+        '/newer': LinkItem('newer', datetime(2001, 1, 1)),
+        '/removed': LinkItem('removed', datetime(2001, 1, 1)),
+    })
+    new_data = LinkItemDict({
+        '/added': LinkItem('added', datetime(1999, 1, 1)),
+        '/newer': LinkItem('newer', datetime(2001, 1, 2)),
+        '/same': LinkItem('same', datetime(2001, 1, 1)),
+    })
+    diff = LinkItemDict.diff(old_data, new_data)
+    assert list(diff.new) == ['/added', '/newer']
+    assert diff.updated == {'/newer'}
+    assert diff.removed == {'/removed'}
+    assert LinkItemDict.diff(old_data, new_data, removed=False).removed == set()
+    assert LinkItemDict.diff(old_data, LinkItemDict()) == (LinkItemDict(), set(), set(old_data))
+    assert LinkItemDict.diff(LinkItemDict(), new_data) == (new_data, set(), set())
+
+
 def test_clean_up_names():
     eg_data = LinkItemDict({
         '/IceflowRE/unidown/main/README.rst': LinkItem('README.rst', datetime(2001, 1, 1, hour=1, minute=1, second=1)),
@@ -69,3 +95,46 @@ def test_clean_up_names():
         '/IceflowRE/unidown/main/LICENSE.md': LinkItem('README.rst', datetime(2001, 1, 1, hour=1, minute=1, second=1)),
         '/IceflowRE/unidown/main/missing': LinkItem('missing', datetime(2002, 2, 2, hour=2, minute=2, second=2))
     })
+
+
+def test_clean_up_names_chain():
+    data = LinkItemDict({
+        'a': LinkItem('file.txt', datetime(2001, 1, 1)),
+        'b': LinkItem('file.txt', datetime(2001, 1, 1)),
+        'c': LinkItem('file_d.txt', datetime(2001, 1, 1)),
+        'd': LinkItem('file.txt', datetime(2001, 1, 1)),
+        'e': LinkItem('other', datetime(2001, 1, 1)),
+    })
+    data.clean_up_names()
+    assert [item.name for item in data.values()] == ['file_d_d.txt', 'file_d_d_d.txt', 'file_d.txt', 'file.txt', 'other']
+
+
+def test_clean_up_names_reserved():
+    data = LinkItemDict({
+        'a': LinkItem('file.txt', datetime(2001, 1, 1)),
+        'b': LinkItem('other', datetime(2001, 1, 1)),
+    })
+    data.clean_up_names({'file.txt', 'file_d.txt'})
+    assert [item.name for item in data.values()] == ['file_d_d.txt', 'other']
+
+
+def test_clean_up_names_large():
+    data = LinkItemDict({str(number): LinkItem('same.bin', datetime(2001, 1, 1)) for number in range(2000)})
+    data.clean_up_names()
+    assert len({item.name for item in data.values()}) == 2000
+
+
+def test_unique_names():
+    names = UniqueNames({'taken.rst', 'own.rst'})
+    assert names.use('a.rst') == 'a.rst'
+    assert names.use('a.rst') == 'a_d.rst'
+    assert names.use('a_d.rst') == 'a_d_d.rst'
+    assert names.use('a.rst') == 'a_d_d_d.rst'
+    assert names.use('taken.rst') == 'taken_d.rst'
+    assert names.use('own.rst', 'own.rst') == 'own.rst'
+    assert names.use('own.rst', 'own.rst') == 'own_d.rst'
+
+
+def test_unique_names_large():
+    names = UniqueNames()
+    assert len({names.use('same.bin') for _ in range(2000)}) == 2000
@@ -1,7 +1,9 @@
+import sys
 from datetime import datetime
 
 import pytest
 
+from unidown.plugin import link_item
 from unidown.plugin.link_item import LinkItem
 
 
@@ -30,3 +32,76 @@ def test_time():
     item = LinkItem('name', datetime(1970, 1, 1))
     with pytest.raises(ValueError, match=r"time cannot be None."):
         item.time = None
+
+
+def test_size_hash():
+    item = LinkItem('name', datetime(1970, 1, 1))
+    assert item.to_json() == {'name': 'name', 'time': '19700101T000000.000000Z'}
+    item.size = 4
+    item.hash = 'abc'
+    data = item.to_json()
+    assert data == {'name': 'name', 'time': '19700101T000000.000000Z', 'size': 4, 'hash': 'abc'}
+    loaded = LinkItem.from_json(data)
+    assert loaded.size == 4
+    assert loaded.hash == 'abc'
+    assert loaded == LinkItem('name', datetime(1970, 1, 1))
+
+
+def test_download_info():
+    item = LinkItem('name', datetime(1970, 1, 1))
+    assert (item.size, item.hash, item.etag, item.last_modified) == (None, None, None, None)
+    item.etag = '"v1"'
+    item.size = 4
+    assert (item.size, item.hash, item.etag, item.last_modified) == (4, None, '"v1"', None)
+    assert LinkItem.from_json({'name': 'name', 'time': '19700101T000000.000000Z'}).size is None
+    assert LinkItem.from_trusted('name', datetime(1970, 1, 1)).etag is None
+
+
+def test_validators():
+    item = LinkItem('name', datetime(1970, 1, 1), size=4, digest='abc')
+    item.etag = '"v1"'
+    item.last_modified = 'Thu, 01 Jan 1970 00:00:00 GMT'
+    data = item.to_json()
+    assert data['etag'] == '"v1"'
+    assert data['lastModified'] == 'Thu, 01 Jan 1970 00:00:00 GMT'
+
+    copy = LinkItem('other', datetime(2001, 1, 1))
+    copy.copy_download_info(LinkItem.from_json(data))
+    assert copy.to_json() == {**data, 'name': 'other', 'time': '20010101T000000.000000Z'}
+
+
+def test_slots():
+    item = LinkItem('name', datetime(1970, 1, 1))
+    assert not hasattr(item, '__dict__')
+    with pytest.raises(AttributeError):
+        item.other = 1
+
+
+def test_from_trusted():
+    item = LinkItem.from_trusted('name', datetime(2001, 1, 1, 1, 1, 1))
+    assert item == LinkItem('name', datetime(2001, 1, 1, 1, 1, 1))
+    assert item.to_json() == {'name': 'name', 'time': '20010101T010101.000000Z'}
+
+
+def test_to_json_cached_time():
+    item = LinkItem.from_json({'name': 'name', 'time': '20010101T010101.000000Z'})
+    assert item.to_json() == {'name': 'name', 'time': '20010101T010101.000000Z'}
+    item.time = datetime(2002, 2, 2)
+    assert item.to_json() == {'name': 'name', 'time': '20020202T000000.000000Z'}
+    item = LinkItem.from_json({'name': 'name', 'time': '20010101T010101.1Z'})
+    assert item.to_json() == {'name': 'name', 'time': '20010101T010101.100000Z'}
+
+
+@pytest.mark.parametrize('iso_basic', [True, False])
+@pytest.mark.parametrize('text', ['20010203T040506.000007Z', '19700101T000000.000000Z', '20010203T040506.7Z', '2001023T4056.7Z'])
+def test_parse_time(monkeypatch, iso_basic, text):
+    monkeypatch.setattr(link_item, '_ISO_BASIC_FORMAT', iso_basic and sys.version_info >= (3, 11))
+    assert LinkItem.parse_time(text) == datetime.strptime(text, LinkItem.time_format)
+
+
+@pytest.mark.parametrize('iso_basic', [True, False])
+@pytest.mark.parametrize('text', ['20011303T040506.000007Z', '20010203T040506.00000xZ', '2001-02-03T04:05:06', ''])
+def test_parse_time_invalid(monkeypatch, iso_basic, text):
+    monkeypatch.setattr(link_item, '_ISO_BASIC_FORMAT', iso_basic and sys.version_info >= (3, 11))
+    with pytest.raises(ValueError):
+        LinkItem.parse_time(text)
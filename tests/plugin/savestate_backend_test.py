@@ -0,0 +1,184 @@
+import gzip
+import logging
+from datetime import datetime
+
+import pytest
+from unidown_test.savestate import MySaveState
+
+from unidown.plugin import LinkItem, PluginException, PluginInfo
+from unidown.plugin.link_item_dict import LinkItemDict
+from unidown.plugin.savestate import SaveState
+from unidown.plugin.savestate_backend import BinarySaveStateBackend, GzipSaveStateBackend, JsonSaveStateBackend, SqliteLinkItems, \
+    SqliteSaveStateBackend, savestate_meta_json
+
+eg_data = LinkItemDict({
+    '/IceflowRE/unidown/main/README.rst': LinkItem('README.rst', datetime(2001, 1, 1, hour=1, minute=1, second=1)),
+    '/IceflowRE/unidown/main/LICENSE.md': LinkItem('README.rst', datetime(2001, 1, 1, hour=1, minute=1, second=1)),
+    '/IceflowRE/unidown/main/missing': LinkItem('missing', datetime(2002, 2, 2, hour=2, minute=2, second=2))
+})
+info = PluginInfo('test', '1.0.0', 'host')
+
+
+def test_savestate_meta_json():
+    savestate = MySaveState(info, datetime(2001, 1, 1), LinkItemDict(eg_data), 'user')
+    assert savestate_meta_json(savestate) == {
+        'meta': {'version': '1'},
+        'pluginInfo': {'name': 'test', 'version': '1.0.0', 'host': 'host'},
+        'lastUpdate': '20010101T000000.000000Z',
+        'linkItems': {},
+        'username': 'user',
+    }
+    assert savestate.link_items == eg_data
+
+
+def test_savestate_meta_json_keeps_link_items():
+    # workers may read the link items while the meta json is created
+    seen = []
+
+    class ObservedSaveState(MySaveState):
+        def to_json(self) -> dict:
+            seen.append(len(savestate.link_items))
+            return super().to_json()
+
+    savestate = ObservedSaveState(info, datetime(2001, 1, 1), LinkItemDict(eg_data), 'user')
+    assert savestate_meta_json(savestate)['linkItems'] == {}
+    assert seen == [len(eg_data)]
+
+
+@pytest.mark.parametrize('backend_cls', [JsonSaveStateBackend, SqliteSaveStateBackend, BinarySaveStateBackend, GzipSaveStateBackend])
+def test_round_trip(tmp_path, backend_cls):
+    backend = backend_cls(tmp_path, 'test', logging.getLogger(), MySaveState)
+    assert not backend.exists()
+    default = MySaveState(info, datetime(1970, 1, 1), LinkItemDict())
+    assert backend.load(default) == default
+
+    savestate = MySaveState(info, datetime(2001, 1, 1), LinkItemDict(eg_data), 'user')
+    savestate.link_items['/verified'] = LinkItem('verified', datetime(2003, 3, 3), size=4, digest='abc')
+    backend.save(savestate)
+    backend.close()
+
+    backend = backend_cls(tmp_path, 'test', logging.getLogger(), MySaveState)
+    assert backend.exists()
+    loaded = backend.load(MySaveState(info, datetime(1970, 1, 1), LinkItemDict()))
+    assert loaded == savestate
+    assert loaded.username == 'user'
+    assert loaded.link_items['/verified'].size == 4
+    assert loaded.link_items['/verified'].hash == 'abc'
+    backend.close()
+
+
+def test_sqlite_link_items(tmp_path):
+    backend = SqliteSaveStateBackend(tmp_path, 'test', logging.getLogger())
+    savestate = backend.load(SaveState(info, datetime(1970, 1, 1), LinkItemDict()))
+    link_items = savestate.link_items
+    assert isinstance(link_items, SqliteLinkItems)
+    assert len(link_items) == 0
+
+    link_items.actualize(eg_data)
+    assert len(link_items) == 3
+    assert list(link_items) == list(eg_data)
+    assert '/IceflowRE/unidown/main/missing' in link_items
+    assert 'other' not in link_items
+    assert link_items['/IceflowRE/unidown/main/missing'] == eg_data['/IceflowRE/unidown/main/missing']
+    with pytest.raises(KeyError):
+        link_items['other']
+
+    link_items['/IceflowRE/unidown/main/README.rst'] = LinkItem('new.rst', datetime(2003, 3, 3))
+    assert list(link_items) == list(eg_data)
+    assert link_items['/IceflowRE/unidown/main/README.rst'] == LinkItem('new.rst', datetime(2003, 3, 3))
+    del link_items['/IceflowRE/unidown/main/README.rst']
+    assert len(link_items) == 2
+    backend.close()
+
+
+def test_sqlite_get_new_items(tmp_path):
+    backend = SqliteSaveStateBackend(tmp_path, 'test', logging.getLogger())
+    savestate = backend.load(SaveState(info, datetime(1970, 1, 1), LinkItemDict(eg_data)))
+    new_data = LinkItemDict({
+        '/IceflowRE/unidown/main/README.rst': LinkItem('README.rst', datetime(2001, 1, 1, hour=1, minute=1, second=1)),
+        '/IceflowRE/unidown/main/missing': LinkItem('missing', datetime(2002, 2, 2, hour=2, minute=2, second=3)),
+        '/new': LinkItem('new', datetime(1999, 1, 1)),
+    })
+    assert LinkItemDict.get_new_items(savestate.link_items, new_data) == LinkItemDict({
+        '/IceflowRE/unidown/main/missing': LinkItem('missing', datetime(2002, 2, 2, hour=2, minute=2, second=3)),
+        '/new': LinkItem('new', datetime(1999, 1, 1)),
+    })
+    backend.close()
+
+
+def test_sqlite_diff(tmp_path):
+    backend = SqliteSaveStateBackend(tmp_path, 'test', logging.getLogger())
+    savestate = backend.load(SaveState(info, datetime(1970, 1, 1), LinkItemDict(eg_data)))
+    new_data = LinkItemDict({
+        '/IceflowRE/unidown/main/missing': LinkItem('missing', datetime(2002, 2, 2, hour=2, minute=2, second=3)),
+        '/new': LinkItem('new', datetime(1999, 1, 1)),
+    })
+    diff = LinkItemDict.diff(savestate.link_items, new_data)
+    assert diff.new == new_data
+    assert diff.updated == {'/IceflowRE/unidown/main/missing'}
+    assert diff.removed == set(eg_data) - set(new_data)
+    backend.close()
+
+
+@pytest.mark.parametrize('backend_cls', [JsonSaveStateBackend, BinarySaveStateBackend])
+def test_compaction(tmp_path, backend_cls):
+    backend = backend_cls(tmp_path, 'test', logging.getLogger())
+    backend.compaction = 2
+    savestate = SaveState(info, datetime(2001, 1, 1), LinkItemDict(eg_data))
+    backend.save(savestate)
+    # compaction is requested once the journal is as large as the saved items
+    requests = [backend.append(f"/{number}", LinkItem(str(number), datetime(2001, 1, 1))) for number in range(4)]
+    assert requests == [False, False, True, True]
+
+    # interrupted while compacting, both journals are applied
+    backend.start_compaction()
+    backend.append('/new', LinkItem('new', datetime(2003, 3, 3)))
+    loaded = backend_cls(tmp_path, 'test', logging.getLogger()).load(SaveState(info, datetime(1970, 1, 1), LinkItemDict()))
+    assert list(loaded.link_items) == [*eg_data, '/0', '/1', '/2', '/3', '/new']
+
+    # an unfinished compaction is continued by the next one
+    backend.start_compaction()
+    backend.compact(loaded)
+    assert not backend.journal_file.exists()
+    assert backend_cls(tmp_path, 'test', logging.getLogger()).load(SaveState(info, datetime(1970, 1, 1), LinkItemDict())) == loaded
+
+
+def test_sqlite_broken(tmp_path):
+    backend = SqliteSaveStateBackend(tmp_path, 'test', logging.getLogger())
+    backend.file.write_bytes(b'no database' * 100)
+    with pytest.raises(PluginException):
+        backend.load(SaveState(info, datetime(1970, 1, 1), LinkItemDict()))
+
+
+@pytest.mark.parametrize('backend_cls', [BinarySaveStateBackend, GzipSaveStateBackend])
+def test_binary_migration(tmp_path, backend_cls):
+    savestate = MySaveState(info, datetime(2001, 1, 1), LinkItemDict(eg_data), 'user')
+    legacy = JsonSaveStateBackend(tmp_path, 'test', logging.getLogger(), MySaveState)
+    legacy.save(savestate)
+    legacy.append('/new', LinkItem('new', datetime(2003, 3, 3)))
+
+    backend = backend_cls(tmp_path, 'test', logging.getLogger(), MySaveState)
+    assert not backend.file.exists()
+    assert backend.exists()
+    loaded = backend.load(MySaveState(info, datetime(1970, 1, 1), LinkItemDict()))
+    assert loaded.username == 'user'
+    assert loaded.link_items['/new'] == LinkItem('new', datetime(2003, 3, 3))
+
+    backend.save(loaded)
+    assert backend.file.exists()
+    assert not legacy.file.exists()
+    assert not legacy.journal_file.exists()
+    assert backend.load(MySaveState(info, datetime(1970, 1, 1), LinkItemDict())) == loaded
+
+
+@pytest.mark.parametrize('backend_cls', [BinarySaveStateBackend, GzipSaveStateBackend])
+def test_binary_broken(tmp_path, backend_cls):
+    backend = backend_cls(tmp_path, 'test', logging.getLogger())
+    backend.save(SaveState(info, datetime(2001, 1, 1), LinkItemDict(eg_data)))
+    data = backend.file.read_bytes()
+    if backend_cls.compress:
+        data = gzip.decompress(data)
+    for broken in (data[:-3], b'UDSS\x02' + data[5:], data[:3]):
+        backend.file.write_bytes(gzip.compress(broken) if backend_cls.compress else broken)
+        with pytest.raises(PluginException, match=r"Broken savestate file"):
+            backend.load(SaveState(info, datetime(1970, 1, 1), LinkItemDict()))
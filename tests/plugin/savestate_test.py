@@ -3,9 +3,9 @@ from datetime import datetime
 import pytest
 from packaging.version import InvalidVersion
 
-from unidown.plugin import PluginInfo
+from unidown.plugin import LinkItem, PluginInfo
 from unidown.plugin.link_item_dict import LinkItemDict
-from unidown.plugin.savestate import SaveState
+from unidown.plugin.savestate import FailedItem, SaveState
 
 
 def test_from_json():
@@ -25,5 +25,16 @@ def test_eq():
     assert (save != "asdf")
 
 
+def test_failed_items():
+    save = SaveState(PluginInfo('name', '1.0.0', 'host'), datetime(1970, 1, 1), LinkItemDict())
+    assert 'failedItems' not in save.to_json()
+    save.failed_items['/link'] = FailedItem(LinkItem('file', datetime(2001, 1, 1)), 'https://host/link | 503')
+    data = save.to_json()
+    assert data['failedItems'] == {'/link': {'name': 'file', 'time': '20010101T000000.000000Z', 'error': 'https://host/link | 503'}}
+    loaded = SaveState.from_json(data)
+    assert loaded == save
+    assert loaded.failed_items['/link'].error == 'https://host/link | 503'
+
+
 def test_str():
     assert str(PluginInfo('name', '1.0.0', 'host')) == "name - 1.0.0 : host"
@@ -1,3 +1,4 @@
+from unidown import tools
 from unidown.tools import unlink_dir_rec
 
 
@@ -21,3 +22,23 @@ class TestDeleteDirRec:
         tmp_path.joinpath("sub2").mkdir()
         unlink_dir_rec(tmp_path)
         assert not tmp_path.exists()
+
+    def test_keep(self, tmp_path):
+        sub_folder = tmp_path.joinpath("sub")
+        sub_folder.mkdir()
+        sub_folder.joinpath("keep.part").write_text("")
+        sub_folder.joinpath("delete").write_text("")
+        tmp_path.joinpath("sub2").mkdir()
+        assert not unlink_dir_rec(tmp_path, keep=lambda path: path.suffix == '.part')
+        assert sub_folder.joinpath("keep.part").exists()
+        assert not sub_folder.joinpath("delete").exists()
+        assert not tmp_path.joinpath("sub2").exists()
+
+
+def test_get_entry_points():
+    plugins = tools.get_entry_points('unidown.plugin')
+    assert 'test' in plugins
+    assert plugins['test'].load().__name__ == 'Plugin'
+    assert tools.get_entry_points('unidown.plugin') is plugins
+    assert tools.get_entry_points('unidown.plugin', refresh=True) == plugins
+    assert tools.get_entry_points('not_existing_group') == {}
@@ -0,0 +1,131 @@
+"""
+Limiting of simultaneous downloads.
+"""
+import threading
+import time
+
+
+class ConcurrencyLimiter:
+    """
+    Limits how many downloads run at the same time. In adaptive mode the limit is raised or lowered after every
+    finished window of downloads, depending on the observed throughput and error rate.
+
+    The adaptation is a hill climb: as long as the throughput grows the limit is increased by one, if it shrinks the
+    limit is decreased by one. If too many downloads of a window failed the limit is halved.
+
+    :param limit: initial limit
+    :param maximum: highest limit the adaptive mode may use
+    :param adaptive: if the limit should be adapted
+    :param minimum: lowest limit the adaptive mode may use
+    :param max_error_rate: error rate of a window above which the limit is halved
+    :raises ValueError: limit is not inside minimum and maximum
+
+    :ivar _limit: current limit
+    :ivar _active: number of running downloads
+    :ivar _direction: direction of the last adaption, +1 or -1
+    :ivar _last_throughput: throughput of the previous window in bytes per second
+    """
+
+    def __init__(self, limit: int, maximum: int = None, adaptive: bool = False, minimum: int = 1, max_error_rate: float = 0.1):
+        if maximum is None:
+            maximum = limit
+        if not minimum <= limit <= maximum:
+            raise ValueError(f"limit {limit} is not inside {minimum} and {maximum}.")
+        self._limit: int = limit
+        self._minimum: int = minimum
+        self._maximum: int = maximum
+        self._adaptive: bool = adaptive
+        self._max_error_rate: float = max_error_rate
+        self._active: int = 0
+        self._condition = threading.Condition()
+
+        self._direction: int = 1
+        self._last_throughput: float = 0
+        self._window_start: float = time.monotonic()
+        self._window_bytes: int = 0
+        self._window_done: int = 0
+        self._window_failed: int = 0
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    @property
+    def limit(self) -> int:
+        """
+        Plain getter.
+        """
+        return self._limit
+
+    @property
+    def maximum(self) -> int:
+        """
+        Plain getter.
+        """
+        return self._maximum
+
+    @property
+    def adaptive(self) -> bool:
+        """
+        Plain getter.
+        """
+        return self._adaptive
+
+    def acquire(self):
+        """
+        Wait until a download may start.
+        """
+        with self._condition:
+            while self._active >= self._limit:
+                self._condition.wait()
+            self._active += 1
+
+    def release(self):
+        """
+        Mark a download as finished.
+        """
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    def report(self, size: int, failed: bool = False):
+        """
+        Report a finished download. Does nothing if not adaptive.
+
+        :param size: transferred bytes
+        :param failed: if the download failed
+        """
+        if not self._adaptive:
+            return
+        with self._condition:
+            self._window_bytes += size
+            self._window_done += 1
+            if failed:
+                self._window_failed += 1
+            if self._window_done >= self._limit * 2:
+                self._adapt()
+
+    def _adapt(self):
+        """
+        Adapt the limit to the finished window and start a new one. Must be called while holding the lock.
+        """
+        now = time.monotonic()
+        throughput = self._window_bytes / max(now - self._window_start, 1e-6)
+        if self._window_failed / self._window_done > self._max_error_rate:
+            new_limit = max(self._minimum, self._limit // 2)
+            self._direction = -1
+        else:
+            if throughput < self._last_throughput:
+                self._direction = -self._direction
+            new_limit = min(self._maximum, max(self._minimum, self._limit + self._direction))
+        self._last_throughput = throughput
+        self._window_start = now
+        self._window_bytes = 0
+        self._window_done = 0
+        self._window_failed = 0
+        if new_limit > self._limit:
+            self._condition.notify(new_limit - self._limit)
+        self._limit = new_limit
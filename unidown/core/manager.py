@@ -4,15 +4,24 @@ Manager of the whole program, contains the most important functions as well as t
 import logging
 import multiprocessing
 import platform
-from typing import List, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set
 
 from unidown import static_data, tools
 from unidown.core import updater
+from unidown.core.concurrency import ConcurrencyLimiter
 from unidown.core.plugin_state import PluginState
+from unidown.core.rate_limiter import RateLimiter
+from unidown.core.report import RunReport
 from unidown.core.settings import Settings
 from unidown.plugin.a_plugin import APlugin
 from unidown.plugin.exceptions import PluginException
-from unidown.plugin.link_item_dict import LinkItemDict
+from unidown.plugin.link_item_dict import LinkItemDict, UniqueNames
+
+#: file inside the root directory, which caches the newest version of the app
+UPDATE_CACHE_FILE = 'update_check.json'
 
 
 def init_logging(settings: Settings):
@@ -37,7 +46,9 @@ def init_logging(settings: Settings):
            f"System: {platform.system()} - {platform.version()} - {platform.machine()} - {multiprocessing.cpu_count()} cores\n" \
            f"Python: {platform.python_version()} - {' - '.join(platform.python_build())}\n" \
            f"Arguments: main={settings.root_dir.resolve()} | logfile={settings.log_file} | loglevel={settings.log_level}\n" \
-           f"Using cores: {settings.cores}\n"
+           f"Using cores: {settings.cores}\n" \
+           f"Simultaneous downloads: {settings.concurrency}{f' (adaptive up to {settings.max_concurrency})' if settings.adaptive else ''} | " \
+           f"connections per host: {settings.pool_size}\n"
 
     logging.debug(info)
 
@@ -56,58 +67,165 @@ def download_from_plugin(plugin: APlugin):
     1. Get plugin from the given name
     2. Get the last overall update time
     3. Load the savestate
-    4. Compare last update time with the one from the savestate
+    4. Compare last update time with the one from the savestate, without an update only the failed items of the
+       previous run are downloaded again (see :func:`~unidown.core.manager.retry_failed`)
     5. Get the download links
     6. Compare received links and their times with the savestate
-    7. Clean up names, to eliminate duplicated
-    8. Download new and newer links
+    7. Clean up names, to eliminate duplicated and files which exist already
+    8. Download new and newer links, every succeeded download is journaled
     9. Check downloaded data
-    10. Update savestate
+    10. Update savestate, failed items are kept to retry them
     11. Save new savestate to file
 
+    Steps 5 to 8 are pipelined for streaming plugins, see :func:`~unidown.core.manager.download_streamed`.
+
     :param plugin: plugin
     """
+    report = plugin.report
     # get last update date
     plugin.log.info('Get last update')
-    plugin.update_last_update()
+    with report.phase('last_update'):
+        plugin.update_last_update()
     # load old save state
-    plugin.load_savestate()
+    with report.phase('load_savestate'):
+        plugin.load_savestate()
     if plugin.last_update <= plugin.savestate.last_update:
+        if plugin.savestate.failed_items:
+            retry_failed(plugin)
+            return
         plugin.log.info('No update. Nothing to do.')
         return
+    if plugin.streaming:
+        download_streamed(plugin)
+        return
     # get download links
     plugin.log.info('Get download links')
-    plugin.update_download_data()
+    with report.phase('download_data'):
+        plugin.update_download_data()
+    report.count('links', len(plugin.download_data))
     # compare with save state
-    new_items = LinkItemDict.get_new_items(plugin.savestate.link_items, plugin.download_data)
+    with report.phase('compare'):
+        diff = LinkItemDict.diff(plugin.savestate.link_items, plugin.download_data)
+    new_items = diff.new
     plugin.log.info(f"Compared with save state: {str(len(plugin.download_data))}")
+    _log_removed(plugin, diff.removed)
+    report.count('new', len(new_items))
     if len(new_items) == 0:
         plugin.log.info('No new data. Nothing to do.')
         return
-    # clean up saving names
+    # clean up saving names, existing files are only allowed to be replaced by the item they belong to
     plugin.log.info("Clean up names.")
-    new_items.clean_up_names()
+    with report.phase('clean_up_names'):
+        replaced = {plugin.savestate.link_items[link].name for link in diff.updated}
+        new_items.clean_up_names({entry.name for entry in plugin.download_dir.iterdir()} - replaced)
     # download new/updated data
     plugin.log.info(f"Download new {plugin.unit}s: {len(new_items)}")
-    plugin.download(new_items, plugin.download_dir, f"Download new {plugin.unit}s", plugin.unit)
+    with report.phase('download'):
+        plugin.download(new_items, plugin.download_dir, f"Download new {plugin.unit}s", plugin.unit, journal=True)
+    _finish_download(plugin, new_items)
+
+
+def _finish_download(plugin: APlugin, new_items: LinkItemDict):
+    """
+    Check the downloaded items and save them into the savestate.
+
+    :param plugin: plugin
+    :param new_items: items which were downloaded
+    """
+    report = plugin.report
     # check which downloads are succeeded
-    succeeded, _ = plugin.check_download(new_items, plugin.download_dir)
+    with report.phase('check'):
+        succeeded, failed = plugin.check_download(new_items, plugin.download_dir)
     plugin.log.info(f"Downloaded: {len(succeeded)}/{len(new_items)}")
     # update savestate link_item_dict with succeeded downloads dict
     plugin.log.info('Update savestate')
-    plugin.update_savestate(succeeded)
+    with report.phase('update_savestate'):
+        plugin.update_savestate(succeeded)
+        plugin.update_failed_items(failed)
     # write new savestate
     plugin.log.info('Write savestate')
-    plugin.save_savestate()
+    with report.phase('save_savestate'):
+        plugin.save_savestate()
+
+
+def _log_removed(plugin: APlugin, removed: Set[str]):
+    """
+    Report the links of the savestate which the plugin does not create anymore. They stay inside the savestate, as their
+    files are still downloaded.
+
+    :param plugin: plugin
+    :param removed: removed links
+    """
+    if removed:
+        plugin.report.count('removed', len(removed))
+        plugin.log.info(f"Removed links: {len(removed)}")
+        for link in sorted(removed):
+            plugin.log.debug(f"Removed link: {link}")
 
 
-def run(settings: Settings, plugin_name: str, raw_options: List[List[str]]) -> PluginState:
+def retry_failed(plugin: APlugin):
+    """
+    Download the items again which failed in the previous run. The download data is not created, as nothing was updated.
+
+    :param plugin: plugin, with the last update time and the savestate loaded
+    """
+    new_items = LinkItemDict({link: failed.item for link, failed in plugin.savestate.failed_items.items()})
+    plugin.log.info(f"No update. Retry failed {plugin.unit}s: {len(new_items)}")
+    plugin.report.count('new', len(new_items))
+    with plugin.report.phase('download'):
+        plugin.download(new_items, plugin.download_dir, f"Retry failed {plugin.unit}s", plugin.unit, journal=True)
+    _finish_download(plugin, new_items)
+
+
+def download_streamed(plugin: APlugin):
+    """
+    Download routine for streaming plugins, the links are compared, named and downloaded while the plugin creates them.
+    In contrast to :func:`~unidown.core.manager.download_from_plugin`, the first item of a duplicated name keeps it.
+    A link which is created multiple times is only downloaded the first time.
+
+    :param plugin: plugin, with the last update time and the savestate loaded
+    """
+    old_items = plugin.savestate.link_items
+    names = UniqueNames(entry.name for entry in plugin.download_dir.iterdir())
+    new_items = LinkItemDict()
+
+    def new_links():
+        for link, item in plugin.iter_download_data():
+            if link in new_items:
+                plugin.log.warning(f"Skip duplicated link: {link}")
+                continue
+            old_item = old_items.get(link)
+            if old_item is not None and item.time <= old_item.time:
+                continue
+            # existing files are only allowed to be replaced by the item they belong to
+            item.name = names.use(item.name, None if old_item is None else old_item.name)
+            new_items[link] = item
+            yield link, item
+
+    plugin.log.info('Get, compare and download links')
+    with plugin.report.phase('download'):
+        plugin.download(new_links(), plugin.download_dir, f"Download new {plugin.unit}s", plugin.unit, journal=True)
+    plugin.log.info(f"Compared with save state: {len(plugin.download_data)}")
+    _log_removed(plugin, old_items.keys() - plugin.download_data.keys())
+    plugin.report.count('links', len(plugin.download_data))
+    plugin.report.count('new', len(new_items))
+    if len(new_items) == 0:
+        plugin.log.info('No new data. Nothing to do.')
+        return
+    _finish_download(plugin, new_items)
+
+
+def run(settings: Settings, plugin_name: str, raw_options: List[List[str]], limiter: ConcurrencyLimiter = None,
+        report: RunReport = None, rate_limiter: RateLimiter = None) -> PluginState:
     """
     Run a plugin so use the download routine and clean up after.
 
     :param settings: settings to use
     :param plugin_name: name of plugin
     :param raw_options: parameters which will be send to the plugin initialization
+    :param limiter: limiter of simultaneous downloads shared with other plugins, ``None`` uses the one of the plugin
+    :param report: report which the plugin fills, ``None`` uses the one of the plugin
+    :param rate_limiter: rate limiter shared with other plugins, ``None`` uses the one of the plugin
     :return: ending state
     """
     if raw_options is None:
@@ -121,8 +239,8 @@ def run(settings: Settings, plugin_name: str, raw_options: List[List[str]]) -> P
         logging.error(msg)
         return PluginState.NotFound
 
-    # delete temporary directory of the plugin
-    tools.unlink_dir_rec(settings.temp_dir.joinpath(plugin_name))
+    # delete temporary directory of the plugin, partial downloads are kept to resume them
+    tools.unlink_dir_rec(settings.temp_dir.joinpath(plugin_name), keep=APlugin.is_part_file)
     try:
         plugin_class = available_plugins[plugin_name].load()
         plugin = plugin_class(settings, options)
@@ -131,6 +249,12 @@ def run(settings: Settings, plugin_name: str, raw_options: List[List[str]]) -> P
         return PluginState.LoadCrash
     else:
         logging.info(f"Loaded plugin: {plugin_name}")
+    if limiter is not None:
+        plugin.limiter = limiter
+    if report is not None:
+        plugin.report = report
+    if rate_limiter is not None:
+        plugin.rate_limiter = rate_limiter
 
     try:
         download_from_plugin(plugin)
@@ -144,6 +268,64 @@ def run(settings: Settings, plugin_name: str, raw_options: List[List[str]]) -> P
     else:
         logging.info(f"{plugin.name} ends without errors.")
         return PluginState.EndSuccess
+    finally:
+        plugin.report.finish()
+        plugin.report.log(plugin.log)
+
+
+def run_plugins(settings: Settings, plugin_names: Optional[List[str]], raw_options: List[List[str]],
+                reports: Dict[str, RunReport] = None) -> Dict[str, PluginState]:
+    """
+    Run several plugins at the same time, each with :func:`~unidown.core.manager.run`. They share one limit of
+    simultaneous downloads and one rate limiter, so the settings apply to all of them together.
+
+    :param settings: settings to use
+    :param plugin_names: names of the plugins, duplicates are run once, empty or ``None`` runs all available plugins
+    :param raw_options: parameters which will be send to the initialization of every plugin
+    :param reports: if given, a report of every plugin is added to it
+    :return: ending state of each plugin
+    """
+    if not plugin_names:
+        plugin_names = list(APlugin.get_plugins())
+    plugin_names = list(dict.fromkeys(plugin_names))
+    if not plugin_names:
+        logging.warning("No plugins are available.")
+        return {}
+
+    limiter = create_limiter(settings)
+    rate_limiter = create_rate_limiter(settings)
+    if reports is not None:
+        reports.update({name: RunReport(name) for name in plugin_names})
+    with ThreadPoolExecutor(max_workers=len(plugin_names), thread_name_prefix='plugin') as executor:
+        jobs = {
+            name: executor.submit(run, settings, name, raw_options, limiter, None if reports is None else reports[name], rate_limiter)
+            for name in plugin_names
+        }
+    states = {name: job.result() for name, job in jobs.items()}
+    logging.info("Plugin states: " + ', '.join(f"{name}={state.name}" for name, state in states.items()))
+    return states
+
+
+def create_limiter(settings: Settings) -> ConcurrencyLimiter:
+    """
+    Create a limiter of simultaneous downloads from the settings.
+
+    :param settings: settings
+    :return: limiter
+    """
+    if settings.adaptive:
+        return ConcurrencyLimiter(settings.concurrency, settings.max_concurrency, adaptive=True)
+    return ConcurrencyLimiter(settings.concurrency)
+
+
+def create_rate_limiter(settings: Settings) -> RateLimiter:
+    """
+    Create a limiter of requests and bandwidth from the settings.
+
+    :param settings: settings
+    :return: rate limiter
+    """
+    return RateLimiter(settings.rate_limit, settings.bandwidth_limit, settings.host_rate_limit, settings.host_bandwidth_limit)
 
 
 def get_options(options: List[List[str]]) -> Dict[str, Any]:
@@ -166,17 +348,32 @@ def get_options(options: List[List[str]]) -> Dict[str, Any]:
     return plugin_options
 
 
-def check_update():
+def check_update(cache_file: Path = None):
     """
     Check for app updates and print/log them.
+
+    :param cache_file: file to cache the newest version in, ``None`` always asks remote
     """
     logging.info('Check for app updates.')
     try:
-        update = updater.check_for_app_updates()
-    except Exception:
-        logging.exception('Check for updates failed.')
+        update = updater.check_for_app_updates(cache_file)
+    except Exception as ex:
+        logging.warning(f"Check for updates failed: {ex}")
         return
     if update:
         logging.info(f"Update available! ({static_data.PROJECT_URL})")
     else:
         logging.info("No update available.")
+
+
+def start_update_check(settings: Settings) -> threading.Thread:
+    """
+    Run :func:`~unidown.core.manager.check_update` in the background, so it does not delay the plugins. The result is
+    cached inside the root directory. The thread is a daemon, an unfinished check does not block the exit.
+
+    :param settings: settings
+    :return: started thread
+    """
+    thread = threading.Thread(target=check_update, args=(settings.root_dir.joinpath(UPDATE_CACHE_FILE),), name='update-check', daemon=True)
+    thread.start()
+    return thread
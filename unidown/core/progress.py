@@ -0,0 +1,230 @@
+"""
+Progress reporting of long running steps, e.g. downloading the items.
+"""
+import json
+import logging
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, TextIO, Type
+
+
+class Progress(ABC):
+    """
+    Progress of a step, counts the done units. A context manager, which closes the progress at the end.
+    Thread safe.
+
+    :param desc: description of the step
+    :param unit: unit which is counted
+    :param total: total number of units, None if unknown
+    :param log: logger of the step
+
+    :cvar enabled: if the progress is shown at all, callers can skip counting otherwise
+    :ivar _done: done units
+    """
+    enabled: bool = True
+
+    def __init__(self, desc: str, unit: str, total: int = None, log: logging.Logger = None):
+        self._desc: str = desc
+        self._unit: str = unit
+        self._total: Optional[int] = total
+        self._log: logging.Logger = logging.getLogger() if log is None else log
+        self._done: int = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def total(self) -> Optional[int]:
+        """
+        Plain getter.
+        """
+        return self._total
+
+    @property
+    def done(self) -> int:
+        """
+        Plain getter.
+        """
+        return self._done
+
+    def add_total(self, count: int):
+        """
+        Add units to the total, e.g. retries. Does nothing if the total is unknown.
+
+        :param count: additional units
+        """
+        with self._lock:
+            if self._total is not None:
+                self._total += count
+
+    @abstractmethod
+    def update(self, count: int = 1):
+        """
+        Count done units.
+
+        :param count: done units
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self):
+        """
+        Finish the progress.
+        """
+        raise NotImplementedError
+
+
+class NoProgress(Progress):
+    """
+    Shows nothing.
+    """
+    enabled = False
+
+    def update(self, count: int = 1):
+        pass
+
+    def close(self):
+        pass
+
+
+class TqdmProgress(Progress):
+    """
+    Console progress bar of tqdm.
+    """
+
+    def __init__(self, desc: str, unit: str, total: int = None, log: logging.Logger = None):
+        super().__init__(desc, unit, total, log)
+        from tqdm import tqdm
+        self._pbar = tqdm(total=total, desc=desc, unit=unit, mininterval=1, ncols=100)
+
+    def add_total(self, count: int):
+        super().add_total(count)
+        if self._total is not None:
+            self._pbar.total = self._total
+            self._pbar.refresh()
+
+    def update(self, count: int = 1):
+        with self._lock:
+            self._done += count
+            self._pbar.update(count)
+
+    def close(self):
+        self._pbar.close()
+
+
+class IntervalProgress(Progress):
+    """
+    Progress which is reported at most once per interval and at the end, e.g. for headless runs.
+
+    :param interval: minimum seconds between two reports
+    """
+    #: default interval in seconds
+    INTERVAL: float = 10.0
+
+    def __init__(self, desc: str, unit: str, total: int = None, log: logging.Logger = None, interval: float = None):
+        super().__init__(desc, unit, total, log)
+        self._interval: float = self.INTERVAL if interval is None else interval
+        self._start: float = time.monotonic()
+        self._next: float = self._start + self._interval
+        self._closed: bool = False
+
+    def update(self, count: int = 1):
+        with self._lock:
+            self._done += count
+            now = time.monotonic()
+            if now < self._next:
+                return
+            self._next = now + self._interval
+        self._report(now - self._start, False)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._report(time.monotonic() - self._start, True)
+
+    @abstractmethod
+    def _report(self, seconds: float, finished: bool):
+        """
+        Report the current progress.
+
+        :param seconds: seconds since the start
+        :param finished: if it is the final report
+        """
+        raise NotImplementedError
+
+
+class LogProgress(IntervalProgress):
+    """
+    Progress as log lines at info level.
+    """
+
+    def _report(self, seconds: float, finished: bool):
+        done, total = self._done, self._total
+        percent = f" ({done / total:.0%})" if total else ''
+        self._log.info(f"{self._desc}: {done}{f'/{total}' if total is not None else ''} {self._unit}s{percent}, {seconds:.0f}s"
+                       f"{', finished' if finished else ''}")
+
+
+class JsonProgress(IntervalProgress):
+    """
+    Progress as json lines on stdout, to be read by other programs. Every line is an object with the keys ``desc``,
+    ``unit``, ``done``, ``total``, ``seconds`` and ``finished``.
+
+    :param stream: stream to write to, ``None`` is stdout
+    """
+    INTERVAL = 1.0
+
+    def __init__(self, desc: str, unit: str, total: int = None, log: logging.Logger = None, interval: float = None, stream: TextIO = None):
+        super().__init__(desc, unit, total, log, interval)
+        self._stream: Optional[TextIO] = stream
+
+    def _report(self, seconds: float, finished: bool):
+        stream = sys.stdout if self._stream is None else self._stream
+        stream.write(json.dumps({
+            'desc': self._desc, 'unit': self._unit, 'done': self._done, 'total': self._total, 'seconds': round(seconds, 3), 'finished': finished,
+        }) + '\n')
+        stream.flush()
+
+
+#: progress reporters by their name, see :data:`~unidown.core.settings.PROGRESS_STYLES`
+PROGRESS_REPORTERS: Dict[str, Type[Progress]] = {
+    'tqdm': TqdmProgress,
+    'log': LogProgress,
+    'json': JsonProgress,
+    'none': NoProgress,
+}
+
+
+def resolve_style(style: str) -> str:
+    """
+    Resolve the style ``auto``: the progress bar if the console is interactive, otherwise log lines. The bar is drawn to
+    stderr, so this one is checked.
+
+    :param style: one of :data:`~unidown.core.settings.PROGRESS_STYLES`
+    :return: name of a progress reporter
+    """
+    if style != 'auto':
+        return style
+    return 'tqdm' if sys.stderr is not None and sys.stderr.isatty() else 'log'
+
+
+def create_progress(style: str, desc: str, unit: str, total: int = None, log: logging.Logger = None) -> Progress:
+    """
+    Create a progress reporter.
+
+    :param style: one of :data:`~unidown.core.settings.PROGRESS_STYLES`
+    :param desc: description of the step
+    :param unit: unit which is counted
+    :param total: total number of units, None if unknown
+    :param log: logger of the step
+    :return: progress
+    """
+    return PROGRESS_REPORTERS[resolve_style(style)](desc, unit, total, log)
@@ -0,0 +1,178 @@
+"""
+Rate limiting of requests and transferred bytes.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket. Tokens are refilled continuously with the given rate up to the capacity.
+
+    Acquiring reserves the tokens immediately, even if they are not available yet, and waits until they would have been
+    refilled. As of this, amounts larger than the capacity are possible and waiting threads are served in order.
+
+    :param rate: tokens per second
+    :param capacity: maximum tokens which can be saved up, ``None`` uses the rate but at least 1
+    :raises ValueError: rate or capacity is not positive
+
+    :ivar _tokens: available tokens, negative if tokens are reserved in advance
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        if capacity is None:
+            capacity = max(rate, 1)
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive.")
+        self._rate: float = rate
+        self._capacity: float = capacity
+        self._tokens: float = capacity
+        self._last: float = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """
+        Plain getter.
+        """
+        return self._rate
+
+    @property
+    def capacity(self) -> float:
+        """
+        Plain getter.
+        """
+        return self._capacity
+
+    def reserve(self, amount: float = 1) -> float:
+        """
+        Reserve tokens without waiting.
+
+        :param amount: tokens to take
+        :return: seconds until the reserved tokens are available
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._last) * self._rate)
+            self._last = now
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self._rate
+
+    def acquire(self, amount: float = 1):
+        """
+        Take tokens and wait until they are available.
+
+        :param amount: tokens to take
+        """
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """
+    Global and per host limits for requests per second and bytes per second. ``None`` disables a limit.
+
+    :param requests: overall requests per second
+    :param bandwidth: overall bytes per second
+    :param host_requests: requests per second for every host
+    :param host_bandwidth: bytes per second for every host
+    :param parent: limiter whose limits apply as well, e.g. one shared by several plugins
+
+    :ivar _hosts: buckets of each host, host -> (request bucket, bandwidth bucket)
+    """
+
+    def __init__(self, requests: float = None, bandwidth: float = None, host_requests: float = None, host_bandwidth: float = None,
+                 parent: RateLimiter = None):
+        self._requests: Optional[TokenBucket] = None if requests is None else TokenBucket(requests)
+        self._bandwidth: Optional[TokenBucket] = None if bandwidth is None else TokenBucket(bandwidth)
+        self._host_requests: Optional[float] = host_requests
+        self._host_bandwidth: Optional[float] = host_bandwidth
+        self._hosts: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._parent: Optional[RateLimiter] = parent
+
+    @property
+    def host_requests(self) -> Optional[float]:
+        """
+        Plain getter.
+        """
+        return self._host_requests
+
+    @property
+    def enabled(self) -> bool:
+        """
+        If any limit is set.
+        """
+        return (any(limit is not None for limit in (self._requests, self._bandwidth, self._host_requests, self._host_bandwidth))
+                or (self._parent is not None and self._parent.enabled))
+
+    def _host_buckets(self, host: str) -> tuple:
+        """
+        Get the buckets of the host, creates them if needed.
+
+        :param host: host
+        :return: request and bandwidth bucket, each may be None
+        """
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = (
+                    None if self._host_requests is None else TokenBucket(self._host_requests),
+                    None if self._host_bandwidth is None else TokenBucket(self._host_bandwidth),
+                )
+            return self._hosts[host]
+
+    def request(self, host: str):
+        """
+        Wait until a request to the host is allowed.
+
+        :param host: host
+        """
+        wait = self._reserve_request(host)
+        if wait > 0:
+            time.sleep(wait)
+
+    def _reserve_request(self, host: str) -> float:
+        """
+        Reserve a request to the host.
+
+        :param host: host
+        :return: seconds to wait until the request is allowed
+        """
+        host_bucket = self._host_buckets(host)[0]
+        return max(
+            0 if self._requests is None else self._requests.reserve(),
+            0 if host_bucket is None else host_bucket.reserve(),
+            0 if self._parent is None else self._parent._reserve_request(host),
+        )
+
+    def transfer(self, host: str, size: int):
+        """
+        Account transferred bytes of the host and wait until they are within the bandwidth.
+
+        :param host: host
+        :param size: transferred bytes
+        """
+        wait = self._reserve_transfer(host, size)
+        if wait > 0:
+            time.sleep(wait)
+
+    def _reserve_transfer(self, host: str, size: int) -> float:
+        """
+        Reserve transferred bytes of the host.
+
+        :param host: host
+        :param size: transferred bytes
+        :return: seconds to wait until they are within the bandwidth
+        """
+        host_bucket = self._host_buckets(host)[1]
+        return max(
+            0 if self._bandwidth is None else self._bandwidth.reserve(size),
+            0 if host_bucket is None else host_bucket.reserve(size),
+            0 if self._parent is None else self._parent._reserve_transfer(host, size),
+        )
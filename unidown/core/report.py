@@ -0,0 +1,195 @@
+"""
+Instrumentation of a run, durations of the phases and counters of the downloads.
+"""
+import cProfile
+import json
+import logging
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
+
+
+def peak_memory() -> Optional[int]:
+    """
+    Get the peak resident memory of the process.
+
+    :return: bytes, None if not available on this platform
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kibibytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class RunReport:
+    """
+    Report of a plugin run. Collects the durations of the phases and counters, e.g. downloaded items and bytes. Counting
+    is thread safe.
+
+    :param name: name of the plugin
+
+    :ivar _phases: phase name -> seconds, in order of their start
+    :ivar _counters: counter name -> value
+    :ivar _start: start of the run, from :func:`time.perf_counter`
+    :ivar _end: end of the run, None while running
+    """
+
+    def __init__(self, name: str):
+        self._name: str = name
+        self._phases: Dict[str, float] = {}
+        self._counters: Dict[str, int] = {}
+        self._start: float = time.perf_counter()
+        self._end: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        """
+        Plain getter.
+        """
+        return self._name
+
+    @property
+    def phases(self) -> Dict[str, float]:
+        """
+        Plain getter.
+        """
+        return self._phases
+
+    @property
+    def counters(self) -> Dict[str, int]:
+        """
+        Plain getter.
+        """
+        return self._counters
+
+    @property
+    def duration(self) -> float:
+        """
+        Seconds since the start, until the end if finished.
+        """
+        return (time.perf_counter() if self._end is None else self._end) - self._start
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Measure the duration of a phase, repeated phases are summed up.
+
+        :param name: name of the phase
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self._phases[name] = self._phases.get(name, 0) + seconds
+
+    def count(self, name: str, value: int = 1):
+        """
+        Increase a counter.
+
+        :param name: name of the counter
+        :param value: value to add
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def finish(self):
+        """
+        Mark the end of the run.
+        """
+        self._end = time.perf_counter()
+
+    def to_json(self) -> dict:
+        """
+        Create json data. The throughput are the transferred bytes per second of the download phase.
+
+        :return: json dictionary
+        """
+        with self._lock:
+            phases = dict(self._phases)
+            counters = dict(self._counters)
+        download_seconds = phases.get('download', 0)
+        return {
+            'name': self._name,
+            'duration': self.duration,
+            'phases': phases,
+            'counters': counters,
+            'throughput': counters.get('bytes', 0) / download_seconds if download_seconds > 0 else None,
+            'peakMemory': peak_memory(),
+        }
+
+    def log(self, log: logging.Logger):
+        """
+        Log a summary at debug level.
+
+        :param log: logger
+        """
+        data = self.to_json()
+        phases = ', '.join(f"{name}={seconds:.3f}s" for name, seconds in data['phases'].items())
+        counters = ', '.join(f"{name}={value}" for name, value in data['counters'].items())
+        log.debug(f"Run report: {data['duration']:.3f}s | phases: {phases} | counters: {counters} | "
+                  f"throughput: {data['throughput'] or 0:.0f} B/s | peak memory: {data['peakMemory']} B")
+
+    @staticmethod
+    def write(file: Path, reports: Dict[str, 'RunReport']):
+        """
+        Write reports as json file.
+
+        :param file: file
+        :param reports: plugin name -> report
+        """
+        with file.open('w', encoding='utf8') as writer:
+            writer.write(json.dumps({'plugins': {name: report.to_json() for name, report in reports.items()}}, indent=2))
+
+
+@contextmanager
+def profile(file: Optional[Path]) -> Iterator[None]:
+    """
+    Profile the code inside with :mod:`cProfile` and dump the statistics into the file, which can be read with
+    :mod:`pstats`. Threads started inside are profiled as well, their statistics are merged. Does nothing if no file
+    is given.
+
+    :param file: file for the statistics
+    """
+    if file is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    thread_profilers = []
+    lock = threading.Lock()
+
+    def profile_thread(*_):
+        # before python 3.12 cProfile profiles only the thread which enabled it, so every thread gets its own profiler
+        sys.setprofile(None)
+        thread_profiler = cProfile.Profile()
+        try:
+            thread_profiler.enable()
+        except ValueError:  # another profiler is active, it covers all threads already
+            return
+        with lock:
+            thread_profilers.append(thread_profiler)
+
+    threading.setprofile(profile_thread)
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        threading.setprofile(None)
+        stats = pstats.Stats(profiler)
+        with lock:
+            for thread_profiler in thread_profilers:
+                stats.add(thread_profiler)
+        stats.dump_stats(str(file))
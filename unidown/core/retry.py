@@ -0,0 +1,111 @@
+"""
+Retrying of failed downloads.
+"""
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+class RetryPolicy:
+    """
+    Decides if and when a failed download is retried. The delay grows exponentially with every attempt and is jittered,
+    so downloads which failed together are not retried all at the same moment. A ``Retry-After`` of the server is used
+    as lower bound of the delay.
+
+    :param retries: how often a failed download is retried at most
+    :param backoff: delay in seconds before the first retry, doubled for every further one
+    :param max_delay: highest delay in seconds, a server which demands a longer one is not retried anymore
+    :raises ValueError: retries, backoff or max delay is negative
+
+    :cvar RETRY_STATUS: HTTP status codes of temporary failures
+    """
+    RETRY_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+    def __init__(self, retries: int = 2, backoff: float = 1.0, max_delay: float = 300.0):
+        if retries < 0 or backoff < 0 or max_delay < 0:
+            raise ValueError("retries, backoff and max delay cannot be negative.")
+        self._retries: int = retries
+        self._backoff: float = backoff
+        self._max_delay: float = max_delay
+
+    @property
+    def retries(self) -> int:
+        """
+        Plain getter.
+        """
+        return self._retries
+
+    @property
+    def backoff(self) -> float:
+        """
+        Plain getter.
+        """
+        return self._backoff
+
+    @property
+    def max_delay(self) -> float:
+        """
+        Plain getter.
+        """
+        return self._max_delay
+
+    def is_retryable(self, status: Optional[int]) -> bool:
+        """
+        Check if a failure is temporary.
+
+        :param status: HTTP status code of the failure, None if there was no response, e.g. a connection error
+        :return: if a retry may succeed
+        """
+        return status is None or status in self.RETRY_STATUS
+
+    def delay(self, attempt: int, retry_after: float = None) -> Optional[float]:
+        """
+        Get the delay before the next attempt, the exponential delay is randomly lowered by up to a half.
+
+        :param attempt: number of the failed attempt, starting with 1
+        :param retry_after: seconds the server demands to wait, if any
+        :return: seconds, None if no further attempt should be made
+        """
+        if attempt > self._retries:
+            return None
+        delay = min(self._max_delay, self._backoff * 2 ** (attempt - 1))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        if retry_after is not None:
+            if retry_after > self._max_delay:
+                return None
+            delay = max(delay, retry_after)
+        return delay
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """
+        Parse a ``Retry-After`` header, which is either a number of seconds or a HTTP date.
+
+        :param value: header value
+        :return: seconds to wait, None if not given or invalid
+        """
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            date = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+def sleep_until(deadline: float):
+    """
+    Sleep until the deadline is reached.
+
+    :param deadline: point in time of :func:`time.monotonic`
+    """
+    remaining = deadline - time.monotonic()
+    if remaining > 0:
+        time.sleep(remaining)
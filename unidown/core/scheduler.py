@@ -0,0 +1,58 @@
+"""
+Ordering of the download queue.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+from unidown.plugin.link_item import LinkItem
+
+
+def order_items(link_items: Dict[str, LinkItem], schedule: str, size_of: Callable[[str, LinkItem], Optional[int]],
+                priority_of: Callable[[str, LinkItem], int]) -> List[Tuple[str, LinkItem]]:
+    """
+    Order the items for downloading, see :data:`~unidown.core.settings.SCHEDULES`.
+
+    * ``fifo``: as given
+    * ``priority``: higher priority first, otherwise as given
+    * ``shortest``: higher priority first, then smaller expected size first. Many files are on disk early.
+    * ``longest``: higher priority first, then larger expected size first. The large files do not start at the end, which
+      shortens the overall time with multiple simultaneous downloads.
+    * ``interleave``: higher priority first, then alternately the largest and the smallest remaining expected size. Large
+      files start early, but are not downloaded all at the same time.
+
+    Items of unknown size are placed after the ones of the same priority with a known size, in given order.
+
+    :param link_items: items to order
+    :param schedule: one of :data:`~unidown.core.settings.SCHEDULES`
+    :param size_of: expected size of an item in bytes, None if unknown
+    :param priority_of: priority of an item, higher ones are downloaded first
+    :return: link and item in download order
+    :raises ValueError: unknown schedule
+    """
+    if schedule == 'fifo':
+        return list(link_items.items())
+    if schedule == 'priority':
+        return sorted(link_items.items(), key=lambda entry: -priority_of(*entry))
+    if schedule not in ('shortest', 'longest', 'interleave'):
+        raise ValueError(f"unknown schedule: {schedule}")
+
+    groups: Dict[int, Tuple[List[Tuple[int, str, LinkItem]], List[Tuple[str, LinkItem]]]] = {}
+    for link, item in link_items.items():
+        known, unknown = groups.setdefault(priority_of(link, item), ([], []))
+        size = size_of(link, item)
+        if size is None:
+            unknown.append((link, item))
+        else:
+            known.append((size, link, item))
+
+    result = []
+    for priority in sorted(groups, reverse=True):
+        known, unknown = groups[priority]
+        # sorting is stable, equal sizes keep the given order
+        known.sort(key=lambda entry: entry[0], reverse=schedule != 'shortest')
+        if schedule == 'interleave':
+            half = (len(known) + 1) // 2
+            largest, smallest = known[:half], known[:half - 1:-1]
+            known = [entry for pair in zip(largest, smallest) for entry in pair] + largest[len(smallest):]
+        result.extend((link, item) for _, link, item in known)
+        result.extend(unknown)
+    return result
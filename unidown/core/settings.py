@@ -1,5 +1,15 @@
 import multiprocessing
 from pathlib import Path
+from typing import Optional
+
+#: available download engines, see :func:`~unidown.plugin.a_plugin.APlugin.download`
+DOWNLOAD_ENGINES = ('thread', 'asyncio')
+#: available savestate formats, see :data:`~unidown.plugin.savestate_backend.SAVESTATE_BACKENDS`
+SAVESTATE_FORMATS = ('json', 'sqlite', 'binary', 'binary-gzip')
+#: available orders of the download queue, see :func:`~unidown.core.scheduler.order_items`
+SCHEDULES = ('fifo', 'priority', 'shortest', 'longest', 'interleave')
+#: available progress styles, ``auto`` chooses by the console, see :data:`~unidown.core.progress.PROGRESS_REPORTERS`
+PROGRESS_STYLES = ('auto', 'tqdm', 'log', 'json', 'none')
 
 
 class Settings:
@@ -10,15 +20,65 @@ class Settings:
     :ivar savestate_dir: savestates main path, here are the sub folders for every plugin
     :ivar log_file: log file of the program
     :ivar available_plugins: available plugins which are found at starting the program, name -> EntryPoint
-    :ivar using_cores: how many _cores should be used
+    :ivar _cores: how many cpu cores should be used for cpu bound work, e.g. hashing downloaded files
     :ivar _log_level: log level
-    :ivar _disable_tqdm: if the console progress bar is disabled
+    :ivar _progress: how the progress is shown, one of :data:`PROGRESS_STYLES`
+    :ivar _chunk_size: size in bytes of the chunks a download is streamed to disk with
+    :ivar _download_engine: engine which schedules the downloads, one of :data:`DOWNLOAD_ENGINES`
+    :ivar _concurrency: number of simultaneous downloads, independent of the cpu cores
+    :ivar _pool_size: number of connections kept per host
+    :ivar _adaptive: if the number of simultaneous downloads is adapted to the throughput and error rate
+    :ivar _max_concurrency: highest number of simultaneous downloads the adaptive mode may use
+    :ivar _rate_limit: overall requests per second, ``None`` is unlimited
+    :ivar _bandwidth_limit: overall bytes per second, ``None`` is unlimited
+    :ivar _host_rate_limit: requests per second for every host, ``None`` is unlimited
+    :ivar _host_bandwidth_limit: bytes per second for every host, ``None`` is unlimited
+    :ivar _savestate_format: storage format of the savestates, one of :data:`SAVESTATE_FORMATS`
+    :ivar _retries: how often a temporary failed download is retried at most
+    :ivar _retry_backoff: delay in seconds before the first retry, doubled for every further one
+    :ivar _segment_threshold: size in bytes from which a file is downloaded in segments, ``None`` disables it
+    :ivar _segments: number of segments a large file is downloaded in at the same time
+    :ivar _schedule: order of the download queue, one of :data:`SCHEDULES`
 
     :param root_dir: root dir
     :param log_file: log file
+    :param log_level: log level
+    :param chunk_size: download chunk size in bytes
+    :param download_engine: download engine
+    :param cores: cpu cores to use, ``None`` uses all but one up to 4
+    :param concurrency: simultaneous downloads, in adaptive mode the initial value
+    :param pool_size: connections per host, ``None`` uses the concurrency, in adaptive mode the max concurrency
+    :param adaptive: adapt the simultaneous downloads
+    :param max_concurrency: upper bound of the adaptive mode, ``None`` uses four times the concurrency
+    :param rate_limit: overall requests per second
+    :param bandwidth_limit: overall bytes per second
+    :param host_rate_limit: requests per second for every host
+    :param host_bandwidth_limit: bytes per second for every host
+    :param savestate_format: savestate format
+    :param retries: retries of a failed download
+    :param retry_backoff: delay before the first retry
+    :param segment_threshold: size from which files are downloaded in segments
+    :param segments: segments of a large file
+    :param schedule: download order
+    :param progress: progress style
+    :raises ValueError: chunk size is not positive
+    :raises ValueError: unknown download engine
+    :raises ValueError: cores, concurrency, pool size or max concurrency is not positive
+    :raises ValueError: max concurrency is lower than concurrency
+    :raises ValueError: a rate limit is not positive
+    :raises ValueError: unknown savestate format
+    :raises ValueError: retries or retry backoff is negative
+    :raises ValueError: segment threshold or segments is not positive
+    :raises ValueError: unknown schedule
+    :raises ValueError: unknown progress style
     """
 
-    def __init__(self, root_dir: Path = None, log_file: Path = None, log_level: str = 'INFO'):
+    def __init__(self, root_dir: Path = None, log_file: Path = None, log_level: str = 'INFO', chunk_size: int = 64 * 1024,
+                 download_engine: str = 'thread', cores: int = None, concurrency: int = 8, pool_size: int = None, adaptive: bool = False,
+                 max_concurrency: int = None, rate_limit: float = None, bandwidth_limit: float = None, host_rate_limit: float = None,
+                 host_bandwidth_limit: float = None, savestate_format: str = 'json', retries: int = 2, retry_backoff: float = 1.0,
+                 segment_threshold: int = None, segments: int = 4, schedule: str = 'fifo',
+                 progress: str = 'auto'):
         if root_dir is None:
             root_dir = Path('./')
         if log_file is None:
@@ -28,9 +88,54 @@ class Settings:
         self._download_dir: Path = self._root_dir.joinpath(Path('downloads/'))
         self._savestate_dir: Path = self._root_dir.joinpath(Path('savestates/'))
         self._log_file: Path = log_file
-        self._cores = min(4, max(1, multiprocessing.cpu_count() - 1))
+        if cores is None:
+            cores = min(4, max(1, multiprocessing.cpu_count() - 1))
+        if max_concurrency is None:
+            max_concurrency = concurrency * 4
+        if pool_size is None:
+            # the pool blocks if all connections to a host are in use, so it must not be below the highest concurrency
+            pool_size = max_concurrency if adaptive else concurrency
+        for name, value in (('cores', cores), ('concurrency', concurrency), ('pool size', pool_size), ('max concurrency', max_concurrency)):
+            if value <= 0:
+                raise ValueError(f"{name} must be positive.")
+        if max_concurrency < concurrency:
+            raise ValueError("max concurrency cannot be lower than concurrency.")
+        self._cores: int = cores
+        self._concurrency: int = concurrency
+        self._pool_size: int = pool_size
+        self._adaptive: bool = adaptive
+        self._max_concurrency: int = max_concurrency
+        for value in (rate_limit, bandwidth_limit, host_rate_limit, host_bandwidth_limit):
+            if value is not None and value <= 0:
+                raise ValueError("rate limits must be positive.")
+        self._rate_limit: Optional[float] = rate_limit
+        self._bandwidth_limit: Optional[float] = bandwidth_limit
+        self._host_rate_limit: Optional[float] = host_rate_limit
+        self._host_bandwidth_limit: Optional[float] = host_bandwidth_limit
+        if savestate_format not in SAVESTATE_FORMATS:
+            raise ValueError(f"unknown savestate format: {savestate_format}")
+        self._savestate_format: str = savestate_format
+        if retries < 0 or retry_backoff < 0:
+            raise ValueError("retries and retry backoff cannot be negative.")
+        self._retries: int = retries
+        self._retry_backoff: float = retry_backoff
+        if (segment_threshold is not None and segment_threshold <= 0) or segments <= 0:
+            raise ValueError("segment threshold and segments must be positive.")
+        self._segment_threshold: Optional[int] = segment_threshold
+        self._segments: int = segments
+        if schedule not in SCHEDULES:
+            raise ValueError(f"unknown schedule: {schedule}")
+        self._schedule: str = schedule
         self._log_level = log_level
-        self._disable_tqdm = False
+        if progress not in PROGRESS_STYLES:
+            raise ValueError(f"unknown progress style: {progress}")
+        self._progress: str = progress
+        if chunk_size <= 0:
+            raise ValueError("chunk size must be positive.")
+        self._chunk_size: int = chunk_size
+        if download_engine not in DOWNLOAD_ENGINES:
+            raise ValueError(f"unknown download engine: {download_engine}")
+        self._download_engine: str = download_engine
 
     def mkdir(self):
         """
@@ -94,6 +199,62 @@ class Settings:
         """
         return self._cores
 
+    @property
+    def concurrency(self) -> int:
+        """
+        Plain getter.
+        """
+        return self._concurrency
+
+    @property
+    def pool_size(self) -> int:
+        """
+        Plain getter.
+        """
+        return self._pool_size
+
+    @property
+    def adaptive(self) -> bool:
+        """
+        Plain getter.
+        """
+        return self._adaptive
+
+    @property
+    def max_concurrency(self) -> int:
+        """
+        Plain getter.
+        """
+        return self._max_concurrency
+
+    @property
+    def rate_limit(self) -> Optional[float]:
+        """
+        Plain getter.
+        """
+        return self._rate_limit
+
+    @property
+    def bandwidth_limit(self) -> Optional[float]:
+        """
+        Plain getter.
+        """
+        return self._bandwidth_limit
+
+    @property
+    def host_rate_limit(self) -> Optional[float]:
+        """
+        Plain getter.
+        """
+        return self._host_rate_limit
+
+    @property
+    def host_bandwidth_limit(self) -> Optional[float]:
+        """
+        Plain getter.
+        """
+        return self._host_bandwidth_limit
+
     @property
     def log_level(self) -> str:
         """
@@ -101,9 +262,72 @@ class Settings:
         """
         return self._log_level
 
+    @property
+    def progress(self) -> str:
+        """
+        Plain getter.
+        """
+        return self._progress
+
     @property
     def disable_tqdm(self) -> bool:
+        """
+        If no progress is shown.
+        """
+        return self._progress == 'none'
+
+    @property
+    def chunk_size(self) -> int:
+        """
+        Plain getter.
+        """
+        return self._chunk_size
+
+    @property
+    def download_engine(self) -> str:
+        """
+        Plain getter.
+        """
+        return self._download_engine
+
+    @property
+    def savestate_format(self) -> str:
+        """
+        Plain getter.
+        """
+        return self._savestate_format
+
+    @property
+    def retries(self) -> int:
+        """
+        Plain getter.
+        """
+        return self._retries
+
+    @property
+    def retry_backoff(self) -> float:
+        """
+        Plain getter.
+        """
+        return self._retry_backoff
+
+    @property
+    def segment_threshold(self) -> Optional[int]:
+        """
+        Plain getter.
+        """
+        return self._segment_threshold
+
+    @property
+    def segments(self) -> int:
+        """
+        Plain getter.
+        """
+        return self._segments
+
+    @property
+    def schedule(self) -> str:
         """
         Plain getter.
         """
-        return self._disable_tqdm
+        return self._schedule
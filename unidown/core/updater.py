@@ -2,22 +2,31 @@
 Things needed for checking for updates.
 """
 import json
+import time
+from pathlib import Path
 
-import certifi
-import urllib3
 from packaging.version import Version
 
 from unidown import static_data
 
+#: seconds a checked version is cached on disk
+CACHE_TTL = 24 * 60 * 60
+#: seconds the request of the newest version may take at most
+TIMEOUT = 3.0
 
-def get_newest_app_version() -> Version:
+
+def get_newest_app_version(timeout: float = TIMEOUT) -> Version:
     """
     Download the version tag from remote.
 
+    :param timeout: seconds the request may take at most, it is not retried
     :return: version from remote
+    :raises ~urllib3.exceptions.HTTPError: if the request failed or timed out
     """
+    import certifi
+    import urllib3
     with urllib3.PoolManager(cert_reqs='CERT_REQUIRED', ca_certs=certifi.where()) as p_man:
-        pypi_json = p_man.urlopen('GET', static_data.PYPI_JSON_URL).data.decode('utf-8')
+        pypi_json = p_man.urlopen('GET', static_data.PYPI_JSON_URL, timeout=urllib3.Timeout(total=timeout), retries=False).data.decode('utf-8')
     releases = json.loads(pypi_json).get('releases', [])
     online_version = Version('0.0.0')
     for release in releases:
@@ -27,10 +36,43 @@ def get_newest_app_version() -> Version:
     return online_version
 
 
-def check_for_app_updates() -> bool:
+def get_cached_app_version(cache_file: Path, ttl: float = CACHE_TTL, timeout: float = TIMEOUT) -> Version:
+    """
+    Get the newest version from the cache file, if it is not older than the ttl, otherwise from remote. A version from
+    remote is written into the cache file. A broken cache file is ignored.
+
+    :param cache_file: cache file
+    :param ttl: seconds a cached version is valid
+    :param timeout: seconds the request may take at most
+    :return: version from remote
+    :raises ~urllib3.exceptions.HTTPError: if the request failed or timed out
+    """
+    try:
+        with cache_file.open(encoding='utf8') as reader:
+            cache = json.loads(reader.read())
+        if 0 <= time.time() - cache['checked'] < ttl:
+            return Version(cache['version'])
+    except Exception:
+        pass
+    version = get_newest_app_version(timeout)
+    tmp_file = cache_file.with_name(cache_file.name + '.tmp')
+    with tmp_file.open('w', encoding='utf8') as writer:
+        writer.write(json.dumps({'checked': time.time(), 'version': str(version)}))
+    tmp_file.replace(cache_file)
+    return version
+
+
+def check_for_app_updates(cache_file: Path = None, ttl: float = CACHE_TTL, timeout: float = TIMEOUT) -> bool:
     """
     Check for updates.
 
+    :param cache_file: file to cache the newest version in, ``None`` always asks remote
+    :param ttl: seconds a cached version is valid
+    :param timeout: seconds the request may take at most
     :return: is update available
     """
-    return get_newest_app_version() > Version(static_data.VERSION)
+    if cache_file is None:
+        newest = get_newest_app_version(timeout)
+    else:
+        newest = get_cached_app_version(cache_file, ttl, timeout)
+    return newest > Version(static_data.VERSION)
@@ -8,8 +8,9 @@ from argparse import ArgumentParser
 from pathlib import Path
 
 from unidown import static_data, tools
-from unidown.core import manager
-from unidown.core.settings import Settings
+from unidown.core import manager, updater
+from unidown.core.report import RunReport, profile
+from unidown.core.settings import DOWNLOAD_ENGINES, PROGRESS_STYLES, SAVESTATE_FORMATS, SCHEDULES, Settings
 from unidown.plugin.a_plugin import APlugin
 
 
@@ -41,8 +42,11 @@ def main(argv=None):
     parser.add_argument('-v', '--version', action='version', version=f"{static_data.NAME} {static_data.VERSION}")
     parser.add_argument('--list-plugins', action=PluginListAction, help="show plugin list and exit")
 
-    parser.add_argument('-p', '--plugin', dest='plugin', default="", type=str, required=True, metavar='name',
-                        help='plugin to execute')
+    plugin_group = parser.add_mutually_exclusive_group(required=True)
+    plugin_group.add_argument('-p', '--plugin', dest='plugins', action='append', type=str, metavar='name',
+                              help='plugin to execute, can be given multiple times to run several plugins at the same time')
+    plugin_group.add_argument('--all-plugins', dest='all_plugins', action='store_true',
+                              help='execute all available plugins at the same time')
     parser.add_argument('-o', '--option', action='append', nargs='+', dest='options', type=str, metavar='option',
                         help='options passed to the plugin, e.g. `-o username=South American coati -o password=Nasua Nasua`')
     parser.add_argument('-r', '--root', dest='root_dir', default=None, type=str, metavar='path',
@@ -51,6 +55,48 @@ def main(argv=None):
                         help='log filepath relativ to the main dir (default: %(default)s)')
     parser.add_argument('-l', '--log', dest='log_level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], default='INFO',
                         help='set the logging level (default: %(default)s)')
+    parser.add_argument('--chunk-size', dest='chunk_size', default=64 * 1024, type=int, metavar='bytes',
+                        help='size of the chunks downloads are written to disk with (default: %(default)s)')
+    parser.add_argument('--engine', dest='download_engine', choices=DOWNLOAD_ENGINES, default='thread',
+                        help='engine which schedules the downloads, plugins may enforce their own (default: %(default)s)')
+    parser.add_argument('--concurrency', dest='concurrency', default=8, type=int, metavar='number',
+                        help='number of simultaneous downloads, in adaptive mode the initial number (default: %(default)s)')
+    parser.add_argument('--max-concurrency', dest='max_concurrency', default=None, type=int, metavar='number',
+                        help='highest number of simultaneous downloads in adaptive mode (default: 4 * concurrency)')
+    parser.add_argument('--adaptive', dest='adaptive', action='store_true',
+                        help='adapt the number of simultaneous downloads to the throughput and error rate')
+    parser.add_argument('--pool-size', dest='pool_size', default=None, type=int, metavar='number',
+                        help='number of connections kept per host (default: concurrency, with --adaptive max concurrency)')
+    parser.add_argument('--cores', dest='cores', default=None, type=int, metavar='number',
+                        help='number of cpu cores used for cpu bound work like hashing downloaded files (default: all but one, at most 4)')
+    parser.add_argument('--rate-limit', dest='rate_limit', default=None, type=float, metavar='requests',
+                        help='overall requests per second (default: unlimited)')
+    parser.add_argument('--bandwidth-limit', dest='bandwidth_limit', default=None, type=float, metavar='bytes',
+                        help='overall bytes per second (default: unlimited)')
+    parser.add_argument('--host-rate-limit', dest='host_rate_limit', default=None, type=float, metavar='requests',
+                        help='requests per second for every host (default: unlimited)')
+    parser.add_argument('--host-bandwidth-limit', dest='host_bandwidth_limit', default=None, type=float, metavar='bytes',
+                        help='bytes per second for every host (default: unlimited)')
+    parser.add_argument('--retries', dest='retries', default=2, type=int, metavar='number',
+                        help='how often a temporary failed download is retried (default: %(default)s)')
+    parser.add_argument('--retry-backoff', dest='retry_backoff', default=1.0, type=float, metavar='seconds',
+                        help='delay before the first retry, doubled for every further one (default: %(default)s)')
+    parser.add_argument('--segment-threshold', dest='segment_threshold', default=None, type=int, metavar='bytes',
+                        help='download files of at least this size in segments at the same time (default: disabled)')
+    parser.add_argument('--segments', dest='segments', default=4, type=int, metavar='number',
+                        help='segments of a large file (default: %(default)s)')
+    parser.add_argument('--schedule', dest='schedule', choices=SCHEDULES, default='fifo',
+                        help='order of the downloads, by priority and expected size (default: %(default)s)')
+    parser.add_argument('--progress', dest='progress', choices=PROGRESS_STYLES, default='auto',
+                        help='how the progress is shown, auto uses a progress bar only on an interactive console (default: %(default)s)')
+    parser.add_argument('--no-update-check', dest='update_check', action='store_false',
+                        help='do not check for a new version of the program')
+    parser.add_argument('--report', dest='report', default=None, type=str, metavar='path',
+                        help='write a json report with the durations of the phases and download counters of every plugin')
+    parser.add_argument('--profile', dest='profile', default=None, type=str, metavar='path',
+                        help='profile the run including its threads with cProfile and write the statistics to the file')
+    parser.add_argument('--savestate', dest='savestate_format', choices=SAVESTATE_FORMATS, default='json',
+                        help='storage format of the savestates, plugins may enforce their own (default: %(default)s)')
 
     args = parser.parse_args(argv)
     try:
@@ -60,7 +106,14 @@ def main(argv=None):
         log_file = args.logfile
         if args.logfile is not None:
             log_file = Path(args.logfile)
-        settings = Settings(root_dir, log_file, args.log_level)
+        settings = Settings(
+            root_dir, log_file, args.log_level, chunk_size=args.chunk_size, download_engine=args.download_engine, cores=args.cores,
+            concurrency=args.concurrency, pool_size=args.pool_size, adaptive=args.adaptive, max_concurrency=args.max_concurrency,
+            rate_limit=args.rate_limit, bandwidth_limit=args.bandwidth_limit, host_rate_limit=args.host_rate_limit,
+            host_bandwidth_limit=args.host_bandwidth_limit, savestate_format=args.savestate_format, retries=args.retries,
+            retry_backoff=args.retry_backoff, segment_threshold=args.segment_threshold, segments=args.segments,
+            schedule=args.schedule, progress=args.progress
+        )
         settings.mkdir()
         manager.init_logging(settings)
     except PermissionError:
@@ -69,10 +122,22 @@ def main(argv=None):
     except FileExistsError:
         logging.exception("")
         sys.exit(1)
+    except ValueError as ex:
+        parser.error(str(ex))
     except Exception:
         logging.exception("Something went wrong")
         sys.exit(1)
-    manager.check_update()
-    manager.run(settings, args.plugin, args.options)
+    update_check = manager.start_update_check(settings) if args.update_check else None
+    reports = {}
+    with profile(None if args.profile is None else Path(args.profile)):
+        if args.all_plugins or len(args.plugins) > 1:
+            manager.run_plugins(settings, None if args.all_plugins else args.plugins, args.options, reports)
+        else:
+            reports[args.plugins[0]] = RunReport(args.plugins[0])
+            manager.run(settings, args.plugins[0], args.options, report=reports[args.plugins[0]])
+    if args.report is not None:
+        RunReport.write(Path(args.report), reports)
+    if update_check is not None:
+        update_check.join(updater.TIMEOUT)
     manager.shutdown()
     sys.exit(0)
@@ -1,26 +1,58 @@
-import json
+from __future__ import annotations
+
+import base64
+import binascii
+import copy
+import hashlib
+import inspect
 import logging
+import stat as stat_module
+import threading
 import time
 from abc import ABC, abstractmethod
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Tuple
+from importlib.metadata import EntryPoint
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple, Union
+from urllib.parse import urljoin, urlsplit
 
-import certifi
-import pkg_resources
-import urllib3
-import urllib3.util
 from packaging.version import Version
-from tqdm import tqdm
-from urllib3.exceptions import HTTPError
 
 from unidown import tools
+from unidown.core.concurrency import ConcurrencyLimiter
+from unidown.core.progress import Progress, create_progress
+from unidown.core.rate_limiter import RateLimiter
+from unidown.core.report import RunReport
+from unidown.core.retry import RetryPolicy, sleep_until
+from unidown.core.scheduler import order_items
 from unidown.core.settings import Settings
 from unidown.plugin.exceptions import PluginException
+from unidown.plugin.link_item import LinkItem
 from unidown.plugin.link_item_dict import LinkItemDict
 from unidown.plugin.plugin_info import PluginInfo
-from unidown.plugin.savestate import SaveState
+from unidown.plugin.savestate import FailedItem, SaveState
+from unidown.plugin.savestate_backend import SAVESTATE_BACKENDS, SaveStateBackend
+
+if TYPE_CHECKING:
+    import certifi
+    import urllib3
+    from urllib3.exceptions import HTTPError
+
+    from unidown.plugin.download_error import DownloadError
+
+
+def _import_http():
+    """
+    Import urllib3, certifi and the download error into this module. Called by every plugin at creation, as listing the
+    plugins does not need them.
+    """
+    global certifi, urllib3, HTTPError, DownloadError
+    import certifi
+    import urllib3
+    from urllib3.exceptions import HTTPError
+
+    from unidown.plugin.download_error import DownloadError
 
 
 class APlugin(ABC):
@@ -32,21 +64,47 @@ class APlugin(ABC):
 
     :cvar _info: information about the plugin
     :cvar _savestate_cls: savestate class to use
-    :ivar _disable_tqdm: if the tqdm progressbar should be disabled **| do not edit**
+    :cvar _download_engine: download engine the plugin should always use, ``None`` uses the one from the settings
+    :cvar _savestate_format: savestate storage the plugin should always use, ``None`` uses the one from the settings
+    :ivar _progress: how the progress is shown, see :func:`~unidown.plugin.a_plugin.APlugin.progress` **| do not edit**
     :ivar _log: use this for logging **| do not edit**
-    :ivar _simul_downloads: number of simultaneous downloads
+    :ivar _simul_downloads: number of simultaneous downloads, in adaptive mode the initial number
+    :ivar _max_simul_downloads: highest number of simultaneous downloads in adaptive mode
+    :ivar _adaptive: if the number of simultaneous downloads is adapted to the throughput and error rate
+    :ivar _chunk_size: size in bytes of the chunks a download is written with, bounds the memory per download
+    :ivar _segment_threshold: size in bytes from which a file is downloaded in segments, ``None`` disables it
+    :ivar _segments: number of segments a large file is downloaded in at the same time
+    :ivar _schedule: order of the download queue, see :func:`~unidown.core.scheduler.order_items`
+    :ivar _hash_slots: limits the files which are read again for hashing at the same time to the cpu cores
+    :ivar _engine: download engine which is used **| do not edit**
     :ivar _temp_dir: path where the plugin can place all temporary data **| do not edit**
     :ivar _download_dir: general download path of the plugin **| do not edit**
+    :ivar _savestate_backend: storage of the savestate **| do not edit**
     :ivar _savestate_file: file which contains the latest savestate of the plugin **| do not edit**
     :ivar _last_update: latest update time of the referencing data **| do not edit**
     :ivar _unit: the thing which should be downloaded, may be displayed in the progress bar
     :ivar _download_data: referencing data **| do not edit**
-    :ivar _downloader: downloader which will download the data **| do not edit**
+    :ivar _downloader: downloader which will download the data, keeps a connection pool per host **| do not edit**
+    :ivar _rate_limiter: limits requests and bandwidth overall and per host, shared by all downloads and possibly with other plugins **| do not edit**
+    :ivar _limiter: limits the simultaneous downloads across plugins, ``None`` limits every download call on its own **| do not edit**
+    :ivar _report: report of the run, counts downloads, transferred bytes and retries **| do not edit**
+    :ivar _retry_policy: decides if and when failed downloads are retried
+    :ivar _failed_downloads: links whose download failed finally, with the error **| do not edit**
+    :ivar _part_files: partial files of the downloads of this run, others are expired at the clean up **| do not edit**
     :ivar _savestate: savestate of the plugin
     :ivar _options: options which the plugin uses internal, should be used for the given options at init
     """
+    #: suffix of partial downloaded files, those will survive the clean up of the temporary directory
+    PART_SUFFIX: str = '.part'
+    #: suffix of the file next to a partial download, which holds the validator of the content the part belongs to
+    VALIDATOR_SUFFIX: str = '.validator'
+    #: algorithms of the ``Digest`` header (RFC 3230) which are verified, mapped to their hashlib name
+    DIGEST_ALGORITHMS: Dict[str, str] = {'md5': 'md5', 'sha': 'sha1', 'sha-256': 'sha256', 'sha-512': 'sha512'}
+
     _info: PluginInfo = None
     _savestate_cls = SaveState
+    _download_engine: str = None
+    _savestate_format: str = None
 
     def __init__(self, settings: Settings, options: Dict[str, Any] = None):
         if options is None:
@@ -54,13 +112,27 @@ class APlugin(ABC):
         if self._info is None:
             raise ValueError("info is not set.")
 
-        self._disable_tqdm = settings.disable_tqdm
+        self._progress: str = settings.progress
         self._log: logging.Logger = logging.getLogger(self._info.name)
-        self._simul_downloads: int = settings.cores
+        self._simul_downloads: int = settings.concurrency
+        self._max_simul_downloads: int = settings.max_concurrency
+        self._adaptive: bool = settings.adaptive
+        self._chunk_size: int = settings.chunk_size
+        self._segment_threshold: Optional[int] = settings.segment_threshold
+        self._segments: int = settings.segments
+        self._schedule: str = settings.schedule
+        self._hash_slots = threading.BoundedSemaphore(settings.cores)
+        self._engine: str = settings.download_engine if self._download_engine is None else self._download_engine
 
         self._temp_dir: Path = settings.temp_dir.joinpath(self.name)
         self._download_dir: Path = settings.download_dir.joinpath(self.name)
-        self._savestate_file: Path = settings.savestate_dir.joinpath(self.name + '_save.json')
+        savestate_format = settings.savestate_format if self._savestate_format is None else self._savestate_format
+        self._savestate_backend: SaveStateBackend = SAVESTATE_BACKENDS[savestate_format](
+            settings.savestate_dir, self.name, self._log, self._savestate_cls
+        )
+        self._savestate_file: Path = self._savestate_backend.file
+        self._journal_lock = threading.Lock()
+        self._compaction_lock = threading.Lock()
 
         try:
             self._temp_dir.mkdir(parents=True, exist_ok=True)
@@ -76,14 +148,26 @@ class APlugin(ABC):
         self._savestate: SaveState = self._savestate_cls(self.info, self.last_update, LinkItemDict())
 
         self._unit: str = 'item'
-        self._downloader: urllib3.HTTPSConnectionPool = urllib3.HTTPSConnectionPool(
-            self.info.host, maxsize=self._simul_downloads, cert_reqs='CERT_REQUIRED', ca_certs=certifi.where()
+        _import_http()
+        self._downloader: urllib3.PoolManager = urllib3.PoolManager(
+            num_pools=32, maxsize=settings.pool_size, block=True, cert_reqs='CERT_REQUIRED', ca_certs=certifi.where()
         )
 
         # load options
         self._options: Dict[str, Any] = options
         self._load_default_options()
 
+        host_rate_limit = settings.host_rate_limit
+        if self._options['delay'] > 0:
+            # the former sleep after each download, is now a limit of requests per host
+            host_rate_limit = min(1 / self._options['delay'], host_rate_limit or float('inf'))
+        self._rate_limiter: RateLimiter = RateLimiter(settings.rate_limit, settings.bandwidth_limit, host_rate_limit, settings.host_bandwidth_limit)
+        self._limiter: Optional[ConcurrencyLimiter] = None
+        self._report: RunReport = RunReport(self.name)
+        self._retry_policy: RetryPolicy = RetryPolicy(settings.retries, settings.retry_backoff)
+        self._failed_downloads: Dict[str, str] = {}
+        self._part_files: Set[Path] = set()
+
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, self.__class__):
             return False
@@ -106,6 +190,69 @@ class APlugin(ABC):
         """
         return self._simul_downloads
 
+    @property
+    def limiter(self) -> Optional[ConcurrencyLimiter]:
+        """
+        Plain getter.
+        """
+        return self._limiter
+
+    @limiter.setter
+    def limiter(self, limiter: Optional[ConcurrencyLimiter]):
+        """
+        Share a limiter of simultaneous downloads, e.g. with other plugins running at the same time.
+        """
+        self._limiter = limiter
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """
+        Plain getter.
+        """
+        return self._rate_limiter
+
+    @rate_limiter.setter
+    def rate_limiter(self, rate_limiter: RateLimiter):
+        """
+        Share a rate limiter, e.g. with other plugins running at the same time. A limit of requests per host from the
+        ``delay`` option applies on top.
+        """
+        if self._options['delay'] > 0:
+            rate_limiter = RateLimiter(host_requests=1 / self._options['delay'], parent=rate_limiter)
+        self._rate_limiter = rate_limiter
+
+    @property
+    def report(self) -> RunReport:
+        """
+        Plain getter.
+        """
+        return self._report
+
+    @report.setter
+    def report(self, report: RunReport):
+        self._report = report
+
+    @property
+    def failed_downloads(self) -> Dict[str, str]:
+        """
+        Plain getter.
+        """
+        return self._failed_downloads
+
+    @property
+    def chunk_size(self) -> int:
+        """
+        Plain getter.
+        """
+        return self._chunk_size
+
+    @property
+    def engine(self) -> str:
+        """
+        Plain getter.
+        """
+        return self._engine
+
     @property
     def info(self) -> PluginInfo:
         """
@@ -185,30 +332,18 @@ class APlugin(ABC):
 
     def load_savestate(self):
         """
-        Load the save of the plugin.
+        Load the save of the plugin. Items journaled by an interrupted run are applied on top.
 
-        :raises ~unidown.plugin.exceptions.PluginException: broken savestate json
+        :raises ~unidown.plugin.exceptions.PluginException: broken savestate
         :raises ~unidown.plugin.exceptions.PluginException: different savestate versions
         :raises ~unidown.plugin.exceptions.PluginException: different plugin versions
         :raises ~unidown.plugin.exceptions.PluginException: different plugin names
-        :raises ~unidown.plugin.exceptions.PluginException: could not parse the json
+        :raises ~unidown.plugin.exceptions.PluginException: could not parse the savestate
         """
-        if not self._savestate_file.exists():
+        if not self._savestate_backend.exists():
             self.log.info("No savestate file found.")
-            return
 
-        with self._savestate_file.open(encoding="utf8") as reader:
-            try:
-                savestate_json = json.loads(reader.read())
-            except Exception:
-                raise PluginException(f"Broken savestate json. Please fix or delete this file (you may lose data in this case): {self._savestate_file}")
-
-        try:
-            savestate = self._savestate_cls.from_json(savestate_json)
-        except Exception as ex:
-            raise PluginException(f"Could not load savestate from json {self._savestate_file}: {ex}")
-        else:
-            del savestate_json
+        savestate = self._savestate_backend.load(self._savestate)
         savestate = self._savestate_cls.upgrade(savestate)
 
         if savestate.plugin_info.name != self.info.name:
@@ -233,107 +368,694 @@ class APlugin(ABC):
         self._last_update = self._create_last_update_time()
 
     @abstractmethod
-    def _create_download_data(self) -> LinkItemDict:
+    def _create_download_data(self) -> Union[LinkItemDict, Iterator[Tuple[str, LinkItem]]]:
         """
         Get the download links in a specific format.
         **Has to be implemented inside Plugins.**
 
+        It can also be a generator which yields link and item one by one, e.g. while crawling paginated index pages. The
+        download routine then processes and downloads them while the next ones are created, see
+        :attr:`~unidown.plugin.a_plugin.APlugin.streaming`.
+
         :raises NotImplementedError: abstract method
         """
         raise NotImplementedError
 
+    @property
+    def streaming(self) -> bool:
+        """
+        If :func:`~unidown.plugin.a_plugin.APlugin._create_download_data` is a generator.
+        """
+        return inspect.isgeneratorfunction(self._create_download_data)
+
     def update_download_data(self):
         """
-        Update the download links. Calls :func:`~unidown.plugin.a_plugin.APlugin._create_download_data`.
+        Update the download links. Calls :func:`~unidown.plugin.a_plugin.APlugin._create_download_data`, yielded links
+        are collected.
         """
-        self._download_data = self._create_download_data()
+        data = self._create_download_data()
+        self._download_data = data if isinstance(data, LinkItemDict) else LinkItemDict(data)
 
-    def download(self, link_items: LinkItemDict, folder: Path, desc: str, unit: str):
+    def iter_download_data(self) -> Iterator[Tuple[str, LinkItem]]:
+        """
+        Update the download links like :func:`~unidown.plugin.a_plugin.APlugin.update_download_data`, but pass every
+        link on as soon as it is created. If the plugin is not streaming, the links are created all at once first.
+
+        :return: link and item
+        """
+        self._download_data = LinkItemDict()
+        data = self._create_download_data()
+        for link, item in data.items() if isinstance(data, dict) else data:
+            self._download_data[link] = item
+            yield link, item
+
+    def download(self, link_items: Union[LinkItemDict, Iterable[Tuple[str, LinkItem]]], folder: Path, desc: str, unit: str,
+                 journal: bool = False):
         """
         .. warning::
 
-            The parameters may change in future versions. (e.g. change order and accept another host)
+            The parameters may change in future versions. (e.g. change order)
 
-        Download the given LinkItem dict from the plugins host, to the given path. Proceeded with multiple connections
-        :attr:`~unidown.plugin.a_plugin.APlugin._simul_downloads`. After
+        Download the given LinkItem dict to the given path. Links are relative to the plugins host, unless they are
+        absolute urls (see :func:`~unidown.plugin.a_plugin.APlugin.absolute_url`). Proceeded with multiple connections
+        :attr:`~unidown.plugin.a_plugin.APlugin._simul_downloads`, in adaptive mode this number is adjusted to the
+        throughput up to :attr:`~unidown.plugin.a_plugin.APlugin._max_simul_downloads`. If a limiter is shared with
+        :attr:`~unidown.plugin.a_plugin.APlugin.limiter`, it is used instead. After
         :func:`~unidown.plugin.a_plugin.APlugin.check_download` is recommend.
 
-        This function don't use an internal `link_item_dict`, `delay` or `folder` directly set in options or instance
+        The downloads are scheduled by the :attr:`~unidown.plugin.a_plugin.APlugin._engine`, ``thread`` submits every
+        item to a thread pool, ``asyncio`` drives a fixed number of workers with an event loop which pull the items one
+        by one, so the memory needed for scheduling does not grow with the number of items. A dict is downloaded in the
+        order of :attr:`~unidown.plugin.a_plugin.APlugin._schedule`, using the
+        :func:`~unidown.plugin.a_plugin.APlugin.priority` of the items and their size, which is known from the previous
+        download (see :func:`~unidown.core.scheduler.order_items`). Other iterables are downloaded in their order.
+
+        A download which failed temporarily (no response, a status like ``503`` or an incomplete content) is put back at
+        the end of the batch and retried after all other items, with a delay of
+        :attr:`~unidown.plugin.a_plugin.APlugin._retry_policy`. So no worker is blocked while waiting for the retry.
+        Downloads which failed finally are kept in :attr:`~unidown.plugin.a_plugin.APlugin.failed_downloads`.
+
+        This function don't use an internal `link_item_dict` or `folder` directly set in options or instance
         vars, because it can be used aside of the normal download routine inside the plugin itself for own things.
         As of this it still needs access to the logger, so a staticmethod is not possible.
 
-        :param link_items: data which gets downloaded
+        :param link_items: data which gets downloaded, can also be an iterable of link and item, which is consumed while
+                           downloading, e.g. a generator which creates them
         :param folder: target download folder
-        :param desc: description of the progressbar
-        :param unit: unit of the download, shown in the progressbar
+        :param desc: description of the progress
+        :param unit: unit of the download, shown in the progress
+        :param journal: add every succeeded item to the savestate journal, see :func:`~unidown.plugin.a_plugin.APlugin.journal_item`
         """
-        # TODO: add other optional host?
-        if len(link_items) == 0:
-            return
+        if isinstance(link_items, dict):
+            if len(link_items) == 0:
+                return
+            total = len(link_items)
+            if self._schedule != 'fifo':
+                link_items = order_items(link_items, self._schedule, self._expected_size, self.priority)
+        else:
+            total = None
 
-        job_list = []
-        with ThreadPoolExecutor(max_workers=self._simul_downloads) as executor:
-            for link, item in link_items.items():
-                job = executor.submit(self.download_as_file, link, folder.joinpath(item.name), self._options['delay'])
-                job_list.append(job)
+        limiter = self._limiter
+        if limiter is None:
+            if self._adaptive:
+                limiter = ConcurrencyLimiter(self._simul_downloads, max(self._simul_downloads, self._max_simul_downloads), adaptive=True)
+            else:
+                limiter = ConcurrencyLimiter(self._simul_downloads)
+
+        with self.progress(desc, unit, total) as pbar:
+            failures = self._download_batch(link_items, folder, limiter, pbar, journal)
+            attempt = 1
+            while failures:
+                queue = []
+                for link, item, error in failures:
+                    delay = None
+                    if self._retry_policy.is_retryable(getattr(error, 'status', None)):
+                        delay = self._retry_policy.delay(attempt, getattr(error, 'retry_after', None))
+                    if delay is None:
+                        self._failed_downloads[link] = str(error)
+                        self.log.warning(f"Failed to download: {str(error)}")
+                    else:
+                        self.log.info(f"Retry in {delay:.1f}s: {str(error)}")
+                        queue.append((time.monotonic() + delay, link, item))
+                if not queue:
+                    break
+                queue.sort(key=lambda entry: entry[0])
+                self._report.count('requeued', len(queue))
+                pbar.add_total(len(queue))
+                failures = self._download_batch(self._when_due(queue), folder, limiter, pbar, journal)
+                attempt += 1
+
+    def progress(self, desc: str, unit: str, total: int = None) -> Progress:
+        """
+        Create a progress reporter in the style of the settings, e.g. for own long running loops of the plugin.
+        Check :attr:`~unidown.core.progress.Progress.enabled` before counting, to skip it if nothing is shown.
 
-            pbar = tqdm(as_completed(job_list), total=len(job_list), desc=desc, unit=unit, mininterval=1, ncols=100, disable=self._disable_tqdm)
-            for _ in pbar:
-                pass
+        :param desc: description
+        :param unit: unit which is counted
+        :param total: total number of units, None if unknown
+        :return: progress
+        """
+        return create_progress(self._progress, desc, unit, total, self._log)
 
-        for job in job_list:
+    def priority(self, link: str, item: LinkItem) -> int:
+        """
+        Get the download priority of an item, items with a higher one are downloaded first, see
+        :func:`~unidown.core.scheduler.order_items`. Can be overridden by the plugin, the default is 0 for every item.
+
+        :param link: link
+        :param item: item
+        :return: priority
+        """
+        return 0
+
+    def _expected_size(self, link: str, item: LinkItem) -> Optional[int]:
+        """
+        Get the expected size of an item, from the item itself or its previous download.
+
+        :param link: link
+        :param item: item
+        :return: size in bytes, None if unknown
+        """
+        if item.size is not None:
+            return item.size
+        previous = self._savestate.link_items.get(link)
+        return None if previous is None else previous.size
+
+    @staticmethod
+    def _when_due(queue: List[Tuple[float, str, LinkItem]]) -> Iterator[Tuple[str, LinkItem]]:
+        """
+        Yield the queued items as soon as they are due.
+
+        :param queue: due time of :func:`time.monotonic`, link and item, sorted by the due time
+        :return: link and item
+        """
+        for due, link, item in queue:
+            sleep_until(due)
+            yield link, item
+
+    def _download_batch(self, link_items: Union[LinkItemDict, Iterable[Tuple[str, LinkItem]]], folder: Path, limiter: ConcurrencyLimiter,
+                        pbar: Progress, journal: bool) -> List[Tuple[str, LinkItem, HTTPError]]:
+        """
+        Download the items once with the :attr:`~unidown.plugin.a_plugin.APlugin._engine`.
+
+        :param link_items: data which gets downloaded
+        :param folder: target download folder
+        :param limiter: limits the simultaneous downloads
+        :param pbar: progress which is updated after every item
+        :param journal: add every succeeded item to the savestate journal
+        :return: link, item and error of every failed download
+        """
+        if self._engine == 'asyncio':
+            import asyncio
+            return asyncio.run(self._download_async(link_items, folder, limiter, pbar, journal))
+
+        job_list = []
+        with ThreadPoolExecutor(max_workers=limiter.maximum) as executor:
+            for link, item in link_items.items() if isinstance(link_items, dict) else link_items:
+                job = executor.submit(self._download_limited, limiter, link, item, folder, journal)
+                if pbar.enabled:
+                    job.add_done_callback(lambda _: pbar.update())
+                job_list.append((link, item, job))
+
+        failures = []
+        for link, item, job in job_list:
             try:
                 job.result()
             except HTTPError as ex:
-                self.log.warning(f"Failed to download: {str(ex)}")
+                failures.append((link, item, ex))
+        return failures
 
-    def download_as_file(self, url: str, target_file: Path, delay: float = 0) -> str:
+    async def _download_async(self, link_items: Union[LinkItemDict, Iterable[Tuple[str, LinkItem]]], folder: Path, limiter: ConcurrencyLimiter,
+                              pbar: Progress, journal: bool) -> List[Tuple[str, LinkItem, HTTPError]]:
         """
-        Download the given url to the given target folder.
+        Download engine based on asyncio. Starts as many workers as the limiter may allow at most, which share one iterator
+        over the items, the blocking transfers itself are run inside an executor. An iterable which is not a dict or list
+        may block while creating the next item, so it is advanced inside its own single thread executor.
 
-        :param url: link
+        :param link_items: data which gets downloaded
+        :param folder: target download folder
+        :param limiter: limits the simultaneous downloads
+        :param pbar: progress which is updated after every item
+        :param journal: add every succeeded item to the savestate journal
+        :return: link, item and error of every failed download
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        if isinstance(link_items, (dict, list)):
+            items = iter(link_items.items() if isinstance(link_items, dict) else link_items)
+            workers = min(limiter.maximum, len(link_items))
+            producer = None
+        else:
+            items = iter(link_items)
+            workers = limiter.maximum
+            producer = ThreadPoolExecutor(max_workers=1)
+        failures = []
+
+        async def worker():
+            while True:
+                entry = next(items, None) if producer is None else await loop.run_in_executor(producer, next, items, None)
+                if entry is None:
+                    break
+                try:
+                    await loop.run_in_executor(executor, self._download_limited, limiter, *entry, folder, journal)
+                except HTTPError as ex:
+                    failures.append((*entry, ex))
+                if pbar.enabled:
+                    pbar.update()
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                await asyncio.gather(*(worker() for _ in range(workers)))
+        finally:
+            if producer is not None:
+                producer.shutdown()
+        return failures
+
+    def _download_limited(self, limiter: ConcurrencyLimiter, link: str, item: LinkItem, folder: Path, journal: bool) -> str:
+        """
+        Download the item as soon as the limiter allows it and report the outcome back to it. If the link was downloaded
+        before under the same name, the request is conditional on the item inside the savestate.
+
+        :param limiter: limits the simultaneous downloads
+        :param link: link
+        :param item: item
+        :param folder: target download folder
+        :param journal: add the item to the savestate journal if it succeeded
+        :return: link
+        :raises ~urllib3.exceptions.HTTPError: if the connection has an error
+        """
+        target_file = folder.joinpath(item.name)
+        previous = self._savestate.link_items.get(link)
+        if previous is not None and previous.name != item.name:
+            previous = None
+        with limiter:
+            try:
+                self.download_as_file(link, target_file, item=item, previous=previous)
+            except HTTPError:
+                limiter.report(0, failed=True)
+                self._report.count('failed')
+                raise
+            limiter.report(item.size or 0)
+            self._report.count('downloaded')
+        self._failed_downloads.pop(link, None)
+        if journal:
+            self.journal_item(link, item)
+        return link
+
+    def download_as_file(self, url: str, target_file: Path, *, item: LinkItem = None, previous: LinkItem = None) -> str:
+        """
+        Download the given url to the given target folder. The content is streamed to disk in chunks of
+        :attr:`~unidown.plugin.a_plugin.APlugin._chunk_size` bytes, so the file is never held in memory as a whole.
+
+        The data is written into a ``.part`` file inside :attr:`~unidown.plugin.a_plugin.APlugin._temp_dir` first, which
+        is moved to the target file after the download completed. If a ``.part`` file of a previous interrupted download
+        exists, the download is resumed with a HTTP range request. The validator of the content (a strong ``ETag`` or the
+        ``Last-Modified``) is stored next to it and sent as ``If-Range``, so only the same content is appended. A changed
+        content is downloaded from the beginning, a part without a validator is discarded.
+
+        While streaming the content is hashed with sha256 and counted. The byte count is verified against the
+        ``Content-Length`` (or the total of the ``Content-Range``) and the hash against a ``Digest`` header of the server,
+        if present. A content which is too long or does not match the digest is discarded. A too short content, e.g. of a
+        connection which was closed early, is kept to be resumed by the next attempt.
+
+        If the item of a previous download is given and the target file still exists, the request is conditional with
+        its ``ETag`` and ``Last-Modified``. A ``304 Not Modified`` keeps the target file as it is and counts as success.
+        A changed content replaces the target file of the previous download, other existing files are renamed.
+
+        If :attr:`~unidown.plugin.a_plugin.APlugin._segment_threshold` is set, the size is requested with ``HEAD`` first
+        and contents of at least this size are downloaded in segments at the same time, see
+        :func:`~unidown.plugin.a_plugin.APlugin._download_segmented`. Files which were smaller on the previous download
+        are not requested with ``HEAD``.
+
+        Redirects are followed, also to other hosts. Connections are kept alive and reused per host. Requests and the
+        transferred bytes are throttled by :attr:`~unidown.plugin.a_plugin.APlugin._rate_limiter`. A broken connection is
+        retried once immediately, everything else is up to the caller, see :func:`~unidown.plugin.a_plugin.APlugin.download`.
+
+        :param url: link, relative to the plugins host or absolute
         :param target_file: target file
-        :param delay: after download wait this much seconds
+        :param item: if given, size, hash and validators of the content are stored into it
+        :param previous: item of the previous download of this url into the target file
         :return: url
         :raises ~urllib3.exceptions.HTTPError: if the connection has an error
+        :raises ~unidown.plugin.download_error.DownloadError: if the response has an error status
+        :raises ~unidown.plugin.download_error.DownloadError: if the content does not match the announced size or digest
+        """
+        abs_url = self.absolute_url(url)
+        part_file = self._part_file(abs_url, target_file)
+        self._part_files.add(part_file)
+        offset = part_file.stat().st_size if part_file.exists() else 0
+        validator = None
+        if offset > 0:
+            validator = self._read_validator(part_file)
+            if validator is None:
+                self.log.info(f"Can not resume '{url}' without a validator, restarting the download.")
+                self._discard_part_file(part_file)
+                offset = 0
+        headers = {}
+        if offset > 0:
+            headers['Range'] = f"bytes={offset}-"
+            headers['If-Range'] = validator
+        elif previous is not None and target_file.is_file():
+            if previous.etag is not None:
+                headers['If-None-Match'] = previous.etag
+            if previous.last_modified is not None:
+                headers['If-Modified-Since'] = previous.last_modified
+        # the target file is the previous download of this item, a new content replaces it
+        replace = previous is not None and previous.name == target_file.name
+        host = urlsplit(abs_url).hostname
+        limited = self._rate_limiter.enabled
+        retries = urllib3.Retry(connect=1, read=1, redirect=5, status=0, respect_retry_after_header=False)
+
+        if (offset == 0 and self._segment_threshold is not None
+                and (previous is None or previous.size is None or previous.size >= self._segment_threshold)):
+            if limited:
+                self._rate_limiter.request(host)
+            head = self._downloader.request('HEAD', abs_url, headers=headers, retries=retries)
+            if head.status == 304 and headers:
+                return self._not_modified(url, abs_url, item, previous)
+            size, digests = self._expected_content(head.headers, head.status)
+            if (head.status == 200 and size is not None and size >= self._segment_threshold
+                    and head.headers.get('Accept-Ranges', '').lower() == 'bytes'):
+                digest = self._download_segmented(abs_url, part_file, size, digests, head.headers, retries)
+                self._move_part_file(part_file, target_file, replace)
+                if item is not None:
+                    item.size = size
+                    item.hash = digest
+                    item.etag, item.last_modified = head.headers.get('ETag'), head.headers.get('Last-Modified')
+                return url
+
+        if limited:
+            self._rate_limiter.request(host)
+        with self._downloader.request('GET', abs_url, headers=headers, preload_content=False, retries=retries) as reader:
+            if reader.retries is not None and reader.retries.history:
+                self._report.count('retries', len(reader.retries.history))
+            if (reader.status == 206 and reader.headers.get('Content-Range', '').startswith(f"bytes {offset}-")
+                    and self._validator(reader.headers) in (None, validator)):
+                mode = 'ab'
+            elif reader.status == 200:
+                mode = 'wb'
+            elif reader.status == 304 and ('If-None-Match' in headers or 'If-Modified-Since' in headers):
+                reader.drain_conn()
+                mode = 'not modified'
+            elif offset > 0 and reader.status in (206, 416):
+                # the partial file does not fit to the remote content anymore
+                reader.drain_conn()
+                mode = None
+            else:
+                reader.drain_conn()
+                raise DownloadError(f"{abs_url} | {reader.status}", abs_url, reader.status,
+                                    RetryPolicy.parse_retry_after(reader.headers.get('Retry-After')))
+            if mode in ('ab', 'wb'):
+                validators = reader.headers.get('ETag'), reader.headers.get('Last-Modified')
+                if mode == 'wb':
+                    self._write_validator(part_file, self._validator(reader.headers))
+                expected_size, digests = self._expected_content(reader.headers, reader.status)
+                hashers = {algorithm: hashlib.new(algorithm) for algorithm in digests}
+                hashers.setdefault('sha256', hashlib.sha256())
+                size = 0
+                transferred = 0
+                if mode == 'ab':
+                    # the hash covers the complete content, so the already downloaded part is included once
+                    with part_file.open(mode='rb') as part_reader:
+                        for chunk in iter(lambda: part_reader.read(self._chunk_size), b''):
+                            for hasher in hashers.values():
+                                hasher.update(chunk)
+                            size += len(chunk)
+                with part_file.open(mode=mode) as writer:
+                    for chunk in reader.stream(self._chunk_size):
+                        writer.write(chunk)
+                        for hasher in hashers.values():
+                            hasher.update(chunk)
+                        size += len(chunk)
+                        transferred += len(chunk)
+                        if limited:
+                            self._rate_limiter.transfer(host, len(chunk))
+
+        if mode in ('ab', 'wb'):
+            self._report.count('bytes', transferred)
+        if mode is None:
+            self.log.info(f"Can not resume '{url}', restarting the download.")
+            self._discard_part_file(part_file)
+            return self.download_as_file(url, target_file, item=item, previous=previous)
+        if mode == 'not modified':
+            return self._not_modified(url, abs_url, item, previous)
+
+        if expected_size is not None and size != expected_size:
+            if size > expected_size:
+                self._discard_part_file(part_file)
+            raise DownloadError(f"{abs_url} | incomplete content, {size} of {expected_size} bytes", abs_url)
+        for algorithm, digest in digests.items():
+            if hashers[algorithm].digest() != digest:
+                self._discard_part_file(part_file)
+                raise DownloadError(f"{abs_url} | content does not match the {algorithm} digest", abs_url)
+
+        self._move_part_file(part_file, target_file, replace)
+        if item is not None:
+            item.size = size
+            item.hash = hashers['sha256'].hexdigest()
+            item.etag, item.last_modified = validators
+        return url
+
+    def _not_modified(self, url: str, abs_url: str, item: Optional[LinkItem], previous: LinkItem) -> str:
+        """
+        Keep the target file of a content which was not modified since the previous download.
+
+        :param url: link
+        :param abs_url: absolute url of the link
+        :param item: if given, the download info of the previous item is copied into it
+        :param previous: item of the previous download
+        :return: url
+        """
+        self.log.debug(f"Not modified: {abs_url}")
+        self._report.count('not_modified')
+        if item is not None:
+            item.copy_download_info(previous)
+        return url
+
+    def _move_part_file(self, part_file: Path, target_file: Path, replace: bool = False):
         """
-        if target_file.exists():
+        Move a completed part file to the target file, an existing target file is renamed unless it is replaced. The
+        validator of the part is deleted.
+
+        :param part_file: completed part file
+        :param target_file: target file
+        :param replace: replace an existing target file, e.g. the previous download of the same item
+        """
+        if target_file.exists() and not replace:
             new_name = target_file
             while new_name.exists():
                 new_name = new_name.with_name(f"{new_name.stem}_r{''.join(new_name.suffixes)}")
             target_file.rename(new_name)
             self.log.critical(f"target file exists! renaming '{target_file}' to '{new_name}'")
+        part_file.replace(target_file)
+        part_file.with_suffix(self.VALIDATOR_SUFFIX).unlink(missing_ok=True)
 
-        with self._downloader.request('GET', url, preload_content=False, retries=urllib3.util.retry.Retry(3)) as reader:
-            if reader.status == 200:
-                with target_file.open(mode='wb') as writer:
-                    writer.write(reader.data)
-            else:
-                raise HTTPError(f"{url} | {reader.status}")
+    def _discard_part_file(self, part_file: Path):
+        """
+        Delete a part file which can not be completed and its validator.
 
-        if delay > 0:
-            time.sleep(delay)
+        :param part_file: part file
+        """
+        part_file.unlink(missing_ok=True)
+        part_file.with_suffix(self.VALIDATOR_SUFFIX).unlink(missing_ok=True)
 
-        return url
+    def _read_validator(self, part_file: Path) -> Optional[str]:
+        """
+        Read the validator of the content a part file belongs to.
+
+        :param part_file: part file
+        :return: validator, None if there is none
+        """
+        try:
+            return part_file.with_suffix(self.VALIDATOR_SUFFIX).read_text(encoding='utf8') or None
+        except OSError:
+            return None
+
+    def _write_validator(self, part_file: Path, validator: Optional[str]):
+        """
+        Store the validator of the content a part file belongs to.
+
+        :param part_file: part file
+        :param validator: validator, None deletes a stored one
+        """
+        validator_file = part_file.with_suffix(self.VALIDATOR_SUFFIX)
+        if validator is None:
+            validator_file.unlink(missing_ok=True)
+        else:
+            validator_file.write_text(validator, encoding='utf8')
+
+    @staticmethod
+    def _validator(headers: Mapping[str, str]) -> Optional[str]:
+        """
+        Get the validator of a content for ``If-Range``, a strong ``ETag`` or otherwise the ``Last-Modified``.
+
+        :param headers: response headers
+        :return: validator, None if there is none
+        """
+        etag = headers.get('ETag')
+        return etag if etag is not None and not etag.startswith('W/') else headers.get('Last-Modified')
+
+    def _download_segmented(self, abs_url: str, part_file: Path, size: int, digests: Dict[str, bytes], headers: Mapping[str, str],
+                            retries: urllib3.Retry) -> Optional[str]:
+        """
+        Download the content in up to :attr:`~unidown.plugin.a_plugin.APlugin._segments` byte ranges at the same time over
+        the pooled connections. The part file is preallocated and every segment is written at its offset. The segments
+        are requested with ``If-Range``, so they fail instead of mixing two versions of a content which changed meanwhile.
+        For the simultaneous downloads they count as one download.
+
+        The segments do not arrive in order, so the content is not hashed while streaming. Only if the server announced a
+        ``Digest`` the file is read again to verify it, the sha256 hash is then computed in the same pass. This is cpu
+        bound, so at most :attr:`~unidown.core.settings.Settings.cores` files are hashed at the same time. A segmented
+        download is not resumed, after a failure it starts from the beginning.
+
+        :param abs_url: absolute url
+        :param part_file: part file to write into
+        :param size: size of the content in bytes
+        :param digests: announced digests, hashlib algorithm -> digest
+        :param headers: headers of the ``HEAD`` response
+        :param retries: retry configuration of the requests
+        :return: sha256 hex digest of the content, None if not computed
+        :raises ~urllib3.exceptions.HTTPError: if the connection has an error
+        :raises ~unidown.plugin.download_error.DownloadError: if a segment or the content does not match
+        """
+        validator = self._validator(headers)
+        segment_size = -(-size // self._segments)
+        segments = [(start, min(start + segment_size, size) - 1) for start in range(0, size, segment_size)]
+        with part_file.open(mode='wb') as writer:
+            writer.truncate(size)
+        try:
+            with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+                jobs = [executor.submit(self._download_segment, abs_url, part_file, start, end, validator, retries) for start, end in segments]
+                for job in jobs:
+                    job.result()
+            hashers = {algorithm: hashlib.new(algorithm) for algorithm in digests}
+            if hashers:
+                hashers.setdefault('sha256', hashlib.sha256())
+                with self._hash_slots, part_file.open(mode='rb') as reader:
+                    for chunk in iter(lambda: reader.read(self._chunk_size), b''):
+                        for hasher in hashers.values():
+                            hasher.update(chunk)
+            for algorithm, digest in digests.items():
+                if hashers[algorithm].digest() != digest:
+                    raise DownloadError(f"{abs_url} | content does not match the {algorithm} digest", abs_url)
+        except BaseException:
+            part_file.unlink()
+            raise
+        self._report.count('segmented')
+        return hashers['sha256'].hexdigest() if hashers else None
+
+    def _download_segment(self, abs_url: str, part_file: Path, start: int, end: int, validator: Optional[str], retries: urllib3.Retry):
+        """
+        Download one byte range of the content into the preallocated part file.
+
+        :param abs_url: absolute url
+        :param part_file: part file to write into
+        :param start: first byte
+        :param end: last byte, inclusive
+        :param validator: ``ETag`` or ``Last-Modified`` of the content, used for ``If-Range``
+        :param retries: retry configuration of the request
+        :raises ~urllib3.exceptions.HTTPError: if the connection has an error
+        :raises ~unidown.plugin.download_error.DownloadError: if the response is not the requested range
+        """
+        headers = {'Range': f"bytes={start}-{end}"}
+        if validator is not None:
+            headers['If-Range'] = validator
+        host = urlsplit(abs_url).hostname
+        limited = self._rate_limiter.enabled
+        length = end - start + 1
+        written = 0
+        if limited:
+            self._rate_limiter.request(host)
+        with self._downloader.request('GET', abs_url, headers=headers, preload_content=False, retries=retries) as reader:
+            if reader.status != 206 or not reader.headers.get('Content-Range', '').startswith(f"bytes {start}-{end}/"):
+                reader.drain_conn()
+                # a full response means the content changed meanwhile
+                raise DownloadError(f"{abs_url} | segment {start}-{end} | {reader.status}", abs_url,
+                                    None if reader.status in (200, 206) else reader.status,
+                                    RetryPolicy.parse_retry_after(reader.headers.get('Retry-After')))
+            with part_file.open(mode='r+b') as writer:
+                writer.seek(start)
+                for chunk in reader.stream(self._chunk_size):
+                    chunk = chunk[:length - written]
+                    writer.write(chunk)
+                    written += len(chunk)
+                    if limited:
+                        self._rate_limiter.transfer(host, len(chunk))
+        self._report.count('bytes', written)
+        if written != length:
+            raise DownloadError(f"{abs_url} | incomplete segment {start}-{end}, {written} of {length} bytes", abs_url)
+
+    @staticmethod
+    def _expected_content(headers: Mapping[str, str], status: int) -> Tuple[Optional[int], Dict[str, bytes]]:
+        """
+        Get the announced size and digests of the complete content from the response headers. Contents with a
+        content encoding are not verified, as they are decoded while streaming.
+
+        :param headers: response headers
+        :param status: response status, 200 or 206
+        :return: size in bytes or None, hashlib algorithm -> digest
+        """
+        if headers.get('Content-Encoding', 'identity').lower() != 'identity':
+            return None, {}
+        size = None
+        try:
+            if status == 206:
+                total = headers.get('Content-Range', '').rpartition('/')[2]
+                size = int(total) if total != '*' else None
+            elif 'Content-Length' in headers:
+                size = int(headers['Content-Length'])
+        except ValueError:
+            size = None
+
+        digests = {}
+        for entry in headers.get('Digest', '').split(','):
+            algorithm, _, value = entry.strip().partition('=')
+            algorithm = APlugin.DIGEST_ALGORITHMS.get(algorithm.lower())
+            if algorithm is None:
+                continue
+            try:
+                digests[algorithm] = base64.b64decode(value, validate=True)
+            except binascii.Error:
+                continue
+        return size, digests
+
+    def absolute_url(self, link: str) -> str:
+        """
+        Get the absolute url of a link. Links without a scheme are relative to the plugins host and use https.
+
+        :param link: link
+        :return: absolute url
+        """
+        if urlsplit(link).scheme in ('http', 'https'):
+            return link
+        return urljoin(f"https://{self.host}/", link)
+
+    def _part_file(self, url: str, target_file: Path) -> Path:
+        """
+        Get the partial file which is used while downloading the url to the target file.
+
+        :param url: link
+        :param target_file: target file
+        :return: path of the partial file
+        """
+        digest = hashlib.sha1(f"{url}|{target_file.resolve()}".encode('utf-8')).hexdigest()[:16]
+        return self._temp_dir.joinpath(f"{target_file.name}.{digest}{self.PART_SUFFIX}")
 
     def check_download(self, link_item_dict: LinkItemDict, folder: Path, log: bool = False) -> Tuple[LinkItemDict, LinkItemDict]:
         """
-        Check if the download of the given dict was successful. No proving if the content of the file is correct too.
+        Check if the download of the given dict was successful. The file must exist and, if the size of the item is
+        known, have this size. The content itself is not read again, it was already verified while downloading
+        (see :func:`~unidown.plugin.a_plugin.APlugin.download_as_file`).
 
         :param link_item_dict: dict which to check
         :param folder: folder where the downloads are saved
         :param log: if the lost items should be logged
         :return: succeeded and failed
         """
-        succeed = LinkItemDict({link: item for link, item in link_item_dict.items() if folder.joinpath(item.name).is_file()})
+        succeed = LinkItemDict({link: item for link, item in link_item_dict.items() if self._is_downloaded(folder.joinpath(item.name), item)})
         failed = LinkItemDict({link: item for link, item in link_item_dict.items() if link not in succeed})
 
         if failed and log:
             for link, item in failed.items():
-                self.log.warning(f"Not downloaded: {self.info.host + link} - {item.name}")
+                self.log.warning(f"Not downloaded: {self.absolute_url(link)} - {item.name}")
 
         return succeed, failed
 
+    @staticmethod
+    def _is_downloaded(file: Path, item: LinkItem) -> bool:
+        """
+        Check if the file is a complete download of the item.
+
+        :param file: downloaded file
+        :param item: item
+        :return: if the file is complete
+        """
+        try:
+            stat = file.stat()
+        except OSError:
+            return False
+        return stat_module.S_ISREG(stat.st_mode) and (item.size is None or stat.st_size == item.size)
+
     def update_savestate(self, new_items: LinkItemDict):
         """
         Update savestate.
@@ -344,20 +1066,58 @@ class APlugin(ABC):
         self._savestate.last_update = self.last_update
         self._savestate.link_items.actualize(new_items)
 
+    def update_failed_items(self, failed_items: LinkItemDict):
+        """
+        Replace the failed items of the savestate, so the next run retries them even if there is no update. The error is
+        taken from :attr:`~unidown.plugin.a_plugin.APlugin.failed_downloads`.
+
+        :param failed_items: items which could not be downloaded
+        """
+        self._savestate.failed_items = {
+            link: FailedItem(item, self._failed_downloads.get(link, 'not downloaded')) for link, item in failed_items.items()
+        }
+
     def save_savestate(self):
         """
-        Save meta data about the downloaded things and the plugin to file.
+        Save meta data about the downloaded things and the plugin to the savestate storage.
+        """
+        with self._compaction_lock, self._journal_lock:
+            self._savestate_backend.save(self._savestate)
+
+    def journal_item(self, link: str, item: LinkItem):
+        """
+        Add a succeeded download to the savestate and persist it immediately to the savestate storage. If the storage
+        requests it, a copy of the savestate is saved to compact it. Meanwhile other items are journaled further, only
+        one compaction runs at a time.
+        Persistence costs are proportional to the new items and an interrupted run does not lose its progress.
+        Thread safe.
+
+        :param link: link
+        :param item: item
         """
-        with self._savestate_file.open(mode='w', encoding="utf8") as writer:
-            writer.write(json.dumps(self._savestate.to_json()))
+        with self._journal_lock:
+            self._savestate.link_items[link] = item
+            compact = self._savestate_backend.append(link, item) and self._compaction_lock.acquire(blocking=False)
+            if compact:
+                self._savestate_backend.start_compaction()
+                savestate = copy.copy(self._savestate)
+                savestate.link_items = LinkItemDict(self._savestate.link_items)
+                savestate.failed_items = dict(self._savestate.failed_items)
+        if compact:
+            try:
+                self._savestate_backend.compact(savestate)
+            finally:
+                self._compaction_lock.release()
 
     def clean_up(self):
         """
         Default clean up for a module.
-        Deletes :attr:`~unidown.plugin.a_plugin.APlugin._temp_dir`.
+        Deletes :attr:`~unidown.plugin.a_plugin.APlugin._temp_dir`, except partial downloads of this run which can be
+        resumed. Partial downloads of earlier runs, which no item of this run refers to, are expired.
         """
-        self._downloader.close()
-        tools.unlink_dir_rec(self._temp_dir)
+        self._downloader.clear()
+        self._savestate_backend.close()
+        tools.unlink_dir_rec(self._temp_dir, keep=lambda path: self.is_part_file(path) and path.with_suffix(self.PART_SUFFIX) in self._part_files)
 
     def _load_default_options(self):
         """
@@ -374,10 +1134,22 @@ class APlugin(ABC):
             self.log.warning(f"Plugin option 'delay' is missing. Using {self._options['delay']}s.")
 
     @staticmethod
-    def get_plugins() -> Dict[str, pkg_resources.EntryPoint]:
+    def is_part_file(path: Path) -> bool:
+        """
+        Check if the path is a partial download or its validator.
+
+        :param path: path to check
+        :return: if it is a partial download
+        """
+        return path.suffix in (APlugin.PART_SUFFIX, APlugin.VALIDATOR_SUFFIX)
+
+    @staticmethod
+    def get_plugins(refresh: bool = False) -> Dict[str, EntryPoint]:
         """
-        Get all available plugins for unidown.
+        Get all available plugins for unidown. The index is built once per process, see
+        :func:`~unidown.tools.get_entry_points`.
 
-        :return: plugin name list
+        :param refresh: rebuild the index, e.g. after installing a plugin
+        :return: plugin name to entry point
         """
-        return {entry.name: entry for entry in pkg_resources.iter_entry_points('unidown.plugin')}
+        return tools.get_entry_points('unidown.plugin', refresh)
@@ -0,0 +1,29 @@
+"""
+Error of a single download. It is kept apart from :mod:`~unidown.plugin.exceptions`, as it needs urllib3, which is
+imported on first use.
+"""
+from typing import Optional
+
+from urllib3.exceptions import HTTPError
+
+
+class DownloadError(HTTPError):
+    """
+    A download failed because of the response of the server, e.g. an error status or a content which does not match the
+    announced size or digest.
+
+    :param msg: message
+    :param url: absolute url of the download
+    :param status: HTTP status code, None if the response itself was fine but its content not
+    :param retry_after: seconds the server demands to wait before the next request, if any
+
+    :ivar url: absolute url of the download
+    :ivar status: HTTP status code
+    :ivar retry_after: seconds to wait before the next request
+    """
+
+    def __init__(self, msg: str, url: str, status: int = None, retry_after: float = None):
+        super().__init__(msg)
+        self.url: str = url
+        self.status: Optional[int] = status
+        self.retry_after: Optional[float] = retry_after
@@ -1,28 +1,60 @@
 from __future__ import annotations
 
+import sys
 from datetime import datetime
+from typing import Optional
+
+#: if :func:`~datetime.datetime.fromisoformat` can parse the basic format (without separators)
+_ISO_BASIC_FORMAT = sys.version_info >= (3, 11)
 
 
 class LinkItem:
     """
-    Item which represents the data, who need to be downloaded. Has a name and an update time.
+    Item which represents the data, who need to be downloaded. Has a name and an update time, after the download also
+    the size and the hash of the content and the validators of the server for conditional requests.
+    Uses slots to keep the memory footprint small, as there may exist hundreds of thousands of them. The rarely known
+    download information shares one slot.
 
     :param name: name
     :param time: update time
+    :param size: size of the content in bytes
+    :param digest: sha256 hex digest of the content, see :attr:`hash`
     :raises ValueError: name cannot be empty or None
     :raises ValueError: time cannot be empty or None
 
     :cvar time_format: time format to use
     :ivar _name: name of the item
     :ivar _time: time of the item
+    :ivar _time_json: time formatted with :attr:`time_format`, created on first use
+    :ivar _download: size of the downloaded content in bytes, its sha256 hex digest and the ``ETag`` and
+        ``Last-Modified`` headers of the download, each None if unknown, None if all are unknown
     """
+    __slots__ = ('_name', '_time', '_time_json', '_download')
+
     time_format: str = "%Y%m%dT%H%M%S.%fZ"
 
-    def __init__(self, name: str, time: datetime):
-        self._name: str = ""
-        self._time: datetime = datetime(1970, 1, 1)
+    def __init__(self, name: str, time: datetime, size: int = None, digest: str = None):
+        self._time_json: str = None
         self.name = name
         self.time = time
+        self._download: Optional[tuple] = None if size is None and digest is None else (size, digest, None, None)
+
+    @classmethod
+    def from_trusted(cls, name: str, time: datetime, time_json: str = None) -> LinkItem:
+        """
+        Fast constructor for trusted data, skips the validation.
+
+        :param name: name, not empty
+        :param time: update time, not None
+        :param time_json: time formatted with :attr:`time_format`, if available
+        :return: the LinkItem
+        """
+        item = cls.__new__(cls)
+        item._name = name
+        item._time = time
+        item._time_json = time_json
+        item._download = None
+        return item
 
     @classmethod
     def from_json(cls, data: dict) -> LinkItem:
@@ -32,12 +64,40 @@ class LinkItem:
         :param data: json data as dict
         :return: the LinkItem
         :raises ValueError: missing parameter
+        :raises ValueError: name cannot be empty or None
         """
         if 'name' not in data:
             raise ValueError("name is missing")
         if 'time' not in data:
             raise ValueError("time is missing")
-        return cls(data['name'], datetime.strptime(data['time'], LinkItem.time_format))
+        if not data['name']:
+            raise ValueError("name cannot be empty or None.")
+        time_json = data['time']
+        # only fully padded times are equal to their formatted counterpart
+        item = cls.from_trusted(data['name'], cls.parse_time(time_json), time_json if len(time_json) == 23 else None)
+        download = (data.get('size'), data.get('hash'), data.get('etag'), data.get('lastModified'))
+        if download != (None, None, None, None):
+            item._download = download
+        return item
+
+    @classmethod
+    def parse_time(cls, text: str) -> datetime:
+        """
+        Parse a time formatted with :attr:`time_format`. The fully padded format is parsed with
+        :func:`~datetime.datetime.fromisoformat` or by slicing, which is much faster than
+        :func:`~datetime.datetime.strptime`, everything else falls back to it.
+
+        :param text: formatted time
+        :return: time
+        :raises ValueError: text does not match the format
+        """
+        if (cls.time_format == LinkItem.time_format and len(text) == 23 and text[8] == 'T' and text[15] == '.' and text[22] == 'Z'
+                and text[:8].isdigit() and text[9:15].isdigit() and text[16:22].isdigit()):
+            if _ISO_BASIC_FORMAT:
+                return datetime.fromisoformat(text[:22])
+            return datetime(int(text[0:4]), int(text[4:6]), int(text[6:8]), int(text[9:11]), int(text[11:13]), int(text[13:15]),
+                            int(text[16:22]))
+        return datetime.strptime(text, cls.time_format)
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, self.__class__):
@@ -84,11 +144,82 @@ class LinkItem:
         if time is None:
             raise ValueError("time cannot be None.")
         self._time = time
+        self._time_json = None
+
+    def _set_download(self, index: int, value):
+        """
+        Set one value of the download information.
+
+        :param index: index inside :attr:`_download`
+        :param value: value
+        """
+        download = [None, None, None, None] if self._download is None else list(self._download)
+        download[index] = value
+        self._download = tuple(download)
+
+    @property
+    def size(self) -> Optional[int]:
+        """
+        Plain getter.
+        """
+        return None if self._download is None else self._download[0]
+
+    @size.setter
+    def size(self, size: Optional[int]):
+        self._set_download(0, size)
+
+    @property
+    def hash(self) -> Optional[str]:
+        """
+        Plain getter.
+        """
+        return None if self._download is None else self._download[1]
+
+    @hash.setter
+    def hash(self, digest: Optional[str]):
+        self._set_download(1, digest)
+
+    @property
+    def etag(self) -> Optional[str]:
+        """
+        Plain getter.
+        """
+        return None if self._download is None else self._download[2]
+
+    @etag.setter
+    def etag(self, etag: Optional[str]):
+        self._set_download(2, etag)
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        """
+        Plain getter.
+        """
+        return None if self._download is None else self._download[3]
+
+    @last_modified.setter
+    def last_modified(self, last_modified: Optional[str]):
+        self._set_download(3, last_modified)
+
+    def copy_download_info(self, other: LinkItem):
+        """
+        Take over size, hash and validators of another item, which describes the same content.
+
+        :param other: item to copy from
+        """
+        self._download = other._download
 
     def to_json(self) -> dict:
         """
-        Create json data.
+        Create json data. The formatted time is cached. Size, hash and validators are only included if known.
 
         :return: json dictionary
         """
-        return {'name': self._name, 'time': self._time.strftime(LinkItem.time_format)}
+        if self._time_json is None:
+            self._time_json = self._time.strftime(LinkItem.time_format)
+        data = {'name': self._name, 'time': self._time_json}
+        if self._download is not None:
+            for key, value in zip(('size', 'hash', 'etag', 'lastModified'), self._download):
+                if value is not None:
+                    data[key] = value
+        return data
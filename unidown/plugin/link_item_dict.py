@@ -1,9 +1,25 @@
 from __future__ import annotations
 
 import logging
+import warnings
+from collections import Counter
 from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, NamedTuple, Set
 
-from tqdm import tqdm
+if TYPE_CHECKING:
+    from unidown.plugin.link_item import LinkItem
+
+
+class LinkItemDiff(NamedTuple):
+    """
+    Difference of new data to the old data, see :func:`~unidown.plugin.link_item_dict.LinkItemDict.diff`.
+    """
+    #: new and newer items, in order of the new data
+    new: LinkItemDict
+    #: links of the new items which exist in the old data
+    updated: Set[str]
+    #: links of the old data which are missing in the new data
+    removed: Set[str]
 
 
 class LinkItemDict(dict):
@@ -25,39 +41,118 @@ class LinkItemDict(dict):
                     log.info(f"Actualize item: {link} | {self[link]} -> {item}")
         self.update(new_data)
 
-    def clean_up_names(self):
+    def clean_up_names(self, reserved: Set[str] = None):
         """
-        Rename duplicated names with an additional ``_r``.
+        Rename duplicated names with an additional ``_d``.
+        Items are processed in order, an item is renamed as long as its name is used by another item or is reserved.
+        Uses an index of the names and remembers the last renaming of every name, so it runs in linear time.
+
+        :param reserved: names which are not allowed to be used, e.g. files existing already
         """
-        for cur_link, cur_item in self.items():
-            restart = True
-            while restart:
-                restart = False
-                for link, item in self.items():
-                    if cur_item.name == item.name and cur_link != link:
-                        tmp = Path(cur_item.name)
-                        cur_item.name = f"{tmp.stem}_d{''.join(tmp.suffixes)}"
-                        restart = True
-                        break
+        if reserved is None:
+            reserved = set()
+        name_count = Counter(item.name for item in self.values())
+        last_renaming = {}
+        for item in self.values():
+            name = item.name
+            if name_count[name] == 1 and name not in reserved:
+                continue
+            name_count[name] -= 1
+            origin = name
+            # all names before the last renaming of the same name are taken already
+            name = last_renaming.get(origin, origin)
+            while name_count[name] > 0 or name in reserved:
+                tmp = Path(name)
+                name = f"{tmp.stem}_d{''.join(tmp.suffixes)}"
+            name_count[name] += 1
+            last_renaming[origin] = name
+            item.name = name
 
     @staticmethod
-    def get_new_items(old_data: LinkItemDict, new_data: LinkItemDict, disable_tqdm: bool = False) -> LinkItemDict:
+    def get_new_items(old_data: LinkItemDict, new_data: LinkItemDict, disable_tqdm: bool = None) -> LinkItemDict:
         """
         Get the new items which are not existing or are newer as in the old data set.
+        See :func:`~unidown.plugin.link_item_dict.LinkItemDict.diff`, which also reports the removed links.
 
         :param old_data: old data
         :param new_data: new data
-        :param disable_tqdm: disables tqdm progressbar
+        :param disable_tqdm: deprecated and without effect, the comparison is done in one batch without a progressbar
         :return: new and updated link items
         """
+        if disable_tqdm is not None:
+            warnings.warn("disable_tqdm of get_new_items is deprecated and has no effect.", DeprecationWarning, stacklevel=2)
         if len(old_data) == 0:
             return new_data
+        return LinkItemDict.diff(old_data, new_data, removed=False).new
+
+    @staticmethod
+    def diff(old_data: Dict[str, LinkItem], new_data: Dict[str, LinkItem], removed: bool = True) -> LinkItemDiff:
+        """
+        Compare the new data with the old data in one batch. The new data is walked once with a bound lookup into the old
+        data and the times are compared directly, the removed links are the difference of the key sets, which is computed
+        in C. Storages which do not hold the items in memory compare them by themselves, see
+        :func:`~unidown.plugin.savestate_backend.SqliteLinkItems.diff`.
+
+        :param old_data: old data, e.g. of the savestate
+        :param new_data: new data
+        :param removed: if the removed links should be computed, otherwise they are empty
+        :return: difference
+        """
+        if not isinstance(old_data, dict):
+            return old_data.diff(new_data, removed)
+        if len(old_data) == 0:
+            return LinkItemDiff(LinkItemDict(new_data), set(), set())
         if len(new_data) == 0:
-            return LinkItemDict()
+            return LinkItemDiff(LinkItemDict(), set(), set(old_data) if removed else set())
+
+        new_items = LinkItemDict()
+        updated = set()
+        get_old = old_data.get
+        for link, item in new_data.items():
+            old_item = get_old(link)
+            if old_item is None:
+                new_items[link] = item
+            # the slots directly, the property costs a function call per item
+            elif item._time > old_item._time:
+                new_items[link] = item
+                updated.add(link)
+        return LinkItemDiff(new_items, updated, old_data.keys() - new_data.keys() if removed else set())
+
 
-        updated_data = LinkItemDict()
-        for link, link_item in tqdm(new_data.items(), desc="Compare with save", unit="item", mininterval=1, ncols=100, disable=disable_tqdm):
-            if (link not in old_data) or (link_item.time > old_data[link].time):
-                updated_data[link] = link_item
+class UniqueNames:
+    """
+    Counterpart of :func:`~unidown.plugin.link_item_dict.LinkItemDict.clean_up_names` for items which arrive one by
+    one. As the later items are not known yet, the first item keeps its name and later duplicates are renamed with an
+    additional ``_d``.
+
+    :param reserved: names which are not allowed to be used, e.g. files existing already
 
-        return updated_data
+    :ivar _used: names of the items so far
+    :ivar _last_renaming: last renaming of every name, to skip the names which are taken already
+    """
+
+    def __init__(self, reserved: Iterable[str] = None):
+        self._reserved: Set[str] = set() if reserved is None else set(reserved)
+        self._used: Set[str] = set()
+        self._last_renaming: Dict[str, str] = {}
+
+    def use(self, name: str, own: str = None) -> str:
+        """
+        Get a unique name for the next item and mark it as used.
+
+        :param name: name of the item
+        :param own: reserved name which the item may use nevertheless, e.g. the file of its previous download
+        :return: unique name
+        """
+        if name not in self._used and (name not in self._reserved or name == own):
+            self._used.add(name)
+            return name
+        origin = name
+        # all names before the last renaming of the same name are taken already
+        name = self._last_renaming.get(origin, origin)
+        while name in self._used or (name in self._reserved and name != own):
+            tmp = Path(name)
+            name = f"{tmp.stem}_d{''.join(tmp.suffixes)}"
+        self._used.add(name)
+        self._last_renaming[origin] = name
+        return name
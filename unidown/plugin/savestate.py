@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import Dict, NamedTuple
 
 from packaging.version import InvalidVersion, Version
 
@@ -9,6 +10,14 @@ from unidown.plugin.link_item_dict import LinkItemDict
 from unidown.plugin.plugin_info import PluginInfo
 
 
+class FailedItem(NamedTuple):
+    """
+    Item whose download failed finally, with the error.
+    """
+    item: LinkItem
+    error: str
+
+
 class SaveState:
     """
     Savestate of a plugin.
@@ -24,6 +33,7 @@ class SaveState:
     :ivar plugin_info: plugin info
     :ivar last_update: newest udpate time
     :ivar link_items: data
+    :ivar failed_items: items whose download failed in the last run, link -> item and error
     """
     # current savestate version which will be used
     time_format: str = "%Y%m%dT%H%M%S.%fZ"
@@ -34,12 +44,13 @@ class SaveState:
         self.plugin_info: PluginInfo = plugin_info
         self.last_update: datetime = last_update
         self.link_items: LinkItemDict = link_items
+        self.failed_items: Dict[str, FailedItem] = {}
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, self.__class__):
             return False
         return (self.plugin_info == other.plugin_info and self.link_items == other.link_items and self.version == other.version and
-                self.last_update == other.last_update)
+                self.last_update == other.last_update and self.failed_items == other.failed_items)
 
     def __ne__(self, other: object) -> bool:
         return not self.__eq__(other)
@@ -63,11 +74,15 @@ class SaveState:
             version = Version(data['meta']['version'])
         except InvalidVersion:
             raise InvalidVersion(f"Savestate version is not PEP440 conform: {data['meta']['version']}")
-        return cls(PluginInfo.from_json(data['pluginInfo']), datetime.strptime(data['lastUpdate'], SaveState.time_format), data_dict, version)
+        savestate = cls(PluginInfo.from_json(data['pluginInfo']), datetime.strptime(data['lastUpdate'], SaveState.time_format), data_dict, version)
+        for key, failed_item in data.get('failedItems', {}).items():
+            savestate.failed_items[key] = FailedItem(LinkItem.from_json(failed_item), failed_item.get('error', ''))
+        return savestate
 
     def to_json(self) -> dict:
         """
-        Create json data.
+        Create json data. The failed items are only included if there are some, they are stored like link items with an
+        additional error.
 
         :return: json dictionary
         """
@@ -79,6 +94,8 @@ class SaveState:
         }
         for key, link_item in self.link_items.items():
             result['linkItems'][key] = link_item.to_json()
+        if self.failed_items:
+            result['failedItems'] = {key: {**failed.item.to_json(), 'error': failed.error} for key, failed in self.failed_items.items()}
         return result
 
     def upgrade(self) -> SaveState:
@@ -0,0 +1,648 @@
+"""
+Storages of savestates.
+"""
+from __future__ import annotations
+
+import copy
+import gzip
+import json
+import logging
+import shutil
+import sqlite3
+import struct
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Type
+
+from unidown.plugin.exceptions import PluginException
+from unidown.plugin.link_item import LinkItem
+from unidown.plugin.link_item_dict import LinkItemDict, LinkItemDiff
+from unidown.plugin.savestate import SaveState
+
+
+def savestate_meta_json(savestate: SaveState) -> dict:
+    """
+    Create the json data of the savestate without its link items, custom data of subclasses is kept. The savestate
+    itself is not changed, as the download workers may read its link items meanwhile.
+
+    :param savestate: savestate
+    :return: json dictionary, ``linkItems`` is empty
+    """
+    meta = copy.copy(savestate)
+    meta.link_items = LinkItemDict()
+    return meta.to_json()
+
+
+class SaveStateBackend(ABC):
+    """
+    Storage of the savestate of a plugin. Besides loading and saving it supports appending single items, which are
+    persisted immediately, so an interrupted run keeps its progress.
+
+    :param savestate_dir: directory of the savestates
+    :param name: plugin name
+    :param log: logger
+    :param savestate_cls: savestate class to use
+
+    :cvar suffix: suffix of the savestate file
+    :ivar _file: savestate file
+    """
+    suffix: str = ''
+
+    def __init__(self, savestate_dir: Path, name: str, log: logging.Logger, savestate_cls: Type[SaveState] = SaveState):
+        self._file: Path = savestate_dir.joinpath(name + '_save' + self.suffix)
+        self._log: logging.Logger = log
+        self._savestate_cls: Type[SaveState] = savestate_cls
+
+    @property
+    def file(self) -> Path:
+        """
+        Plain getter.
+        """
+        return self._file
+
+    def exists(self) -> bool:
+        """
+        Check if a savestate was stored.
+
+        :return: if a savestate exists
+        """
+        return self._file.exists()
+
+    @abstractmethod
+    def load(self, default: SaveState) -> SaveState:
+        """
+        Load the savestate, including appended items.
+
+        :param default: savestate which is used if none was stored, appended items are applied to it
+        :return: loaded savestate, not upgraded
+        :raises ~unidown.plugin.exceptions.PluginException: broken savestate
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, savestate: SaveState):
+        """
+        Save the complete savestate.
+
+        :param savestate: savestate
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def append(self, link: str, item: LinkItem) -> bool:
+        """
+        Persist a single item immediately. Not thread safe.
+
+        :param link: link
+        :param item: item
+        :return: if the storage should be compacted, see :func:`start_compaction`
+        """
+        raise NotImplementedError
+
+    def start_compaction(self):
+        """
+        Start to compact the storage, must be called like :func:`append`. Items appended afterwards are kept apart, so
+        :func:`compact` can run meanwhile.
+        """
+
+    def compact(self, savestate: SaveState):
+        """
+        Finish the compaction by saving the savestate as it was at :func:`start_compaction`. Not thread safe with
+        :func:`save`, but items may be appended meanwhile.
+
+        :param savestate: savestate at the start of the compaction
+        """
+
+    def close(self):
+        """
+        Release all resources.
+        """
+
+
+class JsonSaveStateBackend(SaveStateBackend):
+    """
+    Savestate as one json file. Appended items are written to a journal file, which is applied at loading and cleared
+    at saving.
+
+    Compaction is requested once the journal has as many entries as the savestate file items, at least
+    :attr:`compaction`, so rewriting the savestate costs in total proportional to the appended items. At its start the
+    journal is moved aside, new items go into a new journal while the savestate is written. The moved journal is
+    deleted afterwards, until then it is applied at loading before the new one.
+
+    :cvar compaction: minimum number of journal entries after which compaction is requested
+    :ivar _journal_file: journal file
+    :ivar _compacting_file: journal which is moved aside during a compaction
+    :ivar _journal_entries: number of entries inside the journal
+    :ivar _snapshot_items: number of items inside the savestate file
+    """
+    suffix: str = '.json'
+    compaction: int = 1000
+
+    def __init__(self, savestate_dir: Path, name: str, log: logging.Logger, savestate_cls: Type[SaveState] = SaveState):
+        super().__init__(savestate_dir, name, log, savestate_cls)
+        self._journal_file: Path = savestate_dir.joinpath(name + '_save.journal')
+        self._compacting_file: Path = savestate_dir.joinpath(name + '_save.journal.compacting')
+        self._journal_entries: int = 0
+        self._snapshot_items: int = 0
+
+    @property
+    def journal_file(self) -> Path:
+        """
+        Plain getter.
+        """
+        return self._journal_file
+
+    def exists(self) -> bool:
+        return self._file.exists() or self._journal_file.exists() or self._compacting_file.exists()
+
+    def load(self, default: SaveState) -> SaveState:
+        """
+        Load the savestate and apply the journal on top.
+
+        :param default: savestate which is used if none was stored
+        :return: loaded savestate, not upgraded
+        :raises ~unidown.plugin.exceptions.PluginException: broken savestate json
+        :raises ~unidown.plugin.exceptions.PluginException: could not parse the json
+        :raises ~unidown.plugin.exceptions.PluginException: broken journal entry
+        """
+        savestate = self._read_snapshot() if self._file.exists() else default
+        self._snapshot_items = len(savestate.link_items)
+        self._journal_entries = self._replay_journal(self._compacting_file, savestate) + self._replay_journal(self._journal_file, savestate)
+        return savestate
+
+    def _read_snapshot(self) -> SaveState:
+        """
+        Read the savestate file.
+
+        :return: savestate
+        :raises ~unidown.plugin.exceptions.PluginException: broken savestate json
+        :raises ~unidown.plugin.exceptions.PluginException: could not parse the json
+        """
+        with self._file.open(encoding="utf8") as reader:
+            try:
+                savestate_json = json.loads(reader.read())
+            except Exception:
+                raise PluginException(f"Broken savestate json. Please fix or delete this file (you may lose data in this case): {self._file}")
+
+        try:
+            return self._savestate_cls.from_json(savestate_json)
+        except Exception as ex:
+            raise PluginException(f"Could not load savestate from json {self._file}: {ex}")
+
+    def _write_snapshot(self, file: Path, savestate: SaveState):
+        """
+        Write the savestate file.
+
+        :param file: file to write into
+        :param savestate: savestate
+        """
+        with file.open(mode='w', encoding="utf8") as writer:
+            writer.write(json.dumps(savestate.to_json()))
+
+    def _replay_journal(self, journal_file: Path, savestate: SaveState) -> int:
+        """
+        Apply the entries of a journal to the savestate. A broken last entry, from a crash while writing, is skipped.
+
+        :param journal_file: journal file
+        :param savestate: savestate
+        :return: number of entries
+        :raises ~unidown.plugin.exceptions.PluginException: broken journal entry
+        """
+        if not journal_file.exists():
+            return 0
+        replayed = LinkItemDict()
+        with journal_file.open(encoding="utf8") as reader:
+            lines = reader.read().splitlines()
+        for number, line in enumerate(lines, 1):
+            try:
+                entry = json.loads(line)
+                replayed[entry['link']] = LinkItem.from_json(entry['item'])
+            except Exception:
+                if number == len(lines):
+                    self._log.warning(f"Skip incomplete last journal entry: {journal_file}")
+                    break
+                raise PluginException(f"Broken savestate journal in line {number}. Please fix or delete this file: {journal_file}")
+        self._log.info(f"Restored {len(replayed)} items from the savestate journal.")
+        savestate.link_items.actualize(replayed)
+        return len(lines)
+
+    def save(self, savestate: SaveState):
+        """
+        Replace the file atomically and clear the journals afterwards.
+
+        :param savestate: savestate
+        """
+        self._replace_snapshot(savestate)
+        self._compacting_file.unlink(missing_ok=True)
+        self._journal_file.unlink(missing_ok=True)
+        self._journal_entries = 0
+
+    def _replace_snapshot(self, savestate: SaveState):
+        """
+        Replace the savestate file atomically.
+
+        :param savestate: savestate
+        """
+        tmp_file = self._file.with_name(self._file.name + '.tmp')
+        self._write_snapshot(tmp_file, savestate)
+        tmp_file.replace(self._file)
+        self._snapshot_items = len(savestate.link_items)
+
+    def append(self, link: str, item: LinkItem) -> bool:
+        with self._journal_file.open(mode='a', encoding="utf8") as writer:
+            writer.write(json.dumps({'link': link, 'item': item.to_json()}) + '\n')
+        self._journal_entries += 1
+        return self._journal_entries >= max(self.compaction, self._snapshot_items)
+
+    def start_compaction(self):
+        """
+        Move the journal aside. If a former compaction did not finish, the journal is added to its moved one.
+        """
+        if self._journal_file.exists():
+            if self._compacting_file.exists():
+                with self._compacting_file.open(mode='ab') as writer, self._journal_file.open(mode='rb') as reader:
+                    shutil.copyfileobj(reader, writer)
+                self._journal_file.unlink()
+            else:
+                self._journal_file.replace(self._compacting_file)
+        self._journal_entries = 0
+
+    def compact(self, savestate: SaveState):
+        """
+        Replace the file atomically and delete the moved journal afterwards.
+
+        :param savestate: savestate at the start of the compaction
+        """
+        self._replace_snapshot(savestate)
+        self._compacting_file.unlink(missing_ok=True)
+
+
+class BinarySaveStateBackend(JsonSaveStateBackend):
+    """
+    Savestate as a compact binary file of length prefixed records, which is read and written item by item without
+    building the complete json in memory. Appended items are journaled like with :class:`JsonSaveStateBackend`.
+    A savestate in the json format is migrated automatically: it is loaded instead and deleted after the next save.
+    This migration only changes the file format, not the content, so it is not part of
+    :func:`~unidown.plugin.savestate.SaveState.upgrade`. The loaded savestate is upgraded afterwards like any other.
+
+    File layout (little endian): the magic ``UDSS`` and the format version (1 byte), the savestate json without link
+    items as length (uint32) prefixed utf-8, afterwards a record for every link item: lengths of link, name and extra data
+    (uint32 each), the time in microseconds since 1970 (int64), link, name and extra data. Extra data is a json of
+    further item fields and empty if there are none.
+
+    :cvar compress: if the file is gzip compressed
+    :ivar _legacy: json backend of the same plugin, used for migration
+    """
+    suffix: str = '.bin'
+    compress: bool = False
+    _magic: bytes = b'UDSS\x01'
+    _length = struct.Struct('<I')
+    _record = struct.Struct('<IIIq')
+    _epoch = datetime(1970, 1, 1)
+    _microsecond = timedelta(microseconds=1)
+
+    def __init__(self, savestate_dir: Path, name: str, log: logging.Logger, savestate_cls: Type[SaveState] = SaveState):
+        super().__init__(savestate_dir, name, log, savestate_cls)
+        self._legacy: JsonSaveStateBackend = JsonSaveStateBackend(savestate_dir, name, log, savestate_cls)
+
+    def exists(self) -> bool:
+        return super().exists() or self._legacy.exists()
+
+    def _open(self, file: Path, mode: str) -> BinaryIO:
+        """
+        Open the file, compressed or not.
+
+        :param file: file
+        :param mode: ``rb`` or ``wb``
+        :return: binary file object
+        """
+        if self.compress:
+            return gzip.open(file, mode, compresslevel=6)
+        return file.open(mode)
+
+    def load(self, default: SaveState) -> SaveState:
+        """
+        Load the savestate and apply the journal on top. If only a json savestate exists it is loaded instead.
+
+        :param default: savestate which is used if none was stored
+        :return: loaded savestate, not upgraded
+        :raises ~unidown.plugin.exceptions.PluginException: broken savestate
+        :raises ~unidown.plugin.exceptions.PluginException: broken journal entry
+        """
+        if not self._file.exists() and self._legacy.file.exists():
+            self._log.info(f"Migrate savestate {self._legacy.file} to {self._file}.")
+            savestate = self._legacy.load(default)
+            self._snapshot_items, self._journal_entries = self._legacy._snapshot_items, self._legacy._journal_entries
+            return savestate
+        return super().load(default)
+
+    def _replace_snapshot(self, savestate: SaveState):
+        """
+        Replace the file atomically and delete a migrated json savestate.
+
+        :param savestate: savestate
+        """
+        super()._replace_snapshot(savestate)
+        if self._legacy.file.exists():
+            self._legacy.file.unlink()
+
+    def _read_snapshot(self) -> SaveState:
+        """
+        Read the savestate file item by item.
+
+        :return: savestate
+        :raises ~unidown.plugin.exceptions.PluginException: broken savestate file
+        """
+        try:
+            with self._open(self._file, 'rb') as reader:
+                if reader.read(len(self._magic)) != self._magic:
+                    raise ValueError("unknown file format")
+                meta_json = json.loads(self._read_exactly(reader, self._length.unpack(self._read_exactly(reader, self._length.size))[0]))
+                savestate = self._savestate_cls.from_json(meta_json)
+                link_items = LinkItemDict()
+                while True:
+                    header = reader.read(self._record.size)
+                    if not header:
+                        break
+                    if len(header) != self._record.size:
+                        raise ValueError("truncated record")
+                    link_len, name_len, extra_len, micros = self._record.unpack(header)
+                    data = self._read_exactly(reader, link_len + name_len + extra_len)
+                    link = data[:link_len].decode('utf-8')
+                    name = data[link_len:link_len + name_len].decode('utf-8')
+                    time = self._epoch + micros * self._microsecond
+                    if extra_len == 0:
+                        link_items[link] = LinkItem.from_trusted(name, time)
+                    else:
+                        item_json = json.loads(data[link_len + name_len:])
+                        item_json['name'] = name
+                        item_json['time'] = time.strftime(LinkItem.time_format)
+                        link_items[link] = LinkItem.from_json(item_json)
+        except Exception as ex:
+            raise PluginException(f"Broken savestate file. Please fix or delete this file (you may lose data in this case): {self._file}: {ex}")
+        savestate.link_items = link_items
+        return savestate
+
+    @staticmethod
+    def _read_exactly(reader: BinaryIO, size: int) -> bytes:
+        """
+        Read exactly the given number of bytes.
+
+        :param reader: reader
+        :param size: number of bytes
+        :return: data
+        :raises ValueError: end of file reached before
+        """
+        data = reader.read(size)
+        if len(data) != size:
+            raise ValueError("unexpected end of file")
+        return data
+
+    def _write_snapshot(self, file: Path, savestate: SaveState):
+        """
+        Write the savestate file item by item.
+
+        :param file: file to write into
+        :param savestate: savestate
+        """
+        with self._open(file, 'wb') as writer:
+            writer.write(self._magic)
+            meta = json.dumps(savestate_meta_json(savestate)).encode('utf-8')
+            writer.write(self._length.pack(len(meta)))
+            writer.write(meta)
+            for link, item in savestate.link_items.items():
+                link_data = link.encode('utf-8')
+                name_data = item.name.encode('utf-8')
+                extra = {key: value for key, value in item.to_json().items() if key not in ('name', 'time')}
+                extra_data = json.dumps(extra).encode('utf-8') if extra else b''
+                micros = (item.time - self._epoch) // self._microsecond
+                writer.write(self._record.pack(len(link_data), len(name_data), len(extra_data), micros))
+                writer.write(link_data)
+                writer.write(name_data)
+                writer.write(extra_data)
+
+
+class GzipSaveStateBackend(BinarySaveStateBackend):
+    """
+    :class:`BinarySaveStateBackend` with gzip compression.
+    """
+    suffix: str = '.bin.gz'
+    compress: bool = True
+
+
+class SqliteLinkItems(MutableMapping):
+    """
+    Link items stored inside a SQLite table, indexed by the link. Every change is committed immediately.
+    Acts like a :class:`~unidown.plugin.link_item_dict.LinkItemDict` without holding the items in memory.
+
+    :param connection: connection to the database
+    :param lock: lock which guards the connection
+    """
+
+    def __init__(self, connection: sqlite3.Connection, lock: threading.RLock):
+        self._connection: sqlite3.Connection = connection
+        self._lock: threading.RLock = lock
+
+    def __getitem__(self, link: str) -> LinkItem:
+        with self._lock:
+            row = self._connection.execute("SELECT data FROM link_items WHERE link = ?", (link,)).fetchone()
+        if row is None:
+            raise KeyError(link)
+        return LinkItem.from_json(json.loads(row[0]))
+
+    def __setitem__(self, link: str, item: LinkItem):
+        self.actualize(LinkItemDict({link: item}))
+
+    def __delitem__(self, link: str):
+        with self._lock, self._connection:
+            if self._connection.execute("DELETE FROM link_items WHERE link = ?", (link,)).rowcount == 0:
+                raise KeyError(link)
+
+    def __contains__(self, link: object) -> bool:
+        with self._lock:
+            return self._connection.execute("SELECT 1 FROM link_items WHERE link = ?", (link,)).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            links = [row[0] for row in self._connection.execute("SELECT link FROM link_items ORDER BY rowid")]
+        return iter(links)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM link_items").fetchone()[0]
+
+    def items(self) -> Iterator[tuple]:
+        """
+        Iterate over all links and items, they are read in batches.
+
+        :return: link and item
+        """
+        with self._lock:
+            cursor = self._connection.execute("SELECT link, data FROM link_items ORDER BY rowid")
+            rows = cursor.fetchmany(10_000)
+        while rows:
+            for link, data in rows:
+                yield link, LinkItem.from_json(json.loads(data))
+            with self._lock:
+                rows = cursor.fetchmany(10_000)
+
+    def values(self) -> Iterator[LinkItem]:
+        """
+        Iterate over all items.
+
+        :return: item
+        """
+        return (item for _, item in self.items())
+
+    def actualize(self, new_data: Dict[str, LinkItem], log: logging.Logger = None):
+        """
+        Actualize like :func:`~unidown.plugin.link_item_dict.LinkItemDict.actualize`.
+
+        :param new_data: the data used for updating
+        :param log: logger
+        """
+        if log is not None:
+            for link, item in new_data.items():
+                if link in self:
+                    log.info(f"Actualize item: {link} | {self[link]} -> {item}")
+        rows = ((link, item.to_json()) for link, item in new_data.items())
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO link_items (link, time, data) VALUES (?, ?, ?) ON CONFLICT(link) DO UPDATE SET time = excluded.time, data = excluded.data",
+                ((link, data['time'], json.dumps(data)) for link, data in rows)
+            )
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM link_items")
+
+    def get_new_items(self, new_data: LinkItemDict) -> LinkItemDict:
+        """
+        Get the items of new data which are not existing or are newer, compared inside the database with a join.
+
+        :param new_data: new data
+        :return: new and updated link items
+        """
+        return self.diff(new_data, removed=False).new
+
+    def diff(self, new_data: Dict[str, LinkItem], removed: bool = True) -> LinkItemDiff:
+        """
+        Compare the new data with the stored items inside the database with joins, see
+        :func:`~unidown.plugin.link_item_dict.LinkItemDict.diff`.
+
+        :param new_data: new data
+        :param removed: if the removed links should be computed, otherwise they are empty
+        :return: difference
+        """
+        with self._lock:
+            self._connection.execute("CREATE TEMP TABLE IF NOT EXISTS new_items (link TEXT PRIMARY KEY, time TEXT NOT NULL)")
+            self._connection.execute("DELETE FROM new_items")
+            self._connection.executemany("INSERT OR REPLACE INTO new_items (link, time) VALUES (?, ?)",
+                                         ((link, item.to_json()['time']) for link, item in new_data.items()))
+            newer = {}
+            for link, exists in self._connection.execute(
+                    "SELECT new_items.link, link_items.link IS NOT NULL FROM new_items LEFT JOIN link_items ON link_items.link = new_items.link "
+                    "WHERE link_items.link IS NULL OR new_items.time > link_items.time"):
+                newer[link] = exists
+            removed_links = set()
+            if removed:
+                removed_links = {row[0] for row in self._connection.execute(
+                    "SELECT link_items.link FROM link_items LEFT JOIN new_items ON new_items.link = link_items.link WHERE new_items.link IS NULL"
+                )}
+            self._connection.execute("DELETE FROM new_items")
+            self._connection.commit()
+        return LinkItemDiff(LinkItemDict({link: item for link, item in new_data.items() if link in newer}),
+                            {link for link, exists in newer.items() if exists}, removed_links)
+
+
+class SqliteSaveStateBackend(SaveStateBackend):
+    """
+    Savestate inside a SQLite database. The link items are stored in a table indexed by the link and are never loaded
+    completely into memory, the rest of the savestate is stored as json.
+    Appended items are committed immediately, no compaction is needed.
+    """
+    suffix: str = '.sqlite'
+
+    def __init__(self, savestate_dir: Path, name: str, log: logging.Logger, savestate_cls: Type[SaveState] = SaveState):
+        super().__init__(savestate_dir, name, log, savestate_cls)
+        self._connection: sqlite3.Connection = None
+        self._link_items: SqliteLinkItems = None
+        self._lock = threading.RLock()
+
+    def _connect(self) -> SqliteLinkItems:
+        """
+        Open the database and create the tables if needed.
+
+        :return: link items of the database
+        """
+        if self._connection is None:
+            self._connection = sqlite3.connect(str(self._file), check_same_thread=False)
+            with self._connection:
+                self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+                self._connection.execute("CREATE TABLE IF NOT EXISTS link_items (link TEXT PRIMARY KEY, time TEXT NOT NULL, data TEXT NOT NULL)")
+            self._link_items = SqliteLinkItems(self._connection, self._lock)
+        return self._link_items
+
+    def load(self, default: SaveState) -> SaveState:
+        """
+        Load the savestate, its link items stay inside the database.
+
+        :param default: savestate which is used if none was stored
+        :return: loaded savestate, not upgraded
+        :raises ~unidown.plugin.exceptions.PluginException: broken savestate database
+        """
+        try:
+            link_items = self._connect()
+            with self._lock:
+                row = self._connection.execute("SELECT value FROM meta WHERE key = 'savestate'").fetchone()
+        except sqlite3.DatabaseError as ex:
+            raise PluginException(f"Broken savestate database. Please fix or delete this file (you may lose data in this case): {self._file}: {ex}")
+        if row is None:
+            link_items.actualize(default.link_items)
+            default.link_items = link_items
+            return default
+        try:
+            savestate_json = json.loads(row[0])
+            savestate_json['linkItems'] = {}
+            savestate = self._savestate_cls.from_json(savestate_json)
+        except Exception as ex:
+            raise PluginException(f"Could not load savestate from database {self._file}: {ex}")
+        savestate.link_items = link_items
+        return savestate
+
+    def save(self, savestate: SaveState):
+        """
+        Save the savestate. Link items which are not stored inside the database already replace the stored ones.
+
+        :param savestate: savestate
+        """
+        link_items = self._connect()
+        if savestate.link_items is not link_items:
+            link_items.clear()
+            link_items.actualize(savestate.link_items)
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('savestate', ?)", (json.dumps(savestate_meta_json(savestate)),))
+
+    def append(self, link: str, item: LinkItem) -> bool:
+        """
+        Items are committed as soon as they are set to the link items of the database, so nothing has to be done.
+        """
+        return False
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+            self._link_items = None
+
+
+#: available backends, name -> class
+SAVESTATE_BACKENDS: Dict[str, Type[SaveStateBackend]] = {
+    'json': JsonSaveStateBackend,
+    'sqlite': SqliteSaveStateBackend,
+    'binary': BinarySaveStateBackend,
+    'binary-gzip': GzipSaveStateBackend,
+}
@@ -2,29 +2,63 @@
 Different tools.
 """
 
+from importlib import metadata
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict
 
-import pkg_resources
+#: entry points of each group, built on first use
+_ENTRY_POINTS: Dict[str, Dict[str, metadata.EntryPoint]] = {}
 
 
-def unlink_dir_rec(path: Path):
+def unlink_dir_rec(path: Path, keep: Callable[[Path], bool] = None) -> bool:
     """
     Delete a folder recursive.
 
     :param path: folder to deleted
+    :param keep: files for which it returns True are not deleted, as well as the folders containing them
+    :return: if the folder was deleted
     """
     if not path.exists() or not path.is_dir():
-        return
+        return True
+    kept = False
     for sub in path.iterdir():
         if sub.is_dir():
-            unlink_dir_rec(sub)
+            kept = not unlink_dir_rec(sub, keep) or kept
+        elif keep is not None and keep(sub):
+            kept = True
         else:
             sub.unlink()
+    if kept:
+        return False
     path.rmdir()
+    return True
 
 
-def print_plugin_list(plugins: Dict[str, pkg_resources.EntryPoint]):
+def get_entry_points(group: str, refresh: bool = False) -> Dict[str, metadata.EntryPoint]:
+    """
+    Get the entry points of a group with :mod:`importlib.metadata`. The index is cached for the lifetime of the process,
+    as scanning the installed distributions is expensive. If multiple distributions register the same name, the first one
+    wins.
+
+    :param group: entry point group
+    :param refresh: rebuild the cached index
+    :return: name to entry point
+    """
+    if refresh or group not in _ENTRY_POINTS:
+        entry_points = metadata.entry_points()
+        if hasattr(entry_points, 'select'):
+            selected = entry_points.select(group=group)
+        else:
+            # Python < 3.10 returns a dict of groups
+            selected = entry_points.get(group, ())
+        index = {}
+        for entry_point in selected:
+            index.setdefault(entry_point.name, entry_point)
+        _ENTRY_POINTS[group] = index
+    return _ENTRY_POINTS[group]
+
+
+def print_plugin_list(plugins: Dict[str, metadata.EntryPoint]):
     """
     Prints all registered plugins and checks if they can be loaded or not.
 